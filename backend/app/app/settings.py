@@ -10,11 +10,27 @@ SECRET_KEY=os.environ.get('SECRET_KEY','dev-secret-key')
 DEBUG=True
 ALLOWED_HOSTS=['*']
 INSTALLED_APPS=['django.contrib.admin','django.contrib.auth','django.contrib.contenttypes','django.contrib.sessions','django.contrib.messages','django.contrib.staticfiles','rest_framework','corsheaders','core','app']
-MIDDLEWARE=['django.middleware.security.SecurityMiddleware','corsheaders.middleware.CorsMiddleware','django.contrib.sessions.middleware.SessionMiddleware','django.middleware.common.CommonMiddleware','django.middleware.csrf.CsrfViewMiddleware','django.contrib.auth.middleware.AuthenticationMiddleware','django.contrib.messages.middleware.MessageMiddleware','django.middleware.clickjacking.XFrameOptionsMiddleware']
+MIDDLEWARE=['core.metrics.QueryMetricsMiddleware','django.middleware.security.SecurityMiddleware','corsheaders.middleware.CorsMiddleware','django.contrib.sessions.middleware.SessionMiddleware','django.middleware.common.CommonMiddleware','django.middleware.csrf.CsrfViewMiddleware','django.contrib.auth.middleware.AuthenticationMiddleware','django.contrib.messages.middleware.MessageMiddleware','django.middleware.clickjacking.XFrameOptionsMiddleware']
 ROOT_URLCONF='app.urls'
 TEMPLATES=[{'BACKEND':'django.template.backends.django.DjangoTemplates','DIRS':[],'APP_DIRS':True,'OPTIONS':{'context_processors':['django.template.context_processors.debug','django.template.context_processors.request','django.contrib.auth.context_processors.auth','django.contrib.messages.context_processors.messages']}}]
 WSGI_APPLICATION='app.wsgi.application'
 DATABASES={'default':{'ENGINE':'django.db.backends.postgresql','NAME':os.environ.get('DB_NAME','neondb'),'USER':os.environ.get('DB_USER','neondb_owner'),'PASSWORD':os.environ.get('DB_PASSWORD',''),'HOST':os.environ.get('DB_HOST','localhost'),'PORT':os.environ.get('DB_PORT','5432')}}
+
+def replica_databases(default, hosts):
+    """Read-replica aliases (replica_0, ...) cloned from ``default`` for comma-separated host[:port] entries."""
+    replicas={}
+    for i, entry in enumerate(h.strip() for h in hosts.split(',') if h.strip()):
+        host, _, port=entry.partition(':')
+        replicas[f'replica_{i}']={**default, 'OPTIONS':{**default.get('OPTIONS', {})}, 'HOST':host, 'PORT':port or default.get('PORT', ''), 'TEST':{'MIRROR':'default'}}
+    return replicas
+
+# GET read endpoints go to these replicas (core.db_router) unless the student was written
+# to within READ_YOUR_WRITES_SECONDS; with no replicas every query uses default.
+DATABASES.update(replica_databases(DATABASES['default'], os.environ.get('DB_REPLICA_HOSTS', '')))
+DATABASE_REPLICAS=[alias for alias in DATABASES if alias!='default']
+DATABASE_ROUTERS=['core.db_router.ReplicaRouter']
+READ_YOUR_WRITES_SECONDS=float(os.environ.get('READ_YOUR_WRITES_SECONDS','5'))
+READ_YOUR_WRITES_CACHE_ALIAS=os.environ.get('READ_YOUR_WRITES_CACHE_ALIAS','default')
 AUTH_PASSWORD_VALIDATORS=[]
 LANGUAGE_CODE='en-us'
 TIME_ZONE='UTC'
@@ -23,7 +39,91 @@ USE_TZ=True
 STATIC_URL='static/'
 STATIC_ROOT=os.path.join(BASE_DIR, 'staticfiles')
 DEFAULT_AUTO_FIELD='django.db.models.BigAutoField'
-REST_FRAMEWORK={'DEFAULT_PAGINATION_CLASS':'rest_framework.pagination.PageNumberPagination','PAGE_SIZE':10}
+REST_FRAMEWORK={'DEFAULT_RENDERER_CLASSES':['core.renderers.FastJSONRenderer','rest_framework.renderers.BrowsableAPIRenderer'],'DEFAULT_PAGINATION_CLASS':'rest_framework.pagination.PageNumberPagination','PAGE_SIZE':10}
+
+# Rows per in_bulk lookup + bulk_create in POST /api/attempts/bulk/
+ATTEMPT_BULK_CHUNK_SIZE=int(os.environ.get('ATTEMPT_BULK_CHUNK_SIZE','500'))
+# Rows fetched per round trip when streaming GET /api/students/<pk>/attempts/?export=ndjson
+ATTEMPT_EXPORT_CHUNK_SIZE=int(os.environ.get('ATTEMPT_EXPORT_CHUNK_SIZE','2000'))
+
+# Write-behind for POST /api/attempts/: queue validated attempts in a local SQLite spool,
+# answer 202 and flush in batches from a background thread (0 interval = no thread; drain manually).
+ATTEMPT_WRITE_BEHIND=os.environ.get('ATTEMPT_WRITE_BEHIND','false').lower() in ('1','true','yes')
+ATTEMPT_SPOOL_PATH=os.environ.get('ATTEMPT_SPOOL_PATH',str(BASE_DIR/'attempt_spool.sqlite3'))
+ATTEMPT_SPOOL_BATCH_SIZE=int(os.environ.get('ATTEMPT_SPOOL_BATCH_SIZE','500'))
+ATTEMPT_SPOOL_FLUSH_INTERVAL=float(os.environ.get('ATTEMPT_SPOOL_FLUSH_INTERVAL','0.5'))
+
+# Token buckets behind WriteThrottle/BulkWriteThrottle (core.throttling), in a SQLite file every
+# worker on the host shares. Empty path = DRF's history list in the default cache instead.
+THROTTLE_BUCKET_PATH=os.environ.get('THROTTLE_BUCKET_PATH',str(BASE_DIR/'throttle.sqlite3'))
+THROTTLE_BUCKET_TIMEOUT=float(os.environ.get('THROTTLE_BUCKET_TIMEOUT','0.5'))
+
+# Monthly Postgres partitions of core_attempt (core.services.partitions): applied by migration
+# 0007 or `manage.py attempt_partitions --convert`; the command keeps this many months ahead
+# and, when ATTEMPT_RETENTION_MONTHS > 0, drops older raw months after rolling them up.
+ATTEMPT_PARTITIONING=os.environ.get('ATTEMPT_PARTITIONING','false').lower() in ('1','true','yes')
+ATTEMPT_PARTITIONS_AHEAD=int(os.environ.get('ATTEMPT_PARTITIONS_AHEAD','3'))
+ATTEMPT_RETENTION_MONTHS=int(os.environ.get('ATTEMPT_RETENTION_MONTHS','0'))
+
+# Most students one GET /api/students/overview/?ids=... may ask for
+BATCH_OVERVIEW_MAX_STUDENTS=int(os.environ.get('BATCH_OVERVIEW_MAX_STUDENTS','500'))
+
+# analyze-code result cache: in-process LRU bounded by bytes, or a CACHES alias
+# (e.g. a filebased/locmem backend) to share results between workers.
+ANALYSIS_CACHE_ALIAS=os.environ.get('ANALYSIS_CACHE_ALIAS') or None
+ANALYSIS_CACHE_MAX_BYTES=int(os.environ.get('ANALYSIS_CACHE_MAX_BYTES',str(8*1024*1024)))
+ANALYSIS_CACHE_TIMEOUT=int(os.environ.get('ANALYSIS_CACHE_TIMEOUT','3600'))
+# Open editor documents for POST /api/analyze-code/incremental/, dropped after this many idle seconds;
+# settings_prod points this at the shared cache so every worker sees each document
+ANALYSIS_DOCUMENT_CACHE_ALIAS=os.environ.get('ANALYSIS_DOCUMENT_CACHE_ALIAS','default')
+ANALYSIS_DOCUMENT_TIMEOUT=int(os.environ.get('ANALYSIS_DOCUMENT_TIMEOUT','1800'))
+
+# analyze-code process pool; 0 workers analyzes synchronously in the request worker.
+# At most workers+queue depth jobs are in flight, beyond that clients get 503 + Retry-After.
+ANALYSIS_POOL_WORKERS=int(os.environ.get('ANALYSIS_POOL_WORKERS','0'))
+ANALYSIS_POOL_QUEUE_DEPTH=int(os.environ.get('ANALYSIS_POOL_QUEUE_DEPTH','4'))
+# Characters of source the pool's in-flight jobs may hold together; 0 counts jobs only
+ANALYSIS_POOL_MAX_BYTES=int(os.environ.get('ANALYSIS_POOL_MAX_BYTES',str(64*1024)))
+ANALYSIS_CPU_TIMEOUT=float(os.environ.get('ANALYSIS_CPU_TIMEOUT','2'))
+ANALYSIS_WALL_TIMEOUT=float(os.environ.get('ANALYSIS_WALL_TIMEOUT','5'))
+ANALYSIS_RETRY_AFTER=int(os.environ.get('ANALYSIS_RETRY_AFTER','1'))
+
+# Max age (seconds) of a worker's in-process Lesson indexes (tag index, lesson order) before a rebuild
+TAG_INDEX_TTL=float(os.environ.get('TAG_INDEX_TTL','300'))
+
+# Rendered catalog payloads (courses/lessons), keyed by a version bumped on Course/Lesson changes
+CATALOG_CACHE_ALIAS=os.environ.get('CATALOG_CACHE_ALIAS','default')
+# The version every worker must agree on; settings_prod points it at the shared cache
+CATALOG_VERSION_CACHE_ALIAS=os.environ.get('CATALOG_VERSION_CACHE_ALIAS','default')
+CATALOG_CACHE_TIMEOUT=int(os.environ.get('CATALOG_CACHE_TIMEOUT','3600'))
+CATALOG_MAX_AGE=int(os.environ.get('CATALOG_MAX_AGE','60'))
+
+# Request metrics (GET /api/metrics/): requests over either budget are counted and
+# a METRICS_SAMPLE_RATE fraction of them is logged with their most repeated SQL.
+METRICS_QUERY_BUDGET=int(os.environ.get('METRICS_QUERY_BUDGET','20'))
+METRICS_LATENCY_BUDGET_MS=float(os.environ.get('METRICS_LATENCY_BUDGET_MS','500'))
+METRICS_SAMPLE_RATE=float(os.environ.get('METRICS_SAMPLE_RATE','0.1'))
+# Scrapers authenticate with 'Authorization: Bearer <token>'; staff sessions need none. Empty = staff only.
+METRICS_TOKEN=os.environ.get('METRICS_TOKEN','')
+
+# Stored recommendations (precompute_recommendations) are served while younger than this
+# and newer than the student's last attempt; otherwise the endpoint scores live.
+RECOMMENDATION_MAX_AGE=int(os.environ.get('RECOMMENDATION_MAX_AGE','3600'))
+
+# Rendered overview/recommendation bodies per student (core.services.student_cache).
+# The alias bounds the cache size; settings_prod uses the shared cache so invalidation reaches every worker.
+STUDENT_CACHE_ALIAS=os.environ.get('STUDENT_CACHE_ALIAS','students')
+STUDENT_CACHE_TIMEOUT=int(os.environ.get('STUDENT_CACHE_TIMEOUT','300'))
+STUDENT_CACHE_MAX_ENTRIES=int(os.environ.get('STUDENT_CACHE_MAX_ENTRIES','10000'))
+# Longest a request waits for another thread's build of the same body before building it too
+STUDENT_CACHE_LOCK_TIMEOUT=int(os.environ.get('STUDENT_CACHE_LOCK_TIMEOUT','5'))
+CACHES={
+    'default':{'BACKEND':'django.core.cache.backends.locmem.LocMemCache'},
+    'students':{'BACKEND':'django.core.cache.backends.locmem.LocMemCache','LOCATION':'students','OPTIONS':{'MAX_ENTRIES':STUDENT_CACHE_MAX_ENTRIES}},
+}
+
+# Mount the async-native read views (core.async_views); meant for ASGI servers
+ASYNC_READ_VIEWS=os.environ.get('ASYNC_READ_VIEWS','false').lower() in ('1','true','yes')
 
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
@@ -21,12 +21,72 @@ DATABASES = {
         'HOST': os.environ.get('DB_HOST'),
         'PORT': os.environ.get('DB_PORT', '5432'),
         'OPTIONS': {
-            'sslmode': 'require',
-            'channel_binding': 'require',
+            'sslmode': os.environ.get('DB_SSLMODE', 'require'),
+            'channel_binding': os.environ.get('DB_CHANNEL_BINDING', 'require'),
         }
     }
 }
 
+# Connection management. Every new connection to Neon pays a TLS + channel_binding
+# handshake, so avoid opening one per request:
+#   pool        - psycopg 3 pool inside each worker (default; safe under ASGI)
+#   persistent  - CONN_MAX_AGE reuse with health checks (sync/WSGI workers only;
+#                 under ASGI each request runs on its own thread and would leak connections)
+#   pgbouncer   - short-lived connections to a local transaction-mode pooler at DB_HOST
+#   none        - a fresh connection per request
+DB_CONN_MODE = os.environ.get('DB_CONN_MODE', 'pool')
+if DB_CONN_MODE == 'pool':
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', '10')),
+        'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', '300')),
+    }
+elif DB_CONN_MODE == 'persistent':
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', '300'))
+elif DB_CONN_MODE == 'pgbouncer':
+    # Transaction pooling cannot keep server-side cursors open across statements
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+elif DB_CONN_MODE != 'none':
+    raise ValueError(f"Unknown DB_CONN_MODE: {DB_CONN_MODE}")
+# Check reused connections (pooled or persistent) before handing them out, so a
+# connection dropped by Neon's idle timeout is replaced instead of failing a request
+DATABASES['default']['CONN_HEALTH_CHECKS'] = os.environ.get('DB_CONN_HEALTH_CHECKS', 'true').lower() in ('1', 'true', 'yes')
+
+# Read replicas share the primary's credentials, TLS and connection mode
+DATABASES.update(replica_databases(DATABASES['default'], os.environ.get('DB_REPLICA_HOSTS', '')))
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+# Cache state every worker and container must agree on. Redis when REDIS_URL is set,
+# otherwise a table on the primary (`manage.py createcachetable`, run after migrate).
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES['shared'] = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}
+else:
+    CACHES['shared'] = {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'core_shared_cache'}
+
+# A read-your-writes pin must reach whichever worker serves the student's next read, and
+# every replica read looks its pins up first: in DatabaseCache that lookup is a query on
+# the primary, which defeats the replicas, so they need Redis (or another shared cache)
+READ_YOUR_WRITES_CACHE_ALIAS = os.environ.get('READ_YOUR_WRITES_CACHE_ALIAS', 'shared')
+if DATABASE_REPLICAS and CACHES[READ_YOUR_WRITES_CACHE_ALIAS]['BACKEND'].endswith(('LocMemCache', 'DatabaseCache')):
+    raise ValueError("DB_REPLICA_HOSTS needs REDIS_URL, or READ_YOUR_WRITES_CACHE_ALIAS naming a shared cache that is neither locmem nor database")
+
+# Catalog changes must reach every worker (payloads are keyed by version, so they may stay local)
+CATALOG_VERSION_CACHE_ALIAS = os.environ.get('CATALOG_VERSION_CACHE_ALIAS', 'shared')
+if CACHES[CATALOG_VERSION_CACHE_ALIAS]['BACKEND'].endswith('LocMemCache'):
+    raise ValueError("CATALOG_VERSION_CACHE_ALIAS must name a shared (non-locmem) cache")
+
+# Cached student bodies: an attempt must invalidate them on every worker
+STUDENT_CACHE_ALIAS = os.environ.get('STUDENT_CACHE_ALIAS', 'shared')
+if CACHES[STUDENT_CACHE_ALIAS]['BACKEND'].endswith('LocMemCache'):
+    raise ValueError("STUDENT_CACHE_ALIAS must name a shared (non-locmem) cache")
+
+# Editor documents: any worker may receive the next keystroke of a document
+ANALYSIS_DOCUMENT_CACHE_ALIAS = os.environ.get('ANALYSIS_DOCUMENT_CACHE_ALIAS', 'shared')
+if CACHES[ANALYSIS_DOCUMENT_CACHE_ALIAS]['BACKEND'].endswith('LocMemCache'):
+    raise ValueError("ANALYSIS_DOCUMENT_CACHE_ALIAS must name a shared (non-locmem) cache")
+
 # Validate required database environment variables
 required_db_vars = ['DB_NAME', 'DB_USER', 'DB_PASSWORD', 'DB_HOST']
 missing_vars = [var for var in required_db_vars if not os.environ.get(var)]
@@ -37,6 +97,12 @@ if missing_vars:
 if not SECRET_KEY:
     raise ValueError("SECRET_KEY environment variable is required")
 
+# Run code analysis outside the gunicorn workers
+ANALYSIS_POOL_WORKERS = int(os.environ.get('ANALYSIS_POOL_WORKERS', '2'))
+
+# Served by gunicorn with uvicorn workers (asgi.py); use the async read views
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS', 'true').lower() in ('1', 'true', 'yes')
+
 # Static files configuration
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
@@ -94,9 +160,16 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        # Per-statement SQL logging is too costly under load; core.metrics samples
+        # over-budget requests instead.
         'django.db.backends': {
             'handlers': ['console'],
-            'level': 'DEBUG',
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'core.metrics': {
+            'handlers': ['file', 'console'],
+            'level': 'WARNING',
             'propagate': False,
         },
     },
@@ -2,3 +2,8 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field='django.db.models.BigAutoField'
     name='core'
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from . import signals  # noqa: F401
+        from .metrics import install_query_recorder
+        connection_created.connect(install_query_recorder, dispatch_uid='core.metrics.install_query_recorder')
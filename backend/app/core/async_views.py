@@ -0,0 +1,94 @@
+"""Async-native read endpoints, mounted instead of the DRF views when ASYNC_READ_VIEWS is on.
+
+Independent lookups are awaited together with asyncio.gather. Django runs async ORM
+calls on the request's own sync thread, so within one request they still reach the
+database one after another. The gain is across requests: a worker no longer blocks
+while a slow remote database answers, so many more requests can be in flight.
+Responses carry the same JSON as the sync views in core.views, built from the same
+values() projections.
+"""
+import asyncio
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+from .db_router import replica_reads, student_pk
+from .models import Student, Course, Lesson
+from .renderers import json_response
+from .services.catalog import acached_payload, acatalog_version
+from .services.completion import get_lesson_order
+from .services.projections import COURSE_FIELDS, LESSON_FIELDS, LESSON_ORDER, group_courses, overview_courses
+from .services.tag_index import get_tag_index
+from .services.recommendations import CourseRef, fresh_payload, recommendation_payload
+from .services.student_cache import acached_student_payload
+from .views import etag_response, overview_payload, overview_stats
+
+async def _list(qs):
+    return [obj async for obj in qs]
+
+def _not_found(detail='Not found'):
+    return json_response({'detail':detail}, status=404)
+
+async def _student_response(kind, pk, build):
+    try:
+        return HttpResponse(await acached_student_payload(kind, pk, build), content_type='application/json')
+    except Student.DoesNotExist:
+        return _not_found()
+
+@replica_reads(student_pk)
+@require_GET
+async def student_overview(request, pk: int):
+    async def build():
+        student, courses, stats, lesson_order=await asyncio.gather(
+            Student.objects.filter(pk=pk).values_list('id','name').afirst(),
+            _list(overview_courses()), _list(overview_stats(pk)), sync_to_async(get_lesson_order)())
+        if student is None: raise Student.DoesNotExist
+        return overview_payload(student, courses, stats, lesson_order)
+    return await _student_response('overview', pk, build)
+
+@replica_reads(student_pk)
+@require_GET
+async def student_recommendation(request, pk: int):
+    async def build():
+        student=await Student.objects.select_related('features','recommendation').aget(pk=pk)
+        now=timezone.now()
+        stored=fresh_payload(student, now, await acatalog_version())
+        if stored is not None: return stored
+        courses, tag_index=await asyncio.gather(_list(Course.objects.values_list('id','name')), sync_to_async(get_tag_index)())
+        return recommendation_payload(getattr(student, 'features', None), [CourseRef(*r) for r in courses], tag_index, now)
+    return await _student_response('recommendation', pk, build)
+
+async def _course_rows(pk=None):
+    """Async projections.course_rows()."""
+    courses=Course.objects.all() if pk is None else Course.objects.filter(pk=pk)
+    lessons=Lesson.objects.order_by(*LESSON_ORDER)
+    if pk is not None: lessons=lessons.filter(course_id=pk)
+    rows, lesson_rows=await asyncio.gather(_list(courses.values(*COURSE_FIELDS)), _list(lessons.values('course_id', *LESSON_FIELDS)))
+    return group_courses(rows, lesson_rows)
+
+@require_GET
+async def course_list(request):
+    return etag_response(request, *await acached_payload('courses', _course_rows))
+
+@require_GET
+async def course_detail(request, pk: int):
+    async def build():
+        rows=await _course_rows(pk)
+        if not rows: raise Course.DoesNotExist
+        return rows[0]
+    try:
+        return etag_response(request, *await acached_payload(f'course:{pk}', build))
+    except Course.DoesNotExist:
+        return _not_found('Course not found')
+
+@require_GET
+async def lesson_list(request, course_id: int):
+    async def build():
+        exists, lessons=await asyncio.gather(Course.objects.filter(pk=course_id).aexists(),
+                                             _list(Lesson.objects.filter(course_id=course_id).order_by(*LESSON_ORDER).values(*LESSON_FIELDS)))
+        if not exists: raise Course.DoesNotExist
+        return lessons
+    try:
+        return etag_response(request, *await acached_payload(f'lessons:{course_id}', build))
+    except Course.DoesNotExist:
+        return _not_found('Course not found')
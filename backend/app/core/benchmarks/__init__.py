@@ -0,0 +1 @@
+# Benchmarks; run individual modules with `python -m core.benchmarks.<name>` from backend/app.
@@ -0,0 +1,88 @@
+"""Compare the single-pass rule engine with the previous three-visitor analyzer on ~10KB input,
+and per-keystroke cost of full vs incremental analysis as the snippet grows.
+
+Fails if the incremental cost at 10KB is more than GROWTH_LIMIT times the 1KB cost: an
+edit must only touch the statements around it, whatever the document size."""
+import ast
+import sys
+import timeit
+from core.services.analysis_cache import AnalysisCache, LRUByteStore
+from core.services.analyzer import analyze
+from core.services.incremental_analysis import Document, apply_edits
+
+GROWTH_LIMIT=2.0
+
+def legacy_analyze(code):
+    issues=[]
+    tree=ast.parse(code)
+    class ArgVisitor(ast.NodeVisitor):
+        def visit_FunctionDef(self, node):
+            arg_names=[a.arg for a in node.args.args]
+            used=set()
+            class UseVisitor(ast.NodeVisitor):
+                def visit_Name(self, n):
+                    if isinstance(n.ctx, ast.Load): used.add(n.id)
+            UseVisitor().visit(node)
+            for a in arg_names:
+                if a not in used: issues.append({'rule':'unused-arg','message':f'Function arg "{a}" appears unused.','severity':'info'})
+    ArgVisitor().visit(tree)
+    class ExceptVisitor(ast.NodeVisitor):
+        def visit_ExceptHandler(self, node):
+            if node.type is None: issues.append({'rule':'bare-except','message':'Avoid bare except; catch specific exceptions.','severity':'warn'})
+    ExceptVisitor().visit(tree)
+    class PrintVisitor(ast.NodeVisitor):
+        def visit_Call(self, node):
+            if getattr(node.func,'id',None)=='print': issues.append({'rule':'print-call','message':'Avoid print statements; use logging.','severity':'info'})
+    PrintVisitor().visit(tree)
+    return issues
+
+def make_snippet(target_bytes=10000):
+    block=("def handler_{i}(a, b, unused):\n"
+           "    total = 0\n"
+           "    for x in range(a):\n"
+           "        try:\n"
+           "            total += x * b\n"
+           "        except:\n"
+           "            print(x)\n"
+           "    return total\n\n")
+    parts=[]; i=0
+    while sum(map(len, parts))<target_bytes-len(block):
+        parts.append(block.format(i=i)); i+=1
+    return ''.join(parts)
+
+def main(number=200):
+    code=make_snippet()
+    parsed=timeit.timeit(lambda: ast.parse(code), number=number)/number
+    results={}
+    for name, fn in (('legacy', legacy_analyze), ('single_pass', analyze)):
+        results[name]=timeit.timeit(lambda: fn(code), number=number)/number
+    print(f'input: {len(code)} bytes; ast.parse alone: {parsed*1e3:.3f} ms')
+    for name, t in results.items():
+        print(f'{name:12s} {t*1e3:8.3f} ms/call  (rules only: {(t-parsed)*1e3:.3f} ms)')
+    print(f'speedup: {results["legacy"]/results["single_pass"]:.2f}x')
+    print('per keystroke (typing into a function mid-document):')
+    incremental={}
+    for size in (1000, 2500, 5000, 10000):
+        incremental[size]=keystroke_ms(size, None, number)
+        print(f'  {size:6d} bytes  full {keystroke_ms(size, analyze, number):7.3f} ms  incremental {incremental[size]:7.3f} ms')
+    growth=incremental[10000]/incremental[1000]
+    print(f'incremental 10KB/1KB: {growth:.2f}x')
+    assert growth<=GROWTH_LIMIT, f'incremental cost grows with document size ({growth:.2f}x > {GROWTH_LIMIT}x)'
+
+def keystroke_ms(size, full, number, repeats=5):
+    """Best-of-``repeats`` mean ms per keystroke over ``number`` keystrokes."""
+    code=make_snippet(size)
+    at=code.index('total = 0', len(code)//2)+len('total')
+    cache=AnalysisCache(LRUByteStore(8*1024*1024))
+    document=Document(code, cache.analyze)
+    edits=iter([{'start':at+i, 'end':at+i, 'text':'x'} for i in range(number*repeats)])
+    def step():
+        nonlocal code
+        if full:
+            code=apply_edits(code, [next(edits)]); return full(code)
+        e=next(edits)
+        return document.edit(e['start'], e['end'], e['text'], cache.analyze)
+    return min(timeit.repeat(step, number=number, repeat=repeats))/number*1e3
+
+if __name__=='__main__':
+    main(int(sys.argv[1]) if len(sys.argv)>1 else 200)
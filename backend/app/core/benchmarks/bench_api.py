@@ -0,0 +1,133 @@
+"""Latency, query-count and allocation benchmarks for the API hot paths.
+
+Runs against a throwaway test database seeded with ``seed_scale`` at each requested
+scale and writes a JSON report that ``--compare`` can diff against a previous run::
+
+    cd backend/app
+    python -m core.benchmarks.bench_api --scales small,medium --output bench.json
+    python -m core.benchmarks.bench_api --scales small --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+SCALES={
+    'small': {'students':100,'courses':10,'lessons_per_course':5,'attempts':5_000},
+    'medium': {'students':1_000,'courses':100,'lessons_per_course':8,'attempts':100_000},
+    'large': {'students':10_000,'courses':500,'lessons_per_course':10,'attempts':2_000_000},
+}
+
+def _git_commit():
+    try:
+        return subprocess.run(['git','rev-parse','HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _endpoints(student_ids, snippet):
+    sid=student_ids[len(student_ids)//2]
+    return {
+        'student_overview': ('get', f'/api/students/{sid}/overview/', None),
+        'student_recommendation': ('get', f'/api/students/{sid}/recommendation/', None),
+        'course_list': ('get', '/api/courses/', None),
+        'analyze_code': ('post', '/api/analyze-code/', {'code': snippet}),
+    }
+
+def clear_caches():
+    """Drop the student and analyze-code caches, so the next call builds its response from the database."""
+    from django.conf import settings
+    from django.core.cache import caches
+    from core.services.analysis_cache import get_analysis_cache
+    caches[settings.STUDENT_CACHE_ALIAS].clear(); get_analysis_cache().clear()
+
+def _timings(call, iterations, before=None):
+    times=[]
+    for _ in range(iterations):
+        if before: before()
+        t=time.perf_counter(); call(); times.append((time.perf_counter()-t)*1e3)
+    times.sort()
+    return {'p50_ms':round(statistics.median(times), 3),'p95_ms':round(times[min(len(times)-1, int(len(times)*0.95))], 3),'mean_ms':round(statistics.fmean(times), 3)}
+
+def measure(client, method, path, data, iterations):
+    """Cold numbers clear the caches before every call; warm numbers repeat a call whose response is cached."""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    call=(lambda: client.post(path, data=data, content_type='application/json')) if method=='post' else (lambda: client.get(path))
+    r=call()  # warm-up: imports, connections and process-wide indexes, which a running server keeps anyway
+    assert r.status_code==200, (path, r.status_code)
+    result={'iterations':iterations}
+    for mode in ('cold', 'warm'):
+        if mode=='cold': clear_caches()
+        connection.queries_log.clear()  # a full log (seeding fills it) makes every capture read as 0
+        with CaptureQueriesContext(connection) as ctx:
+            call()
+        if mode=='cold': clear_caches()
+        tracemalloc.start()
+        call()
+        _, peak=tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result[mode]={'queries':len(ctx.captured_queries),'peak_alloc_kb':round(peak/1024, 1),**_timings(call, iterations, clear_caches if mode=='cold' else None)}
+    return result
+
+def run_scale(name, size, iterations):
+    from django.core.management import call_command
+    from django.test import Client
+    from core.benchmarks.bench_analyzer import make_snippet
+    from core.models import Attempt, Course, Lesson, Student
+    for model in (Attempt, Lesson, Course, Student): model.objects.all().delete()
+    t=time.perf_counter()
+    call_command('seed_scale', prefix=f'bench-{name}', stdout=open(os.devnull, 'w'), **size)
+    seed_s=time.perf_counter()-t
+    client=Client()
+    student_ids=list(Student.objects.values_list('id', flat=True))
+    results={ep:measure(client, m, p, d, iterations) for ep, (m, p, d) in _endpoints(student_ids, make_snippet(10000)).items()}
+    return {'size':size,'seed_seconds':round(seed_s, 2),'endpoints':results}
+
+def compare(report, baseline):
+    print(f"{'scale':8s} {'endpoint':24s} {'mode':5s} {'p50 ms':>18s} {'queries':>10s} {'peak KB':>18s}")
+    for scale, cur in report['scales'].items():
+        old=baseline.get('scales', {}).get(scale)
+        if not old: continue
+        for ep, r in cur['endpoints'].items():
+            for mode in ('cold', 'warm'):
+                o=old['endpoints'].get(ep, {}).get(mode)
+                if not o: continue
+                n=r[mode]
+                print(f"{scale:8s} {ep:24s} {mode:5s} {o['p50_ms']:8.2f}->{n['p50_ms']:<8.2f} {o['queries']:4d}->{n['queries']:<4d} {o['peak_alloc_kb']:8.0f}->{n['peak_alloc_kb']:<8.0f}")
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', default='small', help=f"Comma-separated subset of {', '.join(SCALES)}")
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--output', help='Write the JSON report here')
+    parser.add_argument('--compare', help='Previous JSON report to diff against')
+    args=parser.parse_args(argv)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    import django
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+    setup_test_environment()
+    old_name=connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        report={'commit':_git_commit(),'python':platform.python_version(),'db':connection.vendor,'created':time.time(),'scales':{}}
+        for name in args.scales.split(','):
+            report['scales'][name]=run_scale(name, SCALES[name], args.iterations)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+    out=json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f: f.write(out)
+    else:
+        print(out)
+    if args.compare:
+        with open(args.compare) as f: compare(report, json.load(f))
+
+if __name__=='__main__':
+    main(sys.argv[1:])
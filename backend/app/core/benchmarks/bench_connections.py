@@ -0,0 +1,65 @@
+"""Compare DB_CONN_MODE settings on /api/students/<pk>/overview/ against a real Postgres.
+
+Each mode runs in its own process with app.settings_prod. Point the DB_* variables at
+the target database (seed it first with ``manage.py seed_demo``); for a local server
+without TLS also set DB_SSLMODE=disable DB_CHANNEL_BINDING=disable::
+
+    cd backend/app
+    python -m core.benchmarks.bench_connections --modes none,persistent,pool --requests 300
+
+Reports latency percentiles and how many physical connections each mode opened.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+def run_mode(requests):
+    import django
+    django.setup()
+    from django.db.backends.signals import connection_created
+    from django.test import Client
+    from core.models import Student
+    # connection_created also fires on every pool checkout, so count distinct backend pids.
+    opened=set()
+    def created(sender, connection, **kw):
+        raw=connection.connection
+        opened.add(raw.info.backend_pid if hasattr(raw, 'info') and hasattr(raw.info, 'backend_pid') else raw.get_backend_pid())
+    connection_created.connect(created, weak=False)
+    pk=Student.objects.values_list('id', flat=True).first()
+    if pk is None: raise SystemExit('No students; run manage.py seed_demo first.')
+    client=Client()
+    opened.clear()
+    times=[]
+    for _ in range(requests):
+        t=time.perf_counter()
+        r=client.get(f'/api/students/{pk}/overview/')
+        times.append((time.perf_counter()-t)*1e3)
+        assert r.status_code==200, r.status_code
+    times.sort()
+    return {'requests':requests,'connections_opened':len(opened),'p50_ms':round(statistics.median(times), 3),
+            'p95_ms':round(times[int(len(times)*0.95)-1], 3),'mean_ms':round(statistics.fmean(times), 3)}
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', default='none,persistent,pool')
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args=parser.parse_args(argv)
+    if args.child:
+        print(json.dumps(run_mode(args.requests))); return
+    results={}
+    for mode in args.modes.split(','):
+        env={**os.environ, 'DB_CONN_MODE':mode, 'DJANGO_SETTINGS_MODULE':'app.settings_prod', 'SECRET_KEY':os.environ.get('SECRET_KEY', 'bench'), 'ALLOWED_HOSTS':'testserver'}
+        out=subprocess.run([sys.executable, '-m', 'core.benchmarks.bench_connections', '--child', mode, '--requests', str(args.requests)],
+                           env=env, capture_output=True, text=True, check=True).stdout
+        results[mode]=json.loads(out.strip().splitlines()[-1])
+        r=results[mode]
+        print(f"{mode:11s} p50 {r['p50_ms']:8.2f} ms  p95 {r['p95_ms']:8.2f} ms  connections opened: {r['connections_opened']}")
+    return results
+
+if __name__=='__main__':
+    main(sys.argv[1:])
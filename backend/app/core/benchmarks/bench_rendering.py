@@ -0,0 +1,85 @@
+"""Serializer-path vs fast-path rendering for the catalog and overview payloads.
+
+Seeds a throwaway test database with a 500-course catalog (10 lessons each) and times
+building + encoding each body both ways, bypassing the catalog cache::
+
+    cd backend/app
+    python -m core.benchmarks.bench_rendering --courses 500 --iterations 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+def legacy_catalog():
+    from rest_framework.renderers import JSONRenderer
+    from core.models import Course
+    from core.serializers import CourseSerializer
+    return JSONRenderer().render(CourseSerializer(Course.objects.prefetch_related('lessons'), many=True).data)
+
+def fast_catalog():
+    from core.renderers import dumps
+    from core.services.projections import course_rows
+    return dumps(course_rows())
+
+def legacy_overview(pk):
+    # The pre-projection overview: model instances, prefetch and DRF's JSONRenderer.
+    from rest_framework.renderers import JSONRenderer
+    from core.models import Course, Student, StudentCourseStats
+    student=Student.objects.get(pk=pk)
+    stats={st.course_id:st for st in StudentCourseStats.objects.filter(student=student)}
+    data=[]
+    for c in Course.objects.prefetch_related('lessons'):
+        st=stats.get(c.id); lessons=c.lessons.all()
+        data.append({'id':c.id,'name':c.name,'description':c.description,'difficulty':c.difficulty,'progress':min(100, st.attempt_count*10) if st else 0,
+                     'last_activity':st.last_timestamp.isoformat() if st and st.last_timestamp else None,'next_up':lessons[0].title if lessons else None})
+    return JSONRenderer().render({'student':{'id':student.id,'name':student.name},'courses':data})
+
+def fast_overview(pk):
+    from core.models import Student
+    from core.renderers import dumps
+    from core.services.completion import get_lesson_order
+    from core.services.projections import overview_courses
+    from core.views import overview_payload, overview_stats
+    return dumps(overview_payload(Student.objects.filter(pk=pk).values_list('id','name').first(), overview_courses(), overview_stats(pk), get_lesson_order()))
+
+def timed(fn, iterations):
+    fn()
+    wall, cpu=[], []
+    for _ in range(iterations):
+        w, c=time.perf_counter(), time.process_time(); fn()
+        wall.append((time.perf_counter()-w)*1e3); cpu.append((time.process_time()-c)*1e3)
+    return statistics.median(wall), statistics.median(cpu)
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--courses', type=int, default=500)
+    parser.add_argument('--lessons-per-course', type=int, default=10)
+    parser.add_argument('--iterations', type=int, default=20)
+    args=parser.parse_args(argv)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    import django
+    django.setup()
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+    from core import renderers
+    from core.models import Student
+    setup_test_environment()
+    old_name=connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        call_command('seed_scale', prefix='bench-render', students=50, courses=args.courses, lessons_per_course=args.lessons_per_course,
+                     attempts=5_000, stdout=open(os.devnull, 'w'))
+        pk=Student.objects.values_list('id', flat=True).first()
+        assert legacy_catalog()==fast_catalog(), 'catalog bodies differ'
+        print(f"encoder: {'orjson' if renderers.orjson else 'stdlib json'}; {args.courses} courses x {args.lessons_per_course} lessons")
+        for name, legacy, fast in (('course_list', legacy_catalog, fast_catalog), ('student_overview', lambda: legacy_overview(pk), lambda: fast_overview(pk))):
+            (lw, lc), (fw, fc)=timed(legacy, args.iterations), timed(fast, args.iterations)
+            print(f'{name:17s} serializer {lw:8.2f} ms (cpu {lc:7.2f})  fast {fw:8.2f} ms (cpu {fc:7.2f})  x{lw/fw:5.1f}')
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+if __name__=='__main__':
+    main(sys.argv[1:])
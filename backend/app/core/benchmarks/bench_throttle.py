@@ -0,0 +1,81 @@
+"""Compare TokenBucketThrottle with DRF's UserRateThrottle (history list in the default cache).
+
+Measures the cost of one allow_request() in-process, then starts several worker processes
+that hammer the same user at once and counts how many requests each backend let through::
+
+    cd backend/app
+    python -m core.benchmarks.bench_throttle --rate 30/min --calls 20000 --workers 3
+
+With the per-process locmem cache every worker keeps its own history, so the cache
+throttle admits about workers x the limit; the token bucket admits the limit.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+def _throttles(rate):
+    from rest_framework.throttling import UserRateThrottle
+    from core.throttling import TokenBucketThrottle
+    return {'cache':type('CacheThrottle', (UserRateThrottle,), {'rate':rate}), 'bucket':type('BucketThrottle', (TokenBucketThrottle,), {'rate':rate})}
+
+def _request(user_id):
+    from types import SimpleNamespace
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+    request=Request(APIRequestFactory().post('/api/attempts/'))
+    request.user=SimpleNamespace(is_authenticated=True, pk=user_id)
+    return request
+
+def per_call(cls, calls, users, repeats=5):
+    """Best-of-``repeats`` mean microseconds per allow_request, cycling over ``users`` keys."""
+    requests=[_request(i) for i in range(users)]
+    best=[]
+    for _ in range(repeats):
+        t=time.perf_counter()
+        for i in range(calls): cls().allow_request(requests[i%users], None)
+        best.append((time.perf_counter()-t)/calls*1e6)
+    return min(best)
+
+def run_child(backend, rate, calls, start_at):
+    import django
+    django.setup()
+    cls=_throttles(rate)[backend]; request=_request(1)
+    time.sleep(max(0, start_at-time.time()))
+    return sum(cls().allow_request(request, None) for _ in range(calls))
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rate', default='30/min')
+    parser.add_argument('--calls', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=1, help='Distinct throttle keys for the per-call timing')
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--start-at', type=float, help=argparse.SUPPRESS)
+    args=parser.parse_args(argv)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    if not os.environ.get('THROTTLE_BUCKET_PATH'):
+        os.environ['THROTTLE_BUCKET_PATH']=os.path.join(tempfile.mkdtemp(prefix='bench-throttle-'), 'throttle.sqlite3')
+    if args.child:
+        print(json.dumps(run_child(args.child, args.rate, args.calls, args.start_at))); return
+    import django
+    django.setup()
+    from core.services.token_bucket import get_bucket_store
+    results={}
+    for backend, cls in _throttles(args.rate).items():
+        get_bucket_store().clear()
+        us=per_call(cls, args.calls, args.users)
+        get_bucket_store().clear()
+        start_at=time.time()+1.0
+        procs=[subprocess.Popen([sys.executable, '-m', 'core.benchmarks.bench_throttle', '--child', backend, '--rate', args.rate,
+                                 '--calls', str(args.calls//10), '--start-at', str(start_at)], stdout=subprocess.PIPE, text=True) for _ in range(args.workers)]
+        admitted=[json.loads(p.communicate()[0].strip().splitlines()[-1]) for p in procs]
+        results[backend]={'us_per_call':round(us, 2),'admitted':sum(admitted),'admitted_per_worker':admitted}
+        print(f"{backend:7s} {us:8.2f} us/call  admitted across {args.workers} workers: {sum(admitted)} {admitted} (limit {cls().num_requests})")
+    return results
+
+if __name__=='__main__':
+    main(sys.argv[1:])
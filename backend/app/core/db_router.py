@@ -0,0 +1,115 @@
+"""Send read-endpoint queries to a replica, except for students written moments ago.
+
+Views wrapped in ``replica_reads`` run GET requests with a replica chosen from
+DATABASE_REPLICAS, and ReplicaRouter routes their reads there. Writes, and everything
+outside those views, use default.
+
+pin_student() is called once a student's writes commit (see core.services.student_cache).
+For READ_YOUR_WRITES_SECONDS afterwards, reads about that student stay on default, so
+replication lag never hides a student's own attempt. pin_catalog() does the same for
+every routed read after a Course/Lesson change. Keep the window above the worst
+expected lag. Pins live in READ_YOUR_WRITES_CACHE_ALIAS, which must be shared by every
+worker; settings_prod refuses to start with replicas and a process-local or
+database-backed alias (a pin lookup there would query the primary on every read).
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Iterable, Optional
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+
+_read_db: ContextVar[Optional[str]]=ContextVar('read_db', default=None)
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # DatabaseCache entries (pins, catalog versions) must be read where they were written.
+        if model._meta.app_label=='django_cache': return None
+        return _read_db.get()
+    def db_for_write(self, model, **hints):
+        return 'default'
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db=='default'
+
+def _pin_key(pk)->str:
+    return f'rw-pin:student:{pk}'
+
+def pin_student(pk: int):
+    if settings.DATABASE_REPLICAS:
+        caches[settings.READ_YOUR_WRITES_CACHE_ALIAS].set(_pin_key(pk), 1, settings.READ_YOUR_WRITES_SECONDS)
+
+CATALOG_PIN='rw-pin:catalog'
+
+def pin_catalog():
+    """pin_student for the course catalog, which every student body embeds (see core.services.catalog)."""
+    if settings.DATABASE_REPLICAS:
+        caches[settings.READ_YOUR_WRITES_CACHE_ALIAS].set(CATALOG_PIN, 1, settings.READ_YOUR_WRITES_SECONDS)
+
+def pinned(student_ids: Iterable[int])->bool:
+    return bool(caches[settings.READ_YOUR_WRITES_CACHE_ALIAS].get_many([CATALOG_PIN, *(_pin_key(pk) for pk in student_ids)]))
+
+def _choose(request, kwargs, students)->Optional[str]:
+    if request.method!='GET' or not settings.DATABASE_REPLICAS: return None
+    if pinned(students(request, **kwargs) if students is not None else ()): return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+@contextmanager
+def primary():
+    """Read from default inside the block: for results kept past the request (catalog payloads,
+    in-process indexes), which must not capture a lagging replica's view."""
+    token=_read_db.set(None)
+    try:
+        yield
+    finally:
+        _read_db.reset(token)
+
+def _routed(iterator, alias):
+    # Streaming bodies are consumed after the view returns, so route them again here.
+    token=_read_db.set(alias)
+    try:
+        yield from iterator
+    finally:
+        _read_db.reset(token)
+
+async def _arouted(aiterator, alias):
+    token=_read_db.set(alias)
+    try:
+        async for part in aiterator: yield part
+    finally:
+        _read_db.reset(token)
+
+def replica_reads(students=None):
+    """Decorate a read view; ``students(request, **kwargs)`` names the student ids whose pins apply.
+
+    Without ``students`` the view's data is not student-specific; only the catalog pin applies.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                token=_read_db.set(_choose(request, kwargs, students))
+                try:
+                    return await view(request, *args, **kwargs)
+                finally:
+                    _read_db.reset(token)
+            return wrapper
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            alias=_choose(request, kwargs, students)
+            token=_read_db.set(alias)
+            try:
+                response=view(request, *args, **kwargs)
+            finally:
+                _read_db.reset(token)
+            if alias and getattr(response, 'streaming', False):
+                response.streaming_content=(_arouted if response.is_async else _routed)(response.streaming_content, alias)
+            return response
+        return wrapper
+    return decorator
+
+def student_pk(request, pk, **kwargs):
+    return [pk]
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from core.services.partition_ddl import add_months, convert_to_partitioned, ensure_partitions, is_partitioned, month_start
+from core.services.partitions import closed_months_needing_rollup, drop_partitions_before, rollup_month
+
+class Command(BaseCommand):
+    help='Maintain core_attempt partitions: create future months, roll up closed months, apply retention (run daily)'
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true', help='Convert an unpartitioned core_attempt first (Postgres; copies every row)')
+        parser.add_argument('--ahead', type=int, default=settings.ATTEMPT_PARTITIONS_AHEAD, help='Months of partitions to keep ready beyond the current one')
+        parser.add_argument('--retain-months', type=int, default=settings.ATTEMPT_RETENTION_MONTHS, help='Drop raw partitions older than this many months; 0 keeps everything')
+
+    def handle(self, *args, **o):
+        now=timezone.now()
+        partitioned=is_partitioned()
+        if o['convert'] and not partitioned:
+            convert_to_partitioned(o['ahead']); partitioned=True
+            self.stdout.write('Converted core_attempt to monthly partitions.')
+        if partitioned:
+            created=ensure_partitions(add_months(month_start(now), o['ahead']))
+            self.stdout.write(f"Created partitions: {', '.join(created) or 'none'}")
+        rolled=closed_months_needing_rollup(now)
+        rows=sum(rollup_month(m) for m in rolled)
+        self.stdout.write(f'Rolled up {len(rolled)} new or changed closed month(s) into {rows} daily rows.')
+        if o['retain_months']>0:
+            if not partitioned: raise CommandError('Retention drops raw partitions; core_attempt is not partitioned.')
+            dropped=drop_partitions_before(add_months(month_start(now), -o['retain_months']))
+            self.stdout.write(f"Dropped partitions: {', '.join(dropped) or 'none'}")
+        self.stdout.write(self.style.SUCCESS('Attempt partitions up to date.'))
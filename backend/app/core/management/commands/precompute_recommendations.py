@@ -0,0 +1,56 @@
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, Q
+from django.utils import timezone
+from core.models import Course, Lesson, Student
+from core.services.recommendation_worker import init_worker, score_chunk
+from core.services.catalog import catalog_version
+from core.services.recommendations import store_payloads
+
+class Command(BaseCommand):
+    help='Precompute top-k recommendations for all students (or only changed ones) into StudentRecommendation'
+    def add_arguments(self, parser):
+        parser.add_argument('--changed', action='store_true', help='Only students with new attempts or a catalog change since their stored recommendation, or none stored')
+        parser.add_argument('--since', help='Only students whose features changed after this ISO timestamp (watermark)')
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(), help='Scoring processes; 0 scores in this process')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--top-k', type=int, default=3)
+
+    def students(self, o, version):
+        qs=Student.objects.order_by()
+        if o['since']:
+            since=datetime.fromisoformat(o['since'])
+            if timezone.is_naive(since): since=timezone.make_aware(since)
+            qs=qs.filter(features__updated_at__gt=since)
+        if o['changed']:
+            qs=qs.filter(Q(recommendation__isnull=True) | Q(features__updated_at__gt=F('recommendation__computed_at')) | ~Q(recommendation__catalog_version=version))
+        return qs.values_list('id','features__courses','features__mastered_tags').iterator(chunk_size=o['chunk_size'])
+
+    def handle(self, *args, **o):
+        # Read before the catalog, so a change made while scoring leaves these payloads stale.
+        version=catalog_version()
+        courses=list(Course.objects.values_list('id','name'))
+        if not courses: raise CommandError('No courses to recommend.')
+        lesson_rows=list(Lesson.objects.values_list('id','course_id','tags').order_by())
+        now=timezone.now(); k=o['top_k']
+        rows=self.students(o, version)
+        chunks=iter(lambda: list(islice(rows, o['chunk_size'])), [])
+        written=0
+        if o['workers']<=0:
+            init_worker(courses, lesson_rows)
+            for chunk in chunks: written+=store_payloads(score_chunk(chunk, now, k), now, version)
+        else:
+            ctx=multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(o['workers'], mp_context=ctx, initializer=init_worker, initargs=(courses, lesson_rows)) as pool:
+                # Keep only a few chunks in flight so memory stays flat for any number of students.
+                pending=set()
+                for chunk in chunks:
+                    pending.add(pool.submit(score_chunk, chunk, now, k))
+                    if len(pending)>=2*o['workers']:
+                        done, pending=wait(pending, return_when=FIRST_COMPLETED)
+                        for f in done: written+=store_payloads(f.result(), now, version)
+                for f in pending: written+=store_payloads(f.result(), now, version)
+        self.stdout.write(self.style.SUCCESS(f'Stored {written} recommendations.'))
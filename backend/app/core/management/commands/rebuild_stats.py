@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from core.services.features import rebuild_features
+from core.services.stats import rebuild_stats
+
+class Command(BaseCommand):
+    help='Rebuild StudentCourseStats and StudentFeatures from Attempt'
+    def handle(self, *args, **kwargs):
+        n=rebuild_stats(); m=rebuild_features()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {n} student course stats rows and {m} student feature rows.'))
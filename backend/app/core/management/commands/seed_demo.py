@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from core.models import Student, Course, Lesson, Attempt
+from core.services.stats import apply_attempts
 
 class Command(BaseCommand):
     help='Create demo data'
@@ -14,5 +15,7 @@ class Command(BaseCommand):
         mk(c2,1,'Arrays',['arrays']); mk(c2,2,'Conditions',['conditions'])
         mk(c3,1,'What is AI?',['logic','data'])
         l=Lesson.objects.filter(course=c1).first()
-        if l: Attempt.objects.get_or_create(student=s, lesson=l, timestamp=timezone.now(), correctness=0.6, hints_used=1, duration_sec=600)
+        if l:
+            a,created=Attempt.objects.get_or_create(student=s, lesson=l, timestamp=timezone.now(), correctness=0.6, hints_used=1, duration_sec=600)
+            if created: apply_attempts([a])
         self.stdout.write(self.style.SUCCESS('Seeded demo data.'))
\ No newline at end of file
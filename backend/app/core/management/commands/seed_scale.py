@@ -0,0 +1,80 @@
+import random
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from core.models import Student, Course, Lesson, Attempt
+from core.services.features import rebuild_features
+from core.services.stats import rebuild_stats
+
+TAGS=['variables','loops','conditions','functions','arrays','objects','recursion','sorting','search','classes','closures','async','testing','io','logic','data']
+_SUFFIXES={'k':10**3,'m':10**6,'b':10**9}
+
+def count(value: str)->int:
+    """Parse sizes like ``500``, ``100k`` or ``50M``."""
+    v=value.strip().lower()
+    try:
+        return int(float(v[:-1])*_SUFFIXES[v[-1]]) if v and v[-1] in _SUFFIXES else int(v)
+    except ValueError:
+        raise CommandError(f'Invalid count: {value!r}')
+
+class Command(BaseCommand):
+    help='Generate large synthetic datasets with bulk_create (e.g. --students 100k --courses 500 --attempts 50M)'
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=count, default=1000)
+        parser.add_argument('--courses', type=count, default=50)
+        parser.add_argument('--lessons-per-course', type=count, default=8)
+        parser.add_argument('--attempts', type=count, default=100_000)
+        parser.add_argument('--days', type=int, default=180, help='History window for attempt timestamps')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', default='scale', help='Email/name prefix; use a new one to add a second dataset')
+        parser.add_argument('--skip-rebuild', action='store_true', help='Do not rebuild StudentCourseStats/StudentFeatures')
+
+    def _bulk(self, model, objs, batch_size):
+        ids=[]; batch=[]
+        for o in objs:
+            batch.append(o)
+            if len(batch)>=batch_size:
+                ids.extend(x.pk for x in model.objects.bulk_create(batch)); batch=[]
+        if batch: ids.extend(x.pk for x in model.objects.bulk_create(batch))
+        return ids
+
+    def handle(self, *args, **o):
+        rng=random.Random(o['seed']); bs=o['batch_size']; prefix=o['prefix']
+        with transaction.atomic():
+            student_ids=self._bulk(Student, (Student(name=f'{prefix} student {i}', email=f'{prefix}-{i}@example.com') for i in range(o['students'])), bs)
+            course_ids=self._bulk(Course, (Course(name=f'{prefix} course {i}', description='Synthetic course', difficulty=rng.randint(1, 5)) for i in range(o['courses'])), bs)
+            lessons=(Lesson(course_id=cid, title=f'Lesson {j+1}', tags=rng.sample(TAGS, rng.randint(1, 3)), order_index=j+1, position=j) for cid in course_ids for j in range(o['lessons_per_course']))
+            lesson_ids=self._bulk(Lesson, lessons, bs)
+        if not (student_ids and lesson_ids):
+            raise CommandError('Need at least one student and one lesson to generate attempts.')
+        self.stdout.write(f'Created {len(student_ids)} students, {len(course_ids)} courses, {len(lesson_ids)} lessons.')
+
+        now=timezone.now(); window=o['days']*86400.0
+        # Activity is skewed: a minority of students and lessons get most attempts,
+        # timestamps cluster towards the present, and most attempts use no hints.
+        student_weights=[rng.paretovariate(1.5) for _ in student_ids]
+        lesson_weights=[rng.paretovariate(1.2) for _ in lesson_ids]
+        def attempts():
+            for chunk_start in range(0, o['attempts'], bs):
+                n=min(bs, o['attempts']-chunk_start)
+                students=rng.choices(student_ids, student_weights, k=n)
+                lessons=rng.choices(lesson_ids, lesson_weights, k=n)
+                for sid, lid in zip(students, lessons):
+                    age=min(window, rng.expovariate(3.0/window))
+                    yield Attempt(student_id=sid, lesson_id=lid, timestamp=now-timedelta(seconds=age),
+                                  correctness=round(rng.betavariate(4, 2), 3), hints_used=min(10, int(rng.expovariate(1.5))),
+                                  duration_sec=min(7200, int(rng.lognormvariate(5.5, 0.8))))
+        written=0
+        batch=[]
+        for a in attempts():
+            batch.append(a)
+            if len(batch)>=bs:
+                Attempt.objects.bulk_create(batch); written+=len(batch); batch=[]
+                if written%(bs*20)==0: self.stdout.write(f'  {written} attempts...')
+        if batch: Attempt.objects.bulk_create(batch); written+=len(batch)
+        self.stdout.write(f'Created {written} attempts.')
+        if not o['skip_rebuild']:
+            self.stdout.write(f'Rebuilt {rebuild_stats()} stats rows and {rebuild_features()} feature rows.')
+        self.stdout.write(self.style.SUCCESS('Seeded scale data.'))
@@ -0,0 +1,195 @@
+"""Per-endpoint request metrics: query count, DB time, render time and total time.
+
+Histograms live in process memory, so each gunicorn worker reports its own series;
+scrape every worker (or sum in Prometheus) for the full picture.
+
+Queries are counted by one execute wrapper installed on every connection as it opens
+(core.apps connects install_query_recorder to connection_created). It reports to the
+recorder in a ContextVar, which asgiref copies into the sync thread that runs an ASGI
+request's view, so queries count wherever they execute. A streaming response is
+recorded once its body has been consumed, with the recorder active while it streams.
+
+Render time is the DRF renderer's, or for the plain-HttpResponse fast paths whatever
+runs inside rendering() (their dumps() of a cache miss). Responses that do neither,
+such as streams and cache hits, report no render time rather than a zero.
+"""
+import hmac
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Sequence, Tuple
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger=logging.getLogger('core.metrics')
+
+SECONDS_BUCKETS=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+class Histogram:
+    __slots__=('buckets','counts','sum','count')
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets=buckets; self.counts=[0]*len(buckets); self.sum=0.0; self.count=0
+    def observe(self, v: float):
+        self.sum+=v; self.count+=1
+        for i, b in enumerate(self.buckets):
+            if v<=b:
+                self.counts[i]+=1; break
+    def lines(self, name: str, labels: str):
+        cumulative=0
+        for b, c in zip(self.buckets, self.counts):
+            cumulative+=c
+            yield f'{name}_bucket{{{labels},le="{b}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+METRICS=(
+    ('coach_request_duration_seconds', 'Total request time by URL pattern.', SECONDS_BUCKETS),
+    ('coach_db_duration_seconds', 'Time spent in database calls per request.', SECONDS_BUCKETS),
+    ('coach_render_duration_seconds', 'Time spent rendering (serializing) the response.', SECONDS_BUCKETS),
+    ('coach_db_queries', 'Database queries per request.', QUERY_BUCKETS),
+)
+
+class Registry:
+    def __init__(self):
+        self._lock=threading.Lock()
+        self._series: Dict[Tuple[str, str, str], Histogram]={}
+        self.over_budget=Counter()
+    def observe(self, route: str, method: str, values: Sequence[Optional[float]]):
+        """One value per METRICS entry; None leaves that series alone."""
+        with self._lock:
+            for (name, _, buckets), v in zip(METRICS, values):
+                if v is None: continue
+                h=self._series.get((name, route, method))
+                if h is None: h=self._series[(name, route, method)]=Histogram(buckets)
+                h.observe(v)
+    def render(self)->str:
+        out=[]
+        with self._lock:
+            for name, help_text, _ in METRICS:
+                out+=[f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for (n, route, method), h in sorted(self._series.items()):
+                    if n==name: out.extend(h.lines(name, f'route="{route}",method="{method}"'))
+            out+=['# HELP coach_requests_over_budget_total Requests exceeding the query or latency budget.', '# TYPE coach_requests_over_budget_total counter']
+            out.extend(f'coach_requests_over_budget_total{{route="{r}"}} {n}' for r, n in sorted(self.over_budget.items()))
+        return '\n'.join(out)+'\n'
+    def count_over_budget(self, route: str):
+        with self._lock: self.over_budget[route]+=1
+    def reset(self):
+        with self._lock:
+            self._series.clear(); self.over_budget.clear()
+
+registry=Registry()
+
+class _QueryRecorder:
+    __slots__=('count','seconds','statements','render')
+    def __init__(self):
+        self.count=0; self.seconds=0.0; self.statements=Counter(); self.render=None
+    def __call__(self, execute, sql, params, many, context):
+        t=time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds+=time.perf_counter()-t; self.count+=1
+            self.statements[sql]+=1
+
+_recorder: ContextVar[Optional[_QueryRecorder]]=ContextVar('coach_query_recorder', default=None)
+
+def _record_query(execute, sql, params, many, context):
+    recorder=_recorder.get()
+    if recorder is None: return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+def install_query_recorder(sender, connection, **kwargs):
+    """connection_created hook; fires again on reconnects and pool checkouts, so install once."""
+    # Outermost, so connection.execute_wrapper() blocks still pop their own wrapper.
+    if _record_query not in connection.execute_wrappers: connection.execute_wrappers.insert(0, _record_query)
+
+@contextmanager
+def rendering():
+    """Count the block as render time of the current request, less any queries it runs (lazy querysets)."""
+    recorder=_recorder.get()
+    if recorder is None:
+        yield; return
+    db=recorder.seconds; start=time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.render=(recorder.render or 0.0)+time.perf_counter()-start-(recorder.seconds-db)
+
+def can_scrape(request)->bool:
+    """Staff users, or ``Authorization: Bearer <METRICS_TOKEN>`` when that setting is set."""
+    user=getattr(request, 'user', None)
+    if user is not None and user.is_active and user.is_staff: return True
+    token=settings.METRICS_TOKEN
+    return bool(token) and hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode())
+
+class QueryMetricsMiddleware:
+    """Records per-route metrics and logs a sample of requests over the configured budgets."""
+    sync_capable=True
+    async_capable=True
+    def __init__(self, get_response):
+        self.get_response=get_response
+        self.is_async=iscoroutinefunction(get_response)
+        if self.is_async: markcoroutinefunction(self)
+    def __call__(self, request):
+        if self.is_async: return self.__acall__(request)
+        recorder=_QueryRecorder()
+        token=_recorder.set(recorder); start=time.perf_counter()
+        try:
+            response=self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self._finish(request, response, recorder, start)
+    async def __acall__(self, request):
+        recorder=_QueryRecorder()
+        token=_recorder.set(recorder); start=time.perf_counter()
+        try:
+            response=await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self._finish(request, response, recorder, start)
+    def _finish(self, request, response, recorder, start):
+        if not getattr(response, 'streaming', False):
+            self._record(request, recorder, time.perf_counter()-start)
+            return response
+        # The body's queries run as it is consumed, after the view has returned.
+        done=lambda: self._record(request, recorder, time.perf_counter()-start)
+        response.streaming_content=(_arecorded if response.is_async else _recorded)(response.streaming_content, recorder, done)
+        return response
+    def _record(self, request, recorder, total):
+        match=getattr(request, 'resolver_match', None)
+        route=match.route if match else 'unresolved'
+        registry.observe(route, request.method, (total, recorder.seconds, recorder.render, recorder.count))
+        if recorder.count>settings.METRICS_QUERY_BUDGET or total*1000>settings.METRICS_LATENCY_BUDGET_MS:
+            registry.count_over_budget(route)
+            if random.random()<settings.METRICS_SAMPLE_RATE:
+                repeated=[f'{n}x {sql[:200]}' for sql, n in recorder.statements.most_common(5)]
+                logger.warning('Over budget: %s %s queries=%d db=%.1fms total=%.1fms top statements: %s',
+                               request.method, route, recorder.count, recorder.seconds*1000, total*1000, repeated)
+    def process_template_response(self, request, response):
+        # DRF responses render after this hook; time it with a post-render callback.
+        recorder=_recorder.get(); start=time.perf_counter()
+        def done(r):
+            if recorder is not None: recorder.render=(recorder.render or 0.0)+time.perf_counter()-start
+        response.add_post_render_callback(done)
+        return response
+
+def _recorded(iterator, recorder, done):
+    token=_recorder.set(recorder)
+    try:
+        yield from iterator
+    finally:
+        _recorder.reset(token); done()
+
+async def _arecorded(aiterator, recorder, done):
+    token=_recorder.set(recorder)
+    try:
+        async for part in aiterator: yield part
+    finally:
+        _recorder.reset(token); done()
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.2 on 2026-10-18 00:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+
+def backfill_stats(apps, schema_editor):
+    Attempt = apps.get_model('core', 'Attempt')
+    StudentCourseStats = apps.get_model('core', 'StudentCourseStats')
+    rows = Attempt.objects.values('student_id', 'lesson__course_id').annotate(
+        n=Count('id'), last=Max('timestamp'), hints=Sum('hints_used'), correct=Sum('correctness'), duration=Sum('duration_sec')).order_by()
+    StudentCourseStats.objects.bulk_create((StudentCourseStats(
+        student_id=r['student_id'], course_id=r['lesson__course_id'], attempt_count=r['n'], last_timestamp=r['last'],
+        hint_sum=r['hints'], correctness_sum=r['correct'], duration_sum=r['duration']) for r in rows.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentCourseStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempt_count', models.PositiveIntegerField(default=0)),
+                ('last_timestamp', models.DateTimeField(null=True)),
+                ('hint_sum', models.PositiveBigIntegerField(default=0)),
+                ('correctness_sum', models.FloatField(default=0.0)),
+                ('duration_sum', models.PositiveBigIntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_stats', to='core.course')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='course_stats', to='core.student')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('student', 'course'), name='uniq_student_course_stats')],
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
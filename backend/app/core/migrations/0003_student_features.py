@@ -0,0 +1,42 @@
+# Generated by Django 5.1.2 on 2026-10-18 00:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_features(apps, schema_editor):
+    Attempt = apps.get_model('core', 'Attempt')
+    StudentFeatures = apps.get_model('core', 'StudentFeatures')
+    vectors = {}
+    for a in Attempt.objects.select_related('lesson').iterator(chunk_size=2000):
+        courses, mastered = vectors.setdefault(a.student_id, ({}, set()))
+        entry = courses.setdefault(str(a.lesson.course_id), [0, None, 0])
+        ts = a.timestamp.timestamp()
+        entry[0] += 1
+        entry[2] += a.hints_used
+        if entry[1] is None or ts > entry[1]:
+            entry[1] = ts
+        if a.correctness >= 0.7:
+            mastered.update(a.lesson.tags or ())
+    StudentFeatures.objects.bulk_create(
+        (StudentFeatures(student_id=sid, courses=c, mastered_tags=sorted(m)) for sid, (c, m) in vectors.items()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_student_course_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentFeatures',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='features', serialize=False, to='core.student')),
+                ('courses', models.JSONField(default=dict)),
+                ('mastered_tags', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_features, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def create_gin_index(apps, schema_editor):
+    # Postgres only: lets tags__contains=[tag] (jsonb @>) use an index. Other backends skip it.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE INDEX IF NOT EXISTS core_lesson_tags_gin ON core_lesson USING GIN (tags jsonb_path_ops)')
+
+
+def drop_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS core_lesson_tags_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_student_features'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_gin_index, drop_gin_index),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.2 on 2026-10-18 00:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_lesson_tags_gin'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentRecommendation',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recommendation', serialize=False, to='core.student')),
+                ('payload', models.JSONField()),
+                ('computed_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.2 on 2026-10-18 00:49
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+# core.services.features.MASTERY_THRESHOLD when this migration was written
+PASS_THRESHOLD = 0.7
+
+
+def backfill_completed(apps, schema_editor):
+    Attempt = apps.get_model('core', 'Attempt')
+    StudentCourseStats = apps.get_model('core', 'StudentCourseStats')
+    done = defaultdict(int)
+    passed = Attempt.objects.filter(correctness__gte=PASS_THRESHOLD).values_list('student_id', 'lesson__course_id', 'lesson__order_index').distinct()
+    for student_id, course_id, order_index in passed.iterator():
+        done[(student_id, course_id)] |= 1 << order_index
+    rows = []
+    for row in StudentCourseStats.objects.only('id', 'student_id', 'course_id').iterator():
+        bits = done.get((row.student_id, row.course_id))
+        if bits:
+            row.completed = bits.to_bytes((bits.bit_length() + 7) // 8, 'little'); rows.append(row)
+    StudentCourseStats.objects.bulk_update(rows, ['completed'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_student_recommendation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentcoursestats',
+            name='completed',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.RunPython(backfill_completed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.2 on 2026-10-18 00:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def partition_attempts(apps, schema_editor):
+    # Opt-in and Postgres only; `manage.py attempt_partitions --convert` does the same later.
+    if not settings.ATTEMPT_PARTITIONING or schema_editor.connection.vendor != 'postgresql':
+        return
+    # Raw DDL only (no models), run on the connection being migrated.
+    from core.services.partition_ddl import convert_to_partitioned, is_partitioned
+    if not is_partitioned(schema_editor.connection):
+        convert_to_partitioned(settings.ATTEMPT_PARTITIONS_AHEAD, schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_lesson_completion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttemptDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_index=True)),
+                ('attempt_count', models.PositiveIntegerField(default=0)),
+                ('correctness_sum', models.FloatField(default=0.0)),
+                ('hint_sum', models.PositiveBigIntegerField(default=0)),
+                ('duration_sum', models.PositiveBigIntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='core.course')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='core.student')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('student', 'course', 'day'), name='uniq_attempt_daily_rollup')],
+            },
+        ),
+        migrations.RunPython(partition_attempts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.2 on 2026-10-18 01:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_attempt_partitioning'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attempt',
+            name='ingest_key',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='attempt',
+            constraint=models.UniqueConstraint(fields=('ingest_key', 'timestamp'), name='uniq_attempt_ingest_key'),
+        ),
+    ]
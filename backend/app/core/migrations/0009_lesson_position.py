@@ -0,0 +1,48 @@
+# Generated by Django 5.1.2 on 2026-10-18 01:25
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+# core.services.features.MASTERY_THRESHOLD when this migration was written
+PASS_THRESHOLD = 0.7
+
+
+def number_lessons_and_rebuild_completed(apps, schema_editor):
+    # Completion bits move from order_index to position, so every bitmap is rewritten.
+    Lesson = apps.get_model('core', 'Lesson')
+    Attempt = apps.get_model('core', 'Attempt')
+    StudentCourseStats = apps.get_model('core', 'StudentCourseStats')
+    rank = defaultdict(int)
+    lessons = []
+    for lesson in Lesson.objects.only('id', 'course_id').order_by('course_id', 'order_index', 'id').iterator():
+        lesson.position = rank[lesson.course_id]
+        rank[lesson.course_id] += 1
+        lessons.append(lesson)
+    Lesson.objects.bulk_update(lessons, ['position'], batch_size=1000)
+    done = defaultdict(int)
+    passed = Attempt.objects.filter(correctness__gte=PASS_THRESHOLD).values_list('student_id', 'lesson__course_id', 'lesson__position').distinct()
+    for student_id, course_id, position in passed.iterator():
+        done[(student_id, course_id)] |= 1 << position
+    rows = []
+    for row in StudentCourseStats.objects.only('id', 'student_id', 'course_id').iterator():
+        bits = done.get((row.student_id, row.course_id), 0)
+        row.completed = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+        rows.append(row)
+    StudentCourseStats.objects.bulk_update(rows, ['completed'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_attempt_ingest_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='position',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(number_lessons_and_rebuild_completed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 01:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_lesson_position'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentrecommendation',
+            name='catalog_version',
+            field=models.BigIntegerField(null=True),
+        ),
+    ]
@@ -17,6 +17,8 @@ class Lesson(models.Model):
     title=models.CharField(max_length=200)
     tags=models.JSONField(default=list, blank=True)
     order_index=models.PositiveIntegerField(default=0)
+    # Rank within the course by (order_index, id), kept by core.services.completion; the lesson's completion bit
+    position=models.PositiveIntegerField(default=0,editable=False)
     class Meta: ordering=['order_index']
     def __str__(self): return f"{self.course.name}: {self.title}"
 
@@ -27,4 +29,50 @@ class Attempt(models.Model):
     correctness=models.FloatField()
     hints_used=models.PositiveIntegerField(default=0)
     duration_sec=models.PositiveIntegerField(default=0)
-    class Meta: indexes=[models.Index(fields=['student','timestamp'])]
+    # Set by the write-behind spool so a replayed row is inserted once; includes timestamp for partitioning.
+    ingest_key=models.UUIDField(null=True,editable=False)
+    class Meta:
+        indexes=[models.Index(fields=['student','timestamp'])]
+        constraints=[models.UniqueConstraint(fields=['ingest_key','timestamp'],name='uniq_attempt_ingest_key')]
+
+class StudentCourseStats(models.Model):
+    """Running per-student, per-course totals over Attempt; see core.services.stats."""
+    student=models.ForeignKey(Student,on_delete=models.CASCADE,related_name='course_stats')
+    course=models.ForeignKey(Course,on_delete=models.CASCADE,related_name='student_stats')
+    attempt_count=models.PositiveIntegerField(default=0)
+    last_timestamp=models.DateTimeField(null=True)
+    hint_sum=models.PositiveBigIntegerField(default=0)
+    correctness_sum=models.FloatField(default=0.0)
+    duration_sum=models.PositiveBigIntegerField(default=0)
+    # Lesson completion bitmap, bit n = Lesson.position n; see core.services.completion
+    completed=models.BinaryField(default=b'')
+    class Meta: constraints=[models.UniqueConstraint(fields=['student','course'],name='uniq_student_course_stats')]
+
+class StudentFeatures(models.Model):
+    """Compact recommendation inputs for one student; see core.services.features.
+
+    courses maps str(course_id) -> [attempt_count, last_timestamp (epoch seconds), hint_sum].
+    """
+    student=models.OneToOneField(Student,on_delete=models.CASCADE,primary_key=True,related_name='features')
+    courses=models.JSONField(default=dict)
+    mastered_tags=models.JSONField(default=list)
+    updated_at=models.DateTimeField(auto_now=True)
+
+class StudentRecommendation(models.Model):
+    """Precomputed student_recommendation body; see core.services.recommendations."""
+    student=models.OneToOneField(Student,on_delete=models.CASCADE,primary_key=True,related_name='recommendation')
+    payload=models.JSONField()
+    computed_at=models.DateTimeField(db_index=True)
+    # core.services.catalog version the payload was scored against; any other version makes it stale
+    catalog_version=models.BigIntegerField(null=True)
+
+class AttemptDailyRollup(models.Model):
+    """Per-student, per-course daily Attempt totals that outlive dropped raw partitions; see core.services.partitions."""
+    student=models.ForeignKey(Student,on_delete=models.CASCADE,related_name='daily_rollups')
+    course=models.ForeignKey(Course,on_delete=models.CASCADE,related_name='daily_rollups')
+    day=models.DateField(db_index=True)
+    attempt_count=models.PositiveIntegerField(default=0)
+    correctness_sum=models.FloatField(default=0.0)
+    hint_sum=models.PositiveBigIntegerField(default=0)
+    duration_sum=models.PositiveBigIntegerField(default=0)
+    class Meta: constraints=[models.UniqueConstraint(fields=['student','course','day'],name='uniq_attempt_daily_rollup')]
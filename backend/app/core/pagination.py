@@ -0,0 +1,49 @@
+import base64
+from datetime import datetime
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+class KeysetPagination(BasePagination):
+    """Newest-first keyset pagination on (timestamp, id).
+
+    The cursor is the last row's (timestamp, id), so each page is an index range scan on
+    (student, timestamp) no matter how deep it is, unlike OFFSET paging.
+    """
+    cursor_query_param='cursor'
+    page_size_query_param='limit'
+    max_page_size=500
+    def __init__(self):
+        self.page_size=settings.REST_FRAMEWORK.get('PAGE_SIZE') or 10
+    def encode_cursor(self, row)->str:
+        return base64.urlsafe_b64encode(f"{row['timestamp'].isoformat()}|{row['id']}".encode()).decode()
+    def decode_cursor(self, raw):
+        try:
+            ts, pk=base64.urlsafe_b64decode(raw.encode()).decode().rsplit('|', 1)
+            return datetime.fromisoformat(ts), int(pk)
+        except (ValueError, UnicodeError):
+            raise ValidationError({'cursor':['Invalid cursor.']})
+    def get_limit(self, request)->int:
+        try:
+            return max(1, min(self.max_page_size, int(request.query_params.get(self.page_size_query_param, self.page_size))))
+        except ValueError:
+            return self.page_size
+    def paginate_queryset(self, queryset, request, view=None):
+        """``queryset`` must be a .values() queryset including timestamp and id."""
+        self.request=request
+        limit=self.get_limit(request)
+        raw=request.query_params.get(self.cursor_query_param)
+        if raw:
+            ts, pk=self.decode_cursor(raw)
+            queryset=queryset.filter(Q(timestamp__lt=ts) | Q(timestamp=ts, id__lt=pk))
+        rows=list(queryset.order_by('-timestamp','-id')[:limit+1])
+        self.next_cursor=self.encode_cursor(rows[limit-1]) if len(rows)>limit else None
+        return rows[:limit]
+    def get_next_link(self):
+        if self.next_cursor is None: return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+    def get_paginated_response(self, data):
+        return Response({'next':self.get_next_link(),'results':data})
@@ -0,0 +1,25 @@
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+try:
+    import orjson
+except ImportError:  # optional: falls back to DRF's stdlib encoder
+    orjson=None
+
+_fallback=JSONRenderer()
+
+def dumps(data)->bytes:
+    """Compact UTF-8 JSON; orjson when installed, otherwise DRF's JSONRenderer output."""
+    if orjson is not None:
+        return orjson.dumps(data, default=_fallback.encoder_class().default, option=orjson.OPT_NON_STR_KEYS)
+    return _fallback.render(data)
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that encodes with orjson when available; indented output still uses DRF's path."""
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None: return b''
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}): return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+def json_response(data, status: int=200)->HttpResponse:
+    """Pre-rendered JSON response that skips DRF's Response, content negotiation and renderer."""
+    return HttpResponse(dumps(data), status=status, content_type='application/json')
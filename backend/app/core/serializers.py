@@ -1,5 +1,7 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import Student, Course, Lesson, Attempt
+from .services.stats import apply_attempts
 
 class LessonSerializer(serializers.ModelSerializer):
     class Meta:
@@ -20,3 +22,18 @@ class AttemptCreateSerializer(serializers.ModelSerializer):
         if not (0.0 <= v <= 1.0):
             raise serializers.ValidationError('Correctness must be between 0 and 1.')
         return v
+    def create(self, validated_data):
+        with transaction.atomic():
+            a=super().create(validated_data)
+            apply_attempts([a])
+        return a
+
+class AttemptBulkRowSerializer(AttemptCreateSerializer):
+    """AttemptCreateSerializer rules with student/lesson left as raw ids, resolved in bulk by ingest_attempts."""
+    student=serializers.IntegerField(min_value=1)
+    lesson=serializers.IntegerField(min_value=1)
+    ingest_key=serializers.UUIDField(required=False)
+    class Meta(AttemptCreateSerializer.Meta):
+        fields=['student','lesson','timestamp','correctness','hints_used','duration_sec','ingest_key']
+        # No per-row uniq_attempt_ingest_key query: ingest_attempts checks the whole chunk at once.
+        validators=[]
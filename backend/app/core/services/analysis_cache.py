@@ -0,0 +1,81 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+from django.conf import settings
+from django.core.cache import caches
+from .analysis_pool import run_analysis
+from .analyzer import RULESET_VERSION, analyze
+
+Issues=List[Dict[str, str]]
+
+class LRUByteStore:
+    """In-process LRU bounded by the approximate encoded size of its values."""
+    def __init__(self, max_bytes: int):
+        self.max_bytes=max_bytes; self.bytes=0; self.evictions=0
+        self._data=OrderedDict(); self._lock=threading.Lock()
+    def get(self, key: str):
+        with self._lock:
+            item=self._data.get(key)
+            if item is None: return None
+            self._data.move_to_end(key)
+            return item[0]
+    def set(self, key: str, value, size: int):
+        size+=len(key)
+        if size>self.max_bytes: return
+        with self._lock:
+            old=self._data.pop(key, None)
+            if old is not None: self.bytes-=old[1]
+            self._data[key]=(value, size); self.bytes+=size
+            while self.bytes>self.max_bytes:
+                _, (_, evicted)=self._data.popitem(last=False)
+                self.bytes-=evicted; self.evictions+=1
+    def clear(self):
+        with self._lock:
+            self._data.clear(); self.bytes=0
+    def __len__(self): return len(self._data)
+
+class DjangoCacheStore:
+    """Stores results in a Django cache alias so workers can share them (e.g. filebased)."""
+    def __init__(self, alias: str, timeout: Optional[int]=None):
+        self.cache=caches[alias]; self.timeout=timeout
+    def get(self, key: str): return self.cache.get(key)
+    def set(self, key: str, value, size: int): self.cache.set(key, value, self.timeout)
+    def clear(self): self.cache.clear()  # the whole alias
+
+class AnalysisCache:
+    """Content-hash cache in front of analyze(); counts hits, misses and (local) evictions.
+
+    Cached issue lists are shared between callers and must not be mutated.
+    """
+    def __init__(self, store, analyzer: Callable[[str], Issues]=analyze, version: str=RULESET_VERSION):
+        self.store=store; self.analyzer=analyzer; self.version=version
+        self.hits=0; self.misses=0
+    def key(self, code: str)->str:
+        return 'analyze:'+self.version+':'+hashlib.sha256(code.encode('utf-8','surrogatepass')).hexdigest()
+    def analyze(self, code: str)->Issues:
+        key=self.key(code)
+        issues=self.store.get(key)
+        if issues is not None:
+            self.hits+=1; return issues
+        self.misses+=1
+        issues=self.analyzer(code)
+        self.store.set(key, issues, len(json.dumps(issues)))
+        return issues
+    def clear(self):
+        self.store.clear()
+    def stats(self)->Dict[str, int]:
+        s={'hits':self.hits,'misses':self.misses,'evictions':getattr(self.store,'evictions',0)}
+        if isinstance(self.store, LRUByteStore): s.update(entries=len(self.store), bytes=self.store.bytes, max_bytes=self.store.max_bytes)
+        return s
+
+_cache=None
+
+def get_analysis_cache()->AnalysisCache:
+    global _cache
+    if _cache is None:
+        alias=settings.ANALYSIS_CACHE_ALIAS
+        store=DjangoCacheStore(alias, settings.ANALYSIS_CACHE_TIMEOUT) if alias else LRUByteStore(settings.ANALYSIS_CACHE_MAX_BYTES)
+        _cache=AnalysisCache(store, analyzer=run_analysis)
+    return _cache
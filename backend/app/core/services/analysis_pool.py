@@ -0,0 +1,103 @@
+import multiprocessing
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+from django.conf import settings
+from .analyzer import Issue, analyze
+
+class AnalysisBusy(Exception):
+    """The pool already has workers + queue_depth jobs, or max_bytes of source, in flight."""
+
+class AnalysisTooLarge(Exception):
+    """One submission is larger than the pool's whole byte budget, so it could never be admitted."""
+
+class AnalysisTimeout(Exception):
+    """A job exceeded its CPU (worker side) or wall-clock (caller side) budget."""
+
+_HAS_ITIMER=hasattr(signal, 'setitimer')
+
+def _cpu_limit_exceeded(signum, frame):
+    raise AnalysisTimeout('CPU time limit exceeded')
+
+def _init_worker():
+    if _HAS_ITIMER: signal.signal(signal.SIGPROF, _cpu_limit_exceeded)
+
+def _warm():
+    return True
+
+def _analyze_in_worker(code: str, cpu_timeout: float):
+    # ITIMER_PROF counts this process's CPU time, so a busy host does not cause false timeouts.
+    if _HAS_ITIMER and cpu_timeout: signal.setitimer(signal.ITIMER_PROF, cpu_timeout)
+    try:
+        return analyze(code)
+    finally:
+        if _HAS_ITIMER: signal.setitimer(signal.ITIMER_PROF, 0)
+
+class AnalysisPool:
+    """Bounded process pool for analyze(); rejects work instead of queueing without limit.
+
+    Admission is weighted by size: jobs in flight may hold at most ``max_bytes`` characters of
+    source between them (0: no byte budget), as well as at most workers + queue_depth jobs.
+    Parse and rule time grow with the source, so one large submission takes the room of
+    many small ones.
+    """
+    def __init__(self, workers: int, queue_depth: int, cpu_timeout: float, wall_timeout: float, max_bytes: int=0):
+        self.workers=workers; self.cpu_timeout=cpu_timeout; self.wall_timeout=wall_timeout
+        self.max_jobs=workers+queue_depth; self.max_bytes=max_bytes
+        self._jobs=0; self._bytes=0; self._admit=threading.Lock()
+        self._lock=threading.Lock()
+        self._executor=self._start()
+    def _start(self)->ProcessPoolExecutor:
+        executor=ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'), initializer=_init_worker)
+        # Spawn every worker up front so the first requests do not pay interpreter start-up.
+        for f in [executor.submit(_warm) for _ in range(self.workers)]: f.result()
+        return executor
+    def _acquire(self, size: int):
+        if self.max_bytes and size>self.max_bytes: raise AnalysisTooLarge()
+        with self._admit:
+            if self._jobs>=self.max_jobs or self.max_bytes and self._bytes+size>self.max_bytes: raise AnalysisBusy()
+            self._jobs+=1; self._bytes+=size
+    def _release(self, size: int):
+        with self._admit:
+            self._jobs-=1; self._bytes-=size
+    def run(self, code: str)->List[Issue]:
+        size=len(code); self._acquire(size)
+        try:
+            future=self._executor.submit(_analyze_in_worker, code, self.cpu_timeout)
+        except BrokenProcessPool:
+            self._release(size); self._restart(); raise AnalysisBusy()
+        future.add_done_callback(lambda f: self._release(size))
+        try:
+            return future.result(timeout=self.wall_timeout)
+        except FutureTimeout:
+            raise AnalysisTimeout('Wall-clock limit exceeded')
+        except BrokenProcessPool:
+            self._restart(); raise AnalysisBusy()
+    def _restart(self):
+        with self._lock:
+            old=self._executor
+            if not getattr(old, '_broken', False): return
+            self._executor=self._start()
+        old.shutdown(wait=False, cancel_futures=True)
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+_pool=None
+_pool_lock=threading.Lock()
+
+def get_analysis_pool()->Optional[AnalysisPool]:
+    """The per-process pool, created (and warmed) on first use; None when ANALYSIS_POOL_WORKERS is 0."""
+    global _pool
+    if _pool is None and settings.ANALYSIS_POOL_WORKERS>0:
+        with _pool_lock:
+            if _pool is None:
+                _pool=AnalysisPool(settings.ANALYSIS_POOL_WORKERS, settings.ANALYSIS_POOL_QUEUE_DEPTH, settings.ANALYSIS_CPU_TIMEOUT, settings.ANALYSIS_WALL_TIMEOUT,
+                                   settings.ANALYSIS_POOL_MAX_BYTES)
+    return _pool
+
+def run_analysis(code: str)->List[Issue]:
+    """Analyze in the pool when one is configured, otherwise synchronously in this process."""
+    pool=get_analysis_pool()
+    return pool.run(code) if pool is not None else analyze(code)
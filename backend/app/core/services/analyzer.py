@@ -0,0 +1,107 @@
+import ast
+from typing import Dict, List, Tuple, Type
+
+# Bump whenever rules or their messages change so cached results are not reused.
+RULESET_VERSION='2'
+
+Issue=Dict[str, str]
+
+class Rule:
+    """A check run by the single-pass engine.
+
+    ``enter_types``/``leave_types`` name the node classes the rule wants; the engine calls
+    ``enter``/``leave`` for those nodes only, in source (pre-order) traversal order.
+    A fresh instance is created for every analyze() call, so rules may keep state.
+    """
+    name=''
+    enter_types: Tuple[Type[ast.AST], ...]=()
+    leave_types: Tuple[Type[ast.AST], ...]=()
+    def __init__(self): self.issues: List[Issue]=[]
+    def enter(self, node): pass
+    def leave(self, node): pass
+    def finish(self)->List[Issue]: return self.issues
+    def report(self, message: str, severity: str): self.issues.append({'rule':self.name,'message':message,'severity':severity})
+
+RULES: List[Type[Rule]]=[]
+_dispatch=None
+
+def register(cls: Type[Rule])->Type[Rule]:
+    global _dispatch
+    RULES.append(cls); _dispatch=None
+    return cls
+
+def _build_dispatch():
+    enter, leave={}, {}
+    for i, cls in enumerate(RULES):
+        for t in cls.enter_types: enter.setdefault(t, []).append(i)
+        for t in cls.leave_types: leave.setdefault(t, []).append(i)
+    return enter, leave
+
+def run_rules(tree: ast.AST)->List[Issue]:
+    """Walk ``tree`` once, dispatching each node to every rule registered for its type."""
+    global _dispatch
+    if _dispatch is None: _dispatch=_build_dispatch()
+    enter, leave=_dispatch
+    rules=[cls() for cls in RULES]
+    # Iterative pre-order DFS (same order as ast.NodeVisitor); a None marker before a
+    # node schedules its leave callbacks once its subtree is done.
+    stack=[tree]
+    while stack:
+        node=stack.pop()
+        if node is None:
+            done=stack.pop()
+            for i in leave[type(done)]: rules[i].leave(done)
+            continue
+        t=type(node)
+        for i in enter.get(t, ()): rules[i].enter(node)
+        if t in leave: stack.append(node); stack.append(None)
+        children=list(ast.iter_child_nodes(node)); children.reverse()
+        stack.extend(children)
+    issues=[]
+    for r in rules: issues.extend(r.finish())
+    return issues
+
+@register
+class UnusedArgRule(Rule):
+    """Tracks loaded names per function scope; names used in nested functions count for enclosing ones."""
+    name='unused-arg'
+    enter_types=(ast.FunctionDef, ast.Name)
+    leave_types=(ast.FunctionDef,)
+    def __init__(self):
+        super().__init__()
+        self.frames=[]; self.slots=[]
+    def enter(self, node):
+        if type(node) is ast.Name:
+            if self.frames and isinstance(node.ctx, ast.Load): self.frames[-1][1].add(node.id)
+            return
+        # Reserve the slot now so functions report in source order, outer before nested.
+        slot=[]; self.slots.append(slot)
+        self.frames.append(([a.arg for a in node.args.args], set(), slot))
+    def leave(self, node):
+        args, used, slot=self.frames.pop()
+        for a in args:
+            if a not in used: slot.append({'rule':self.name,'message':f'Function arg "{a}" appears unused.','severity':'info'})
+        if self.frames: self.frames[-1][1].update(used)
+    def finish(self):
+        return [issue for slot in self.slots for issue in slot]
+
+@register
+class BareExceptRule(Rule):
+    name='bare-except'
+    enter_types=(ast.ExceptHandler,)
+    def enter(self, node):
+        if node.type is None: self.report('Avoid bare except; catch specific exceptions.', 'warn')
+
+@register
+class PrintCallRule(Rule):
+    name='print-call'
+    enter_types=(ast.Call,)
+    def enter(self, node):
+        if getattr(node.func,'id',None)=='print': self.report('Avoid print statements; use logging.', 'info')
+
+def analyze(code: str)->List[Issue]:
+    try:
+        tree=ast.parse(code)
+    except SyntaxError as e:
+        return [{'rule':'syntax-error','message':str(e),'severity':'error'}]
+    return run_rules(tree)
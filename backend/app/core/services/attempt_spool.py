@@ -0,0 +1,122 @@
+"""Write-behind buffer for POST /api/attempts/ (ATTEMPT_WRITE_BEHIND).
+
+Validated attempts are appended to a local SQLite spool (WAL, synchronous=FULL), so an
+acknowledged attempt survives a worker crash. A flusher thread in each process drains
+the spool through ingest_attempts in batches. Workers on one host share the spool file;
+an flock on ``<path>.lock`` lets only one of them flush at a time, and whichever starts
+next picks up rows a crashed worker left behind.
+
+Delivery is at-least-once: a crash after the database commit but before the batch is
+deleted from the spool replays that batch. Every spooled row carries a random
+``ingest_key`` (unique on Attempt), and ingest_attempts skips keys it already stored, so
+the replay inserts nothing twice and stats are applied once.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+from django.conf import settings
+from django.db import close_old_connections
+from .ingest import ingest_attempts
+
+logger=logging.getLogger(__name__)
+
+def spool_row(validated: dict)->dict:
+    """AttemptCreateSerializer.validated_data as the raw-id row AttemptBulkRowSerializer expects, with a fresh ingest_key."""
+    return {**validated, 'student':validated['student'].pk, 'lesson':validated['lesson'].pk, 'timestamp':validated['timestamp'].isoformat(),
+            'ingest_key':str(uuid.uuid4())}
+
+class AttemptSpool:
+    def __init__(self, path: str, batch_size: int=500):
+        self.path=path; self.batch_size=batch_size
+        self._local=threading.local()
+        self._lock_file=open(path+'.lock', 'a')
+        self._flush_lock=threading.Lock()  # flock is per open file, so threads also need a lock
+        self._wake=threading.Event(); self._idle=threading.Condition()
+        self._thread=None; self._stopping=False
+        self._db().execute('CREATE TABLE IF NOT EXISTS attempt_spool (id INTEGER PRIMARY KEY AUTOINCREMENT, row TEXT NOT NULL)')
+    def _db(self)->sqlite3.Connection:
+        db=getattr(self._local, 'db', None)
+        if db is None:
+            # Autocommit: every INSERT/DELETE is its own durable transaction.
+            db=self._local.db=sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL'); db.execute('PRAGMA synchronous=FULL')
+        return db
+    def append(self, row: dict)->int:
+        """Durably queue one attempt row; returns its spool id."""
+        return self._db().execute('INSERT INTO attempt_spool (row) VALUES (?)', (json.dumps(row),)).lastrowid
+    def pending(self)->int:
+        return self._db().execute('SELECT COUNT(*) FROM attempt_spool').fetchone()[0]
+    @contextmanager
+    def _exclusive(self):
+        import fcntl  # POSIX only; imported here so the app still starts on Windows with write-behind off
+        with self._flush_lock:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+    def drain(self)->int:
+        """Flush everything queued so far in batches; returns attempts created.
+
+        Rows that no longer validate (e.g. their student was deleted) are logged and dropped.
+        Database errors propagate and leave the current batch queued.
+        """
+        created=0
+        with self._exclusive():
+            while batch:=self._db().execute('SELECT id, row FROM attempt_spool ORDER BY id LIMIT ?', (self.batch_size,)).fetchall():
+                n, errors=ingest_attempts([json.loads(row) for _, row in batch], chunk_size=self.batch_size)
+                for e in errors: logger.warning('Dropping spooled attempt %d: %s', batch[e['index']][0], e['errors'])
+                self._db().execute('DELETE FROM attempt_spool WHERE id<=?', (batch[-1][0],))
+                created+=n
+        return created
+    def start(self, interval: float):
+        """Start the flusher thread; its first pass recovers rows left from a previous run."""
+        if self._thread is None:
+            self._thread=threading.Thread(target=self._run, args=(interval,), name='attempt-spool-flusher', daemon=True)
+            self._thread.start()
+    def stop(self, timeout: float=10.0):
+        self._stopping=True; self._wake.set()
+        if self._thread is not None: self._thread.join(timeout)
+        self._thread=None
+    def _run(self, interval: float):
+        while not self._stopping:
+            self._wake.clear()
+            try:
+                self.drain()
+            except Exception:
+                logger.exception('Attempt spool flush failed; retrying in %.1fs', interval)
+            finally:
+                close_old_connections()
+            with self._idle: self._idle.notify_all()
+            self._wake.wait(interval)
+    def wait_flushed(self, timeout: float=10.0)->bool:
+        """Block until the spool is empty, waking the flusher (or draining inline without one)."""
+        if self._thread is None:
+            self.drain(); return self.pending()==0
+        deadline=time.monotonic()+timeout
+        with self._idle:
+            while self.pending():
+                remaining=deadline-time.monotonic()
+                if remaining<=0: return False
+                self._wake.set(); self._idle.wait(remaining)
+        return True
+
+_spool=None
+_spool_lock=threading.Lock()
+
+def get_attempt_spool()->Optional[AttemptSpool]:
+    """The per-process spool, its flusher started on first use; None unless ATTEMPT_WRITE_BEHIND is on."""
+    global _spool
+    if not settings.ATTEMPT_WRITE_BEHIND: return None
+    if _spool is None or _spool.path!=settings.ATTEMPT_SPOOL_PATH:
+        with _spool_lock:
+            if _spool is None or _spool.path!=settings.ATTEMPT_SPOOL_PATH:
+                if _spool is not None: _spool.stop()
+                _spool=AttemptSpool(settings.ATTEMPT_SPOOL_PATH, settings.ATTEMPT_SPOOL_BATCH_SIZE)
+                if settings.ATTEMPT_SPOOL_FLUSH_INTERVAL>0: _spool.start(settings.ATTEMPT_SPOOL_FLUSH_INTERVAL)
+    return _spool
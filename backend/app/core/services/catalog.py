@@ -0,0 +1,80 @@
+"""Rendered catalog payloads (courses, lessons) keyed by a catalog version.
+
+The version lives in CATALOG_VERSION_CACHE_ALIAS, which must be shared by every worker:
+a Course/Lesson change sets a fresh version once it commits, and every worker stops
+serving older payloads. Payloads never change under a given version, so
+CATALOG_CACHE_ALIAS may be process-local.
+"""
+import hashlib
+import time
+from typing import Awaitable, Callable, Tuple
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from ..db_router import pin_catalog, primary
+from ..metrics import rendering
+from ..renderers import dumps
+
+VERSION_KEY='catalog:version'
+
+def _cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+def _versions():
+    return caches[settings.CATALOG_VERSION_CACHE_ALIAS]
+
+def catalog_version()->int:
+    v=_versions().get(VERSION_KEY)
+    if v is None:
+        # Seed from the clock rather than 1 so a lost key never reuses an old version's payloads.
+        _versions().add(VERSION_KEY, time.time_ns(), None)
+        v=_versions().get(VERSION_KEY)
+    return v
+
+async def acatalog_version()->int:
+    v=await _versions().aget(VERSION_KEY)
+    if v is None:
+        await _versions().aadd(VERSION_KEY, time.time_ns(), None)
+        v=await _versions().aget(VERSION_KEY)
+    return v
+
+def _bump():
+    # A fresh value rather than incr: two racing bumps on a backend without an atomic incr
+    # could otherwise both write the same number.
+    pin_catalog(); _versions().set(VERSION_KEY, time.time_ns(), None)
+
+def bump_catalog_version(**kwargs):
+    """Signal receiver for Course/Lesson changes: makes every cached catalog payload unreachable.
+
+    Deferred to commit, so no request can rebuild from pre-commit rows under the new version.
+    """
+    transaction.on_commit(_bump)
+
+def cached_payload(name: str, build: Callable[[], object])->Tuple[bytes, str]:
+    """Rendered JSON body and strong ETag for ``name`` at the current catalog version.
+
+    ``build`` runs only on a miss, against the primary so a lagging replica's catalog is never
+    cached under the new version; exceptions it raises propagate and nothing is cached.
+    The ETag hashes the body, so workers with separate caches agree on it.
+    """
+    key=f'catalog:{catalog_version()}:{name}'
+    hit=_cache().get(key)
+    if hit is not None: return hit
+    with primary():
+        payload=build()
+        with rendering(): body=dumps(payload)
+    entry=(body, '"'+hashlib.sha256(body).hexdigest()[:32]+'"')
+    _cache().set(key, entry, settings.CATALOG_CACHE_TIMEOUT)
+    return entry
+
+async def acached_payload(name: str, build: Callable[[], Awaitable[object]])->Tuple[bytes, str]:
+    """Async cached_payload; ``build`` is a coroutine function using the async ORM."""
+    key=f'catalog:{await acatalog_version()}:{name}'
+    hit=await _cache().aget(key)
+    if hit is not None: return hit
+    with primary():
+        payload=await build()
+        with rendering(): body=dumps(payload)
+    entry=(body, '"'+hashlib.sha256(body).hexdigest()[:32]+'"')
+    await _cache().aset(key, entry, settings.CATALOG_CACHE_TIMEOUT)
+    return entry
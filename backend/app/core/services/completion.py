@@ -0,0 +1,128 @@
+"""Per-student lesson completion bitmaps and next_up resolution.
+
+StudentCourseStats.completed stores one bit per lesson, little-endian: bit n is the lesson
+with Lesson.position n, its rank in the course by (order_index, id). order_index is not
+unique and can be large, so it is not used directly. A lesson counts as completed once an
+attempt on it reaches MASTERY_THRESHOLD, the same bar that masters its tags.
+
+LessonOrder keeps every course's (order_index, title) sequence in process memory, so
+next_up for all courses is a bit test per lesson and needs no queries.
+
+Saving or deleting a lesson renumbers its course (renumber_lessons); when any position
+changes, the affected courses' bitmaps are rewritten from attempts (recompute_completed).
+Lessons created with bulk_create must set position themselves.
+"""
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Tuple
+from django.conf import settings
+from django.db import transaction
+from ..db_router import primary
+from ..models import Attempt, Lesson, StudentCourseStats
+from .features import MASTERY_THRESHOLD
+
+def decode(raw)->int:
+    return int.from_bytes(raw or b'', 'little')
+
+def encode(bits: int)->bytes:
+    return bits.to_bytes((bits.bit_length()+7)//8, 'little')
+
+def completed_bits(attempts: Iterable[Attempt])->Dict[Tuple[int, int], int]:
+    """(student_id, course_id) -> bits for the lessons these attempts passed."""
+    bits=defaultdict(int)
+    for a in attempts:
+        if a.correctness>=MASTERY_THRESHOLD: bits[(a.student_id, a.lesson.course_id)]|=1<<a.lesson.position
+    return bits
+
+def mastered_bits(attempts)->Dict[Tuple[int, int], int]:
+    """completed_bits for an Attempt queryset, computed from one DISTINCT query instead of model instances."""
+    bits=defaultdict(int)
+    for student_id, course_id, position in (attempts.filter(correctness__gte=MASTERY_THRESHOLD).values_list('student_id','lesson__course_id','lesson__position')
+                                            .distinct().order_by().iterator(chunk_size=2000)):
+        bits[(student_id, course_id)]|=1<<position
+    return bits
+
+def recompute_completed(course_ids: Iterable[int])->int:
+    """Rewrite StudentCourseStats.completed for ``course_ids`` from attempts; returns rows changed.
+
+    The stats rows are locked first, so an attempt committed meanwhile is either seen here
+    or OR-ed in by its writer after this transaction commits.
+    """
+    course_ids=set(course_ids)
+    with transaction.atomic():
+        rows=list(StudentCourseStats.objects.select_for_update().filter(course_id__in=course_ids).only('student_id','course_id','completed').order_by('id'))
+        bits=mastered_bits(Attempt.objects.filter(lesson__course_id__in=course_ids))
+        changed=[]
+        for row in rows:
+            new=encode(bits[(row.student_id, row.course_id)])
+            if bytes(row.completed or b'')!=new:
+                row.completed=new; changed.append(row)
+        StudentCourseStats.objects.bulk_update(changed, ['completed'], batch_size=1000)
+    return len(changed)
+
+def renumber_lessons(course_ids: Iterable[int])->Dict[int, int]:
+    """Set Lesson.position to each lesson's rank in its course by (order_index, id); returns {lesson id: new position} for those that changed."""
+    changed=[]; rank=defaultdict(int)
+    for lesson in Lesson.objects.filter(course_id__in=set(course_ids)).only('course_id','position').order_by('course_id','order_index','id'):
+        position=rank[lesson.course_id]; rank[lesson.course_id]+=1
+        if lesson.position!=position:
+            lesson.position=position; changed.append(lesson)
+    Lesson.objects.bulk_update(changed, ['position'], batch_size=1000)
+    return {lesson.pk:lesson.position for lesson in changed}
+
+def lesson_moving(sender, instance, raw=False, **kwargs):
+    """pre_save: remember the lesson's course and order, for lesson_moved."""
+    if raw or instance.pk is None: return
+    instance._completion_was=Lesson.objects.filter(pk=instance.pk).values_list('course_id','order_index').first()
+
+def lesson_moved(sender, instance, created=False, raw=False, **kwargs):
+    """post_save: renumber the courses a new or reordered lesson left or joined, rewriting bitmaps if positions moved."""
+    if raw: return
+    was=getattr(instance, '_completion_was', None)
+    if not created and was==(instance.course_id, instance.order_index): return
+    courses={instance.course_id} if was is None else {was[0], instance.course_id}
+    with transaction.atomic():
+        moved=renumber_lessons(courses)
+        if instance.pk in moved: instance.position=moved[instance.pk]
+        # A lesson appended to the end moves only itself and holds no bits yet.
+        if moved.keys()-({instance.pk} if created else set()) or len(courses)>1: recompute_completed(courses)
+
+def lesson_deleted(sender, instance, **kwargs):
+    """post_delete: close the gap the lesson left, shifting later lessons' bits down."""
+    with transaction.atomic():
+        if renumber_lessons({instance.course_id}): recompute_completed({instance.course_id})
+
+class LessonOrder:
+    """Each course's lessons as (position, title), in position order."""
+    def __init__(self, rows: Iterable[Tuple[int, int, str]]):
+        courses=defaultdict(list)
+        for course_id, position, title in rows: courses[course_id].append((position, title))
+        self.courses={cid:tuple(seq) for cid, seq in courses.items()}
+        self.built_at=time.monotonic()
+    @classmethod
+    def from_db(cls)->'LessonOrder':
+        with primary(): return cls(Lesson.objects.order_by('course_id','position','id').values_list('course_id','position','title').iterator(chunk_size=2000))
+    def next_up(self, course_id: int, completed: int)->Optional[str]:
+        """Title of the course's first lesson not set in ``completed``; None once all are done."""
+        for position, title in self.courses.get(course_id, ()):
+            if not completed>>position & 1: return title
+        return None
+
+_order: Optional[LessonOrder]=None
+_lock=threading.Lock()
+
+def get_lesson_order()->LessonOrder:
+    """This process's LessonOrder; rebuilt after a Lesson signal or once TAG_INDEX_TTL seconds pass."""
+    global _order
+    order=_order
+    if order is None or time.monotonic()-order.built_at>settings.TAG_INDEX_TTL:
+        with _lock:
+            order=_order
+            if order is None or time.monotonic()-order.built_at>settings.TAG_INDEX_TTL:
+                order=_order=LessonOrder.from_db()
+    return order
+
+def invalidate_lesson_order(**kwargs):
+    global _order
+    _order=None
@@ -0,0 +1,89 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from django.db import IntegrityError, connection, transaction
+from ..models import Attempt, StudentFeatures
+from .tag_index import TagIndex
+
+# An attempt at or above this correctness masters every tag of its lesson.
+MASTERY_THRESHOLD=0.7
+# Recency gaps are capped so one long-abandoned course cannot swamp the other features.
+RECENCY_CAP_DAYS=30.0
+
+def _fold(courses: Dict[str, list], mastered: Set[str], attempts: Iterable[Attempt]):
+    for a in attempts:
+        entry=courses.setdefault(str(a.lesson.course_id), [0, None, 0])
+        ts=a.timestamp.timestamp()
+        entry[0]+=1; entry[2]+=a.hints_used
+        if entry[1] is None or ts>entry[1]: entry[1]=ts
+        if a.correctness>=MASTERY_THRESHOLD: mastered.update(a.lesson.tags or ())
+
+def apply_attempts(attempts: Iterable[Attempt]):
+    """Fold newly written attempts into StudentFeatures. Call inside the transaction that wrote them."""
+    by_student=defaultdict(list)
+    for a in attempts: by_student[a.student_id].append(a)
+    # Lock in student id order, so two batches covering the same students cannot deadlock.
+    for student_id in sorted(by_student):
+        items=by_student[student_id]
+        # Row lock serializes concurrent read-modify-write of the same student's vector.
+        f=StudentFeatures.objects.select_for_update().filter(student_id=student_id).first()
+        if f is None:
+            try:
+                with transaction.atomic():
+                    f=StudentFeatures.objects.create(student_id=student_id)
+            except IntegrityError:
+                f=StudentFeatures.objects.select_for_update().get(student_id=student_id)
+        mastered=set(f.mastered_tags)
+        _fold(f.courses, mastered, items)
+        f.mastered_tags=sorted(mastered)
+        f.save(update_fields=['courses','mastered_tags','updated_at'])
+
+def _vectors(attempts)->Dict[int, Tuple[dict, set]]:
+    vectors=defaultdict(lambda: ({}, set()))
+    for a in attempts.select_related('lesson').only('student_id','timestamp','correctness','hints_used','lesson__course_id','lesson__tags').iterator(chunk_size=2000):
+        courses, mastered=vectors[a.student_id]
+        _fold(courses, mastered, [a])
+    return vectors
+
+def _upsert(vectors)->int:
+    objs=StudentFeatures.objects.bulk_create((StudentFeatures(student_id=sid, courses=c, mastered_tags=sorted(m)) for sid, (c, m) in vectors.items()), batch_size=1000,
+                                             update_conflicts=True, unique_fields=['student'], update_fields=['courses','mastered_tags','updated_at'])
+    return len(objs)
+
+def recompute_students(student_ids: Iterable[int])->int:
+    """Rewrite the StudentFeatures rows of ``student_ids`` from Attempt, after attempts were edited or deleted; returns rows written."""
+    student_ids=sorted(set(student_ids))
+    if not student_ids: return 0
+    with transaction.atomic():
+        list(StudentFeatures.objects.select_for_update().filter(student_id__in=student_ids).order_by('student_id').values_list('student_id'))
+        vectors=_vectors(Attempt.objects.filter(student_id__in=student_ids))
+        StudentFeatures.objects.filter(student_id__in=set(student_ids)-vectors.keys()).delete()
+        return _upsert(vectors)
+
+def rebuild_features()->int:
+    """Recompute every StudentFeatures row from Attempt in place; returns the number of rows written."""
+    with transaction.atomic():
+        if connection.vendor=='postgresql':
+            # As in rebuild_stats: writers wait for the rebuild instead of having their updates overwritten.
+            with connection.cursor() as cur: cur.execute(f'LOCK TABLE {StudentFeatures._meta.db_table} IN SHARE ROW EXCLUSIVE MODE')
+        vectors=_vectors(Attempt.objects.all())
+        StudentFeatures.objects.exclude(student_id__in=Attempt.objects.values('student_id')).delete()
+        return _upsert(vectors)
+
+def feature_columns(features: Optional[StudentFeatures], course_ids: Sequence[int], tag_index: TagIndex, now: datetime)->Tuple[List[float], List[float], List[float], List[float]]:
+    """score_batch inputs (progress, recency_gap_days, tag_gap, hint_rate) for each course.
+
+    Courses the student has never attempted get a recency gap of 0; a course without
+    tags has no tag gap.
+    """
+    courses=features.courses if features else {}
+    mastered=tag_index.mask(features.mastered_tags) if features else 0
+    now_ts=now.timestamp()
+    progress=[]; recency=[]; tag_gap=[]; hint_rate=[]
+    for cid in course_ids:
+        count, last_ts, hints=courses.get(str(cid), (0, None, 0))
+        progress.append(min(100, count*10))
+        recency.append(min(RECENCY_CAP_DAYS, max(0.0, (now_ts-last_ts)/86400)) if last_ts is not None else 0.0)
+        tag_gap.append(tag_index.tag_gap(cid, mastered))
+        hint_rate.append((hints/count if count else 0)/3.0)
+    return progress, recency, tag_gap, hint_rate
@@ -0,0 +1,214 @@
+"""Incremental analyze-code for editor sessions.
+
+A document is split into top-level statements (decorators and else/except/finally
+clauses stay with their statement) by one regex pass over its strings, comments and brackets.
+Each statement is analyzed on its own through the content-hash AnalysisCache. The rules
+are all function-local, so per-statement results equal whole-file ones.
+Documents keep their statement offsets, hashes and issues (Document), so an edit
+re-splits and re-analyzes only the statements around it and shifts the rest: the cost of
+a keystroke does not grow with the document. A statement that only moves keeps its
+diagnostic ids, so clients receive added/removed deltas rather than full lists.
+
+Document state (version and its Document) lives in ANALYSIS_DOCUMENT_CACHE_ALIAS,
+which must be shared by every worker (settings_prod checks this). A client told the
+document is unknown resends the full text.
+"""
+import hashlib
+import re
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from django.conf import settings
+from django.core.cache import caches
+from .analyzer import Issue
+
+MAX_DOCUMENT_CHARS=10000
+
+# Column-0 lines that can begin a statement; a clause keyword continues the previous one.
+_STATEMENT_START=re.compile(r'^(?![\s#)\]}]|(?:else|elif|except|finally)\b)', re.M)
+# What can hide a column-0 line from the parser: strings (an unterminated one runs to the end
+# of its line, or of the text if triple-quoted), brackets and backslash continuations.
+# Comments are matched only so that quotes and brackets inside them are skipped.
+_TOKEN=re.compile('|'.join((
+    r'"""(?:\\.|[^\\])*?(?:"""|\Z)', r"'''(?:\\.|[^\\])*?(?:'''|\Z)",
+    r'"(?:\\.|[^"\\\n])*"?', r"'(?:\\.|[^'\\\n])*'?",
+    r'#[^\n]*', r'[(\[{)\]}]', r'\\\n')), re.S)
+_SYNTAX_LINE=re.compile(r'line (\d+)\)$')
+
+class EditError(ValueError):
+    pass
+
+def _hidden_spans(text: str, begin: int=0)->Iterator[Tuple[int, int]]:
+    """Disjoint (start, end) ranges from ``begin``, in order, in which no new statement can begin."""
+    depth=0; opened=0
+    for m in _TOKEN.finditer(text, begin):
+        c=text[m.start()]
+        if c in '([{':
+            if not depth: opened=m.start()
+            depth+=1
+        elif c in ')]}':
+            if depth:
+                depth-=1
+                if not depth: yield opened, m.end()
+        elif depth: continue
+        elif c=='\\': yield m.start(), m.end()+1
+        elif c!='#' and '\n' in m.group(): yield m.span()
+    if depth: yield opened, len(text)
+
+def _statements(text: str, begin: int=0, line: int=1)->Iterator[Tuple[int, int, int]]:
+    """Lazily yield (start, end, first line) per statement, scanning from ``begin``, which must be a statement start.
+
+    Column-0 lines are candidate starts. A candidate inside a multi-line string, open
+    brackets or a backslash continuation is skipped, as is one following a decorator line.
+    Scanning stops when the caller stops, so a local re-split does not read the whole text.
+    """
+    spans=_hidden_spans(text, begin); hidden=next(spans, None)
+    decorator=text.startswith('@', begin); emitted=False
+    for m in _STATEMENT_START.finditer(text, begin+1):
+        at=m.start()
+        if at>=len(text): break
+        while hidden and hidden[1]<=at: hidden=next(spans, None)
+        if hidden and hidden[0]<at: continue
+        if not decorator:
+            yield begin, at, line
+            emitted=True; line+=text.count('\n', begin, at); begin=at
+        decorator=text.startswith('@', at)
+    if begin<len(text) or not emitted: yield begin, len(text), line
+
+def split_statements(text: str)->List[Tuple[int, str]]:
+    """(first line, source) for each top-level statement; comments and blank lines join the one before."""
+    return [(line, text[start:end]) for start, end, line in _statements(text)]
+
+def _check_size(length: int):
+    if length>MAX_DOCUMENT_CHARS: raise EditError(f'Code too large (max {MAX_DOCUMENT_CHARS // 1000}KB)')
+
+def _edit(e: dict, length: int)->Tuple[int, int, str]:
+    try:
+        start, end, new=int(e['start']), int(e['end']), e.get('text', '')
+    except (KeyError, TypeError, ValueError):
+        raise EditError('Each edit needs integer start/end and optional text.')
+    if not isinstance(new, str) or not 0<=start<=end<=length: raise EditError(f'Edit range {start}-{end} is outside the document.')
+    return start, end, new
+
+def apply_edits(text: str, edits: Sequence[dict])->str:
+    """Apply {'start','end','text'} edits in order; offsets index the text as left by the previous edit."""
+    for e in edits:
+        start, end, new=_edit(e, len(text))
+        text=text[:start]+new+text[end:]
+    return text
+
+def _digest(source: str)->str:
+    return hashlib.sha256(source.encode('utf-8', 'surrogatepass')).hexdigest()[:16]
+
+def _absolute(issue: Issue, line: int)->Issue:
+    if issue['rule']=='syntax-error' and line>1:
+        # Cached by statement content, so the line is relative; shift it for this position.
+        return {**issue, 'message':_SYNTAX_LINE.sub(lambda m: f'line {int(m.group(1))+line-1})', issue['message'])}
+    return issue
+
+class Document:
+    """A text split into statements, each kept with its offset, first line, hash, id and issues.
+
+    An edit re-splits from the statement it touches until a boundary lines up with an old
+    one again (boundaries are always outside strings and brackets, so everything after
+    them splits as before); only those statements are hashed and analyzed, the rest just
+    shift. Issue ids are '<statement hash>:<statement id>:<n>', and a re-split statement
+    whose source is unchanged keeps its id, so its issues are neither added nor removed.
+    """
+    def __init__(self, text: str, analyze: Callable[[str], List[Issue]]):
+        self.text=''; self.starts=[0]; self.lines=[1]; self.statements=[('', -1, [])]; self.next_id=0
+        self.edit(0, 0, text, analyze)
+    def issues(self)->Dict[str, Issue]:
+        """All issues keyed by id, in document order, with absolute syntax-error lines."""
+        return {k:v for i in range(len(self.starts)) for k, v in self._issues(i).items()}
+    def _issues(self, i: int)->Dict[str, Issue]:
+        digest, sid, issues=self.statements[i]
+        return {f'{digest}:{sid}:{n}':_absolute(issue, self.lines[i]) for n, issue in enumerate(issues)}
+    def edit(self, start: int, end: int, new: str, analyze: Callable[[str], List[Issue]])->Tuple[Dict[str, Issue], List[str]]:
+        """Replace text[start:end] with ``new``; returns (added issues by id, removed ids)."""
+        old, text=self.text, self.text[:start]+new+self.text[end:]
+        delta=len(new)-(end-start); shift=new.count('\n')-old.count('\n', start, end)
+        # The edit can join its statement to the previous one (e.g. by indenting its first line).
+        first=max(0, bisect_right(self.starts, start)-1)
+        if first and self.starts[first]==start: first-=1
+        stop, resplit=len(self.starts), []
+        for s, e, line in _statements(text, self.starts[first], self.lines[first]):
+            resplit.append((s, e, line))
+            if e>=start+len(new) and e<len(text):
+                j=bisect_left(self.starts, e-delta)
+                if j<len(self.starts) and self.starts[j]==e-delta and j>first:
+                    stop=j; break
+        reusable=defaultdict(list)
+        for i in range(first, stop): reusable[self.statements[i][0]].append(i)
+        removed={k:None for i in range(first, stop) for k in self._issues(i)}
+        starts, lines, statements=[], [], []
+        for s, e, line in resplit:
+            source=text[s:e]; digest=_digest(source)
+            if reusable[digest]:
+                _, sid, issues=self.statements[reusable[digest].pop(0)]
+            else:
+                sid=self.next_id; self.next_id+=1; issues=analyze(source)
+            starts.append(s); lines.append(line); statements.append((digest, sid, issues))
+        self.starts[first:]=starts+[s+delta for s in self.starts[stop:]]
+        self.lines[first:]=lines+[n+shift for n in self.lines[stop:]]
+        self.statements[first:stop]=statements
+        self.text=text
+        added={}
+        for i in range(first, first+len(starts)):
+            for k, issue in self._issues(i).items():
+                if k in removed: del removed[k]
+                else: added[k]=issue
+        return added, list(removed)
+
+def diagnostics(text: str, analyze: Callable[[str], List[Issue]])->Dict[str, Issue]:
+    """Issues of a whole text keyed by id, in document order."""
+    return Document(text, analyze).issues()
+
+class DocumentStore:
+    """Documents in a cache every worker shares, with one writer per version.
+
+    Each new version is claimed with ``add`` on ``<key>:v<version>`` before the state is
+    written, so two concurrent edits to one base version cannot both apply: the loser
+    gets None (409) and rebases. A claim only has to outlive one update, hence CLAIM_SECONDS.
+    """
+    CLAIM_SECONDS=60
+    def __init__(self, alias: str, timeout: int):
+        self.cache=caches[alias]; self.timeout=timeout
+    def _claim(self, key: str, state: Optional[dict], retries: int)->Optional[int]:
+        for _ in range(retries+1):
+            version=state['version']+1 if state else 1
+            if self.cache.add(f'{key}:v{version}', 1, self.CLAIM_SECONDS): return version
+            state=self.cache.get(key)
+        return None
+    def update(self, document: str, analyze: Callable[[str], List[Issue]], text: Optional[str]=None,
+               base_version: Optional[int]=None, edits: Sequence[dict]=())->Optional[dict]:
+        """Open/replace ``document`` with ``text``, or apply ``edits`` to ``base_version``.
+
+        Returns the response body, or None when the document is unknown, not at
+        ``base_version``, or another update claimed the next version first.
+        """
+        key=f'analyze-doc:{document}'
+        state=self.cache.get(key); reset=text is not None
+        if reset:
+            _check_size(len(text))
+            doc=Document(text, analyze); added, removed=doc.issues(), []
+        else:
+            if state is None or state['version']!=base_version: return None
+            doc=state['document']; added, removed={}, []
+            for e in edits:
+                start, end, new=_edit(e, len(doc.text))
+                _check_size(len(doc.text)-(end-start)+len(new))
+                now_added, now_removed=doc.edit(start, end, new, analyze)
+                # An issue added by an earlier edit of this request and removed again never reaches the client.
+                for k in now_removed:
+                    if added.pop(k, None) is None: removed.append(k)
+                added.update(now_added)
+        # A full text replaces whatever is there, so it retries past concurrent edits.
+        version=self._claim(key, state, 2 if reset else 0)
+        if version is None: return None
+        self.cache.set(key, {'version':version,'text':doc.text,'document':doc}, self.timeout)
+        return {'document':document,'version':version,'reset':reset,
+                'added':[{'id':k, **v} for k, v in added.items()],'removed':removed}
+
+def get_document_store()->DocumentStore:
+    return DocumentStore(settings.ANALYSIS_DOCUMENT_CACHE_ALIAS, settings.ANALYSIS_DOCUMENT_TIMEOUT)
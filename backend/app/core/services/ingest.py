@@ -0,0 +1,90 @@
+import json
+from datetime import datetime
+from functools import partial
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple
+from django.db import IntegrityError, transaction
+from ..models import Student, Lesson, Attempt
+from ..serializers import AttemptBulkRowSerializer
+from .stats import apply_attempts
+from .student_cache import student_written
+
+def iter_ndjson(lines: Iterable[bytes])->Iterator[object]:
+    """Yield one decoded value per non-blank line; undecodable lines yield the ValueError instead."""
+    for line in lines:
+        if not line.strip(): continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield e
+
+def _missing(pk)->List[str]:
+    return [f'Invalid pk "{pk}" - object does not exist.']
+
+def _already_ingested(keyed: List[Tuple[object, datetime]])->set:
+    """Which (ingest_key, timestamp) ``keyed`` keys are already stored; the timestamp range lets Postgres prune partitions."""
+    keyed=[(k, ts) for k, ts in keyed if k]
+    if not keyed: return set()
+    return set(Attempt.objects.filter(ingest_key__in={k for k, _ in keyed}, timestamp__gte=min(ts for _, ts in keyed),
+                                      timestamp__lte=max(ts for _, ts in keyed)).values_list('ingest_key', flat=True))
+
+def _insert(objs: List[Attempt])->int:
+    """Write ``objs`` and their stats in one transaction; returns how many were written.
+
+    A concurrent request replaying the same batch can commit some of these ingest_keys
+    after they were checked. The unique constraint then rejects the chunk; the keys stored
+    meanwhile are dropped and the rest retried, so the replay still succeeds.
+    """
+    while objs:
+        try:
+            with transaction.atomic():
+                Attempt.objects.bulk_create(objs)
+                apply_attempts(objs)
+                for pk in {a.student_id for a in objs}: transaction.on_commit(partial(student_written, pk))
+            return len(objs)
+        except IntegrityError:
+            stored=_already_ingested([(a.ingest_key, a.timestamp) for a in objs])
+            if not stored: raise
+            objs=[a for a in objs if a.ingest_key not in stored]
+            for a in objs: a.pk=None  # ids RETURNING gave the rolled-back insert, on backends that set them
+    return 0
+
+def _ingest_chunk(chunk: List[Tuple[int, object]], errors: List[dict])->int:
+    valid=[]
+    for i, row in chunk:
+        if not isinstance(row, dict):
+            errors.append({'index':i,'errors':{'non_field_errors':[f'Invalid JSON: {row}' if isinstance(row, ValueError) else 'Expected a JSON object.']}})
+            continue
+        ser=AttemptBulkRowSerializer(data=row)
+        if ser.is_valid(): valid.append((i, ser.validated_data))
+        else: errors.append({'index':i,'errors':ser.errors})
+    students=Student.objects.in_bulk({d['student'] for _, d in valid})
+    lessons=Lesson.objects.in_bulk({d['lesson'] for _, d in valid})
+    seen=_already_ingested([(d.get('ingest_key'), d['timestamp']) for _, d in valid])
+    objs=[]
+    for i, d in valid:
+        key=d.get('ingest_key')
+        if key:
+            # A replayed row (spool crash between commit and ack) was written the first time.
+            if key in seen: continue
+            seen.add(key)
+        bad={}
+        if d['student'] not in students: bad['student']=_missing(d['student'])
+        if d['lesson'] not in lessons: bad['lesson']=_missing(d['lesson'])
+        if bad:
+            errors.append({'index':i,'errors':bad}); continue
+        objs.append(Attempt(**{**d,'student':students[d['student']],'lesson':lessons[d['lesson']]}))
+    return _insert(objs)
+
+def ingest_attempts(rows: Iterable[object], chunk_size: int=500)->Tuple[int, List[dict]]:
+    """Validate and insert attempts chunk by chunk; returns (created, per-row errors keyed by 0-based index).
+
+    Each chunk costs two in_bulk lookups and one bulk_create, and commits on its own,
+    so a bad row or chunk never discards the rows around it. Rows carrying an ``ingest_key``
+    that is already stored are skipped without an error, so replaying a batch is harmless.
+    """
+    created=0; errors=[]
+    it=enumerate(rows)
+    while chunk:=list(islice(it, chunk_size)):
+        created+=_ingest_chunk(chunk, errors)
+    return created, errors
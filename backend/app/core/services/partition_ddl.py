@@ -0,0 +1,92 @@
+"""DDL for monthly range partitioning of core_attempt; see core.services.partitions.
+
+Model-free and parameterised on the connection, so migration 0007 can run it against
+``schema_editor.connection`` without importing live models.
+"""
+import re
+from datetime import date, datetime, timezone as dt_timezone
+from typing import List, Optional, Tuple
+from django.db import connection as default_connection, transaction
+from django.utils import timezone
+
+TABLE='core_attempt'
+DEFAULT_PARTITION='core_attempt_default'
+_PARTITION=re.compile(r'core_attempt_p(\d{4})(\d{2})$')
+
+def month_start(d)->date:
+    return date(d.year, d.month, 1)
+
+def add_months(d: date, n: int)->date:
+    y, m=divmod(d.year*12+d.month-1+n, 12)
+    return date(y, m+1, 1)
+
+def month_utc(month: date)->datetime:
+    """Midnight UTC at the start of ``month``, for ORM filters on partition boundaries."""
+    return datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+
+def partition_name(month: date)->str:
+    return f'{TABLE}_p{month:%Y%m}'
+
+def month_bound(month: date)->str:
+    """month_utc as a SQL literal. DDL cannot take bind parameters; the value is generated here, never user input."""
+    return f"'{month.isoformat()} 00:00:00+00'"
+
+def is_partitioned(connection=default_connection)->bool:
+    if connection.vendor!='postgresql': return False
+    with connection.cursor() as cur:
+        cur.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid=to_regclass(%s)", [TABLE])
+        return cur.fetchone() is not None
+
+def partitions(connection=default_connection)->List[Tuple[str, date]]:
+    """Attached monthly partitions, oldest first."""
+    with connection.cursor() as cur:
+        cur.execute("SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid=i.inhrelid WHERE i.inhparent=to_regclass(%s)", [TABLE])
+        names=[r[0] for r in cur.fetchall()]
+    return sorted((n, date(int(m.group(1)), int(m.group(2)), 1)) for n in names if (m:=_PARTITION.match(n)))
+
+def _create_partition(cur, month: date):
+    """Create and attach ``month``, moving any of its rows out of the default partition first."""
+    name=partition_name(month); start, end=month_bound(month), month_bound(add_months(month, 1))
+    cur.execute(f'CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    cur.execute(f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE "timestamp">={start} AND "timestamp"<{end} RETURNING *) INSERT INTO {name} SELECT * FROM moved')
+    cur.execute(f'ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES FROM ({start}) TO ({end})')
+
+def ensure_partitions(through: date, since: Optional[date]=None, connection=default_connection)->List[str]:
+    """Create missing monthly partitions from ``since`` (default: the newest existing) up to ``through``."""
+    existing={m for _, m in partitions(connection)}
+    month=month_start(since or (max(existing) if existing else timezone.now()))
+    created=[]
+    with transaction.atomic(using=connection.alias), connection.cursor() as cur:
+        while month<=through:
+            if month not in existing:
+                _create_partition(cur, month); created.append(partition_name(month))
+            month=add_months(month, 1)
+    return created
+
+def convert_to_partitioned(ahead: int, connection=default_connection):
+    """Rebuild core_attempt as a partitioned table holding the same rows, ids, indexes, unique constraints and foreign keys."""
+    legacy=f'{TABLE}_legacy'
+    with transaction.atomic(using=connection.alias), connection.cursor() as cur:
+        cur.execute(f'ALTER TABLE {TABLE} RENAME TO {legacy}')
+        cur.execute(f'CREATE TABLE {TABLE} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY RANGE ("timestamp")')
+        cur.execute(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT')
+        cur.execute(f'SELECT MIN("timestamp"), COALESCE(MAX(id), 0) FROM {legacy}')
+        oldest, max_id=cur.fetchone()
+        month, last=month_start(oldest or timezone.now()), add_months(month_start(timezone.now()), ahead)
+        while month<=last:
+            cur.execute(f'CREATE TABLE {partition_name(month)} PARTITION OF {TABLE} FOR VALUES FROM ({month_bound(month)}) TO ({month_bound(add_months(month, 1))})')
+            month=add_months(month, 1)
+        cur.execute(f'INSERT INTO {TABLE} SELECT * FROM {legacy}')
+        cur.execute("SELECT indexdef FROM pg_indexes WHERE tablename=%s AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid=to_regclass(%s))", [legacy, legacy])
+        indexes=[re.sub(rf' ON (\S+\.)?{legacy} ', f' ON {TABLE} ', r[0]) for r in cur.fetchall()]
+        cur.execute("SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid=to_regclass(%s) AND contype IN ('f', 'u')", [legacy])
+        constraints=cur.fetchall()
+        # Dropping the old table frees its index, constraint and identity sequence names.
+        cur.execute(f'DROP TABLE {legacy}')
+        # Identity columns on partitioned tables need Postgres 17, so use an owned sequence.
+        cur.execute(f'CREATE SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id')
+        cur.execute(f"SELECT setval('{TABLE}_id_seq', %s, false)", [max_id+1])
+        cur.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_seq')")
+        cur.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY (id, "timestamp")')
+        for sql in indexes: cur.execute(sql)
+        for name, definition in constraints: cur.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}')
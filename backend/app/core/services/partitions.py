@@ -0,0 +1,95 @@
+"""Optional monthly range partitioning of core_attempt (Postgres), daily rollups and retention.
+
+With ATTEMPT_PARTITIONING on, migration 0007 (or ``manage.py attempt_partitions --convert``)
+rebuilds core_attempt as ``PARTITION BY RANGE ("timestamp")``, with one
+``core_attempt_pYYYYMM`` table per month and ``core_attempt_default`` for timestamps
+outside them. Queries that filter on timestamp then only scan matching months.
+
+The DDL lives in core.services.partition_ddl. The primary key becomes (id, timestamp), because Postgres requires the partition key in
+it. Ids still come from one sequence. The conversion copies every row in one transaction,
+so run it in a maintenance window.
+
+Rollups (AttemptDailyRollup) are written once a month has closed, and rewritten whenever
+a closed month's raw count stops matching them (late or deleted attempts). Retention then
+drops raw partitions older than N months; the rollups stay, and late rows for dropped
+months are added to them before the default partition is trimmed. Note that rebuild_stats and
+rebuild_features only see the raw attempts that remain.
+"""
+from datetime import date, timezone as dt_timezone
+from typing import Dict, List
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from ..models import Attempt, AttemptDailyRollup
+from .partition_ddl import DEFAULT_PARTITION, add_months, is_partitioned, month_bound, month_start, month_utc, partitions
+
+def _daily(attempts):
+    """Per (student, course, UTC day) totals of an Attempt queryset."""
+    return (attempts.annotate(day=TruncDate('timestamp', tzinfo=dt_timezone.utc)).values('student_id','lesson__course_id','day')
+            .annotate(n=Count('id'), correct=Sum('correctness'), hints=Sum('hints_used'), duration=Sum('duration_sec')).order_by())
+
+def rollup_month(month: date)->int:
+    """(Re)write AttemptDailyRollup rows for ``month`` from raw attempts; returns rows written."""
+    start, end=month_utc(month), month_utc(add_months(month, 1))
+    rows=_daily(Attempt.objects.filter(timestamp__gte=start, timestamp__lt=end))
+    with transaction.atomic():
+        AttemptDailyRollup.objects.filter(day__gte=start.date(), day__lt=end.date()).delete()
+        objs=AttemptDailyRollup.objects.bulk_create((AttemptDailyRollup(student_id=r['student_id'], course_id=r['lesson__course_id'], day=r['day'], attempt_count=r['n'],
+                                                                        correctness_sum=r['correct'], hint_sum=r['hints'], duration_sum=r['duration']) for r in rows.iterator()), batch_size=1000)
+    return len(objs)
+
+def add_to_rollups(attempts)->int:
+    """Add an Attempt queryset on top of the existing rollups for its days; returns rows touched.
+
+    For late attempts whose month was rolled up and dropped already, so rollup_month
+    would only see them and overwrite the month.
+    """
+    rows=list(_daily(attempts))
+    if not rows: return 0
+    existing={(r.student_id, r.course_id, r.day):r for r in AttemptDailyRollup.objects.filter(day__in={r['day'] for r in rows})}
+    changed=[]; new=[]
+    for r in rows:
+        rollup=existing.get((r['student_id'], r['lesson__course_id'], r['day']))
+        if rollup is None:
+            new.append(AttemptDailyRollup(student_id=r['student_id'], course_id=r['lesson__course_id'], day=r['day'], attempt_count=r['n'],
+                                          correctness_sum=r['correct'], hint_sum=r['hints'], duration_sum=r['duration'])); continue
+        rollup.attempt_count+=r['n']; rollup.correctness_sum+=r['correct']; rollup.hint_sum+=r['hints']; rollup.duration_sum+=r['duration']
+        changed.append(rollup)
+    AttemptDailyRollup.objects.bulk_update(changed, ['attempt_count','correctness_sum','hint_sum','duration_sum'], batch_size=1000)
+    AttemptDailyRollup.objects.bulk_create(new, batch_size=1000)
+    return len(rows)
+
+def _monthly(rows)->Dict[date, int]:
+    return {month_start(r['month']):r['n'] for r in rows}
+
+def closed_months_needing_rollup(now)->List[date]:
+    """Months before ``now``'s whose raw attempt count differs from their rollup total.
+
+    Covers months never rolled up as well as late or deleted attempts in rolled-up ones.
+    Once core_attempt is partitioned, only months that still have their partition are
+    complete enough to rewrite; late rows for dropped months go through add_to_rollups.
+    """
+    current=month_start(now)
+    raw=_monthly(Attempt.objects.filter(timestamp__lt=month_utc(current)).annotate(month=TruncMonth('timestamp', tzinfo=dt_timezone.utc)).values('month').annotate(n=Count('id')).order_by())
+    rolled=_monthly(AttemptDailyRollup.objects.filter(day__lt=current).annotate(month=TruncMonth('day')).values('month').annotate(n=Sum('attempt_count')).order_by())
+    complete={m for _, m in partitions()} if is_partitioned() else None
+    return sorted(m for m in raw.keys()|rolled.keys() if raw.get(m, 0)!=rolled.get(m, 0) and (complete is None or m in complete))
+
+def drop_partitions_before(cutoff: date)->List[str]:
+    """Drop monthly partitions (and default-partition rows) older than ``cutoff``.
+
+    Months whose rollups do not match their raw rows are re-rolled first, and
+    default-partition rows (late attempts for months already dropped) are added to the
+    rollups before they are deleted.
+    """
+    dropped=[]
+    with transaction.atomic(), connection.cursor() as cur:
+        stale=set(closed_months_needing_rollup(cutoff))
+        for name, month in partitions():
+            if month>=cutoff: break
+            if month in stale: rollup_month(month)
+            cur.execute(f'DROP TABLE {name}'); dropped.append(name)
+        # Only default-partition rows are left before the cutoff now.
+        add_to_rollups(Attempt.objects.filter(timestamp__lt=month_utc(cutoff)))
+        cur.execute(f'DELETE FROM {DEFAULT_PARTITION} WHERE "timestamp"<{month_bound(cutoff)}')
+    return dropped
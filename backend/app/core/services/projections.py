@@ -0,0 +1,35 @@
+"""values()-based read projections that stand in for ModelSerializer on hot paths.
+
+Field lists come from CourseSerializer/LessonSerializer once, at import time, so the
+output keeps the serializers' shape without per-object field introspection.
+"""
+from typing import Dict, List, Optional
+from ..models import Course, Lesson
+from ..serializers import CourseSerializer, LessonSerializer
+
+COURSE_FIELDS=tuple(f for f in CourseSerializer.Meta.fields if f!='lessons')
+LESSON_FIELDS=tuple(LessonSerializer.Meta.fields)
+# Lessons in the order the serializers see them (Lesson.Meta.ordering)
+LESSON_ORDER=tuple(Lesson._meta.ordering)
+
+def lesson_rows(course_id: int)->List[dict]:
+    return list(Lesson.objects.filter(course_id=course_id).order_by(*LESSON_ORDER).values(*LESSON_FIELDS))
+
+def group_courses(courses: List[dict], lessons: List[dict])->List[dict]:
+    """Attach ``lessons`` rows (with course_id) to their course rows, as CourseSerializer nests them."""
+    by_course: Dict[int, List[dict]]={c['id']:[] for c in courses}
+    for row in lessons:
+        bucket=by_course.get(row.pop('course_id'))
+        if bucket is not None: bucket.append(row)
+    for c in courses: c['lessons']=by_course[c['id']]
+    return courses
+
+def course_rows(pk: Optional[int]=None)->List[dict]:
+    """CourseSerializer-shaped dicts for every course (or just ``pk``) in two queries."""
+    courses=Course.objects.all() if pk is None else Course.objects.filter(pk=pk)
+    lessons=Lesson.objects.order_by(*LESSON_ORDER)
+    if pk is not None: lessons=lessons.filter(course_id=pk)
+    return group_courses(list(courses.values(*COURSE_FIELDS)), list(lessons.values('course_id', *LESSON_FIELDS)))
+
+def overview_courses():
+    return Course.objects.values('id','name','description','difficulty')
@@ -0,0 +1,20 @@
+"""Process-pool entry points for precompute_recommendations.
+
+Spawned workers unpickle these functions before Django is configured, so this module
+and its arguments stay free of model imports until init_worker has run django.setup().
+"""
+_catalog=None
+
+def init_worker(courses, lesson_rows):
+    """``courses`` as (id, name) tuples and ``lesson_rows`` as (id, course_id, tags) tuples."""
+    import django
+    django.setup()
+    from .recommendations import CourseRef
+    from .tag_index import TagIndex
+    global _catalog
+    _catalog=([CourseRef(*c) for c in courses], TagIndex(lesson_rows))
+
+def score_chunk(rows, now, k):
+    from .recommendations import compute_payloads
+    courses, tag_index=_catalog
+    return compute_payloads(rows, courses, tag_index, now, k)
@@ -0,0 +1,52 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Sequence, Tuple
+from django.conf import settings
+from ..models import StudentRecommendation
+from .features import feature_columns
+from .recommender import candidate_features, score_batch
+from .tag_index import TagIndex
+
+# Plain stand-ins for Course/StudentFeatures rows so payloads can be built in worker processes.
+CourseRef=namedtuple('CourseRef', 'id name')
+FeatureVector=namedtuple('FeatureVector', 'courses mastered_tags')
+
+def recommendation_payload(features, courses: Sequence, tag_index: TagIndex, now: datetime, k: int=3)->dict:
+    """student_recommendation body: best course, confidence, its features and k-1 alternatives.
+
+    With no courses to choose from, the recommendation and confidence are null.
+    """
+    if not courses: return {'recommendation':None,'confidence':None,'reason_features':{},'alternatives':[]}
+    progress, recency, tag_gap, hint_rate=feature_columns(features, [c.id for c in courses], tag_index, now)
+    batch=score_batch(progress, recency, tag_gap, hint_rate, k=k)
+    title=lambda i: f'Continue "{courses[i].name}" — next lesson'
+    top=batch.top[0]; alts=batch.top[1:]
+    return {'recommendation':{'id':str(courses[top].id),'title':title(top)},'confidence':batch.confidences[top],'reason_features':candidate_features(progress[top], recency[top], tag_gap[top], hint_rate[top]),'alternatives':[{'id':str(courses[i].id),'title':title(i)} for i in alts]}
+
+def fresh_payload(student, now: datetime, catalog_version: int)->Optional[dict]:
+    """The stored payload if it was scored against ``catalog_version``, postdates the student's
+    last feature update and is under RECOMMENDATION_MAX_AGE.
+
+    Expects ``student`` loaded with select_related('features', 'recommendation').
+    """
+    rec=getattr(student, 'recommendation', None)
+    if rec is None or rec.catalog_version!=catalog_version or now-rec.computed_at>timedelta(seconds=settings.RECOMMENDATION_MAX_AGE): return None
+    features=getattr(student, 'features', None)
+    if features is not None and features.updated_at>rec.computed_at: return None
+    return rec.payload
+
+def compute_payloads(rows: Iterable[Tuple[int, Optional[dict], Optional[list]]], courses: Sequence[CourseRef], tag_index: TagIndex, now: datetime, k: int=3)->List[Tuple[int, dict]]:
+    """Payloads for (student_id, feature courses, mastered tags) rows; students without features share one."""
+    out=[]; blank=None
+    for student_id, vec, mastered in rows:
+        if vec is None:
+            if blank is None: blank=recommendation_payload(None, courses, tag_index, now, k)
+            out.append((student_id, blank))
+        else:
+            out.append((student_id, recommendation_payload(FeatureVector(vec, mastered or []), courses, tag_index, now, k)))
+    return out
+
+def store_payloads(payloads: Sequence[Tuple[int, dict]], computed_at: datetime, catalog_version: int)->int:
+    StudentRecommendation.objects.bulk_create([StudentRecommendation(student_id=sid, payload=p, computed_at=computed_at, catalog_version=catalog_version) for sid, p in payloads],
+                                              update_conflicts=True, unique_fields=['student'], update_fields=['payload','computed_at','catalog_version'])
+    return len(payloads)
@@ -1,11 +1,56 @@
+import heapq
+import math
 from dataclasses import dataclass
-from typing import Dict, List
+from typing import Dict, List, Sequence
+try:
+    import numpy as np
+except ImportError:  # optional: pure-Python path below is used instead
+    np=None
+
+WEIGHTS={'progress_inverse':0.6,'recency_gap_days':0.3,'tag_gap':0.2,'hint_rate':-0.2}
+
+def candidate_features(progress: float, recency_gap_days: float, tag_gap: float, hint_rate: float)->Dict[str, float]:
+    return {'progress_inverse':100-progress,'recency_gap_days':recency_gap_days,'tag_gap':tag_gap,'hint_rate':hint_rate}
+
 def score_candidate(progress: float, recency_gap_days: float, tag_gap: float, hint_rate: float):
-    progress_inverse=100-progress
-    w={'progress_inverse':0.6,'recency_gap_days':0.3,'tag_gap':0.2,'hint_rate':-0.2}
-    features={'progress_inverse':progress_inverse,'recency_gap_days':recency_gap_days,'tag_gap':tag_gap,'hint_rate':hint_rate}
+    w=WEIGHTS
+    features=candidate_features(progress, recency_gap_days, tag_gap, hint_rate)
+    progress_inverse=features['progress_inverse']
     score=w['progress_inverse']*(progress_inverse/100)+w['recency_gap_days']*(recency_gap_days/10)+w['tag_gap']*tag_gap+w['hint_rate']*hint_rate
     return score, features
+
 def to_confidence(score: float)->float:
-    import math
     return max(0.0,min(1.0,1/(1+math.exp(-score))))
+
+@dataclass(frozen=True)
+class BatchScores:
+    """Scores and confidences aligned with the input order; ``top`` holds the indices of the k best, best first."""
+    scores: List[float]
+    confidences: List[float]
+    top: List[int]
+
+def _scores_numpy(progress, recency_gap_days, tag_gap, hint_rate)->List[float]:
+    w=WEIGHTS
+    p=np.asarray(progress, dtype=np.float64); r=np.asarray(recency_gap_days, dtype=np.float64)
+    t=np.asarray(tag_gap, dtype=np.float64); h=np.asarray(hint_rate, dtype=np.float64)
+    # Same operation order as score_candidate so every element rounds identically.
+    return (w['progress_inverse']*((100-p)/100)+w['recency_gap_days']*(r/10)+w['tag_gap']*t+w['hint_rate']*h).tolist()
+
+def _scores_python(progress, recency_gap_days, tag_gap, hint_rate)->List[float]:
+    wp, wr, wt, wh=WEIGHTS['progress_inverse'], WEIGHTS['recency_gap_days'], WEIGHTS['tag_gap'], WEIGHTS['hint_rate']
+    return [wp*((100-p)/100)+wr*(r/10)+wt*t+wh*h for p, r, t, h in zip(progress, recency_gap_days, tag_gap, hint_rate)]
+
+def score_batch(progress: Sequence[float], recency_gap_days: Sequence[float], tag_gap: Sequence[float], hint_rate: Sequence[float], k: int=3)->BatchScores:
+    """Score N candidates in one pass; results match score_candidate/to_confidence bit-for-bit.
+
+    Uses NumPy when installed and a pure-Python loop otherwise. Ties in ``top`` keep
+    input order, like a stable descending sort.
+    """
+    n=len(progress)
+    if not (len(recency_gap_days)==len(tag_gap)==len(hint_rate)==n):
+        raise ValueError('All feature arrays must have the same length.')
+    scores=(_scores_numpy if np is not None else _scores_python)(progress, recency_gap_days, tag_gap, hint_rate)
+    # math.exp rather than np.exp: the two may differ in the last ulp.
+    confidences=[max(0.0,min(1.0,1/(1+math.exp(-s)))) for s in scores]
+    top=heapq.nlargest(min(k, n), range(n), key=scores.__getitem__)
+    return BatchScores(scores=scores, confidences=confidences, top=top)
@@ -0,0 +1,144 @@
+import threading
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+from typing import Iterable, Optional
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Q, QuerySet, Sum
+from django.db.models.functions import Greatest
+from ..models import Attempt, Lesson, Student, StudentCourseStats
+from . import features
+from .completion import completed_bits, decode, encode, mastered_bits
+
+def _totals(attempts: Iterable[Attempt]):
+    totals=defaultdict(lambda: {'attempt_count':0,'last_timestamp':None,'hint_sum':0,'correctness_sum':0.0,'duration_sum':0})
+    for a in attempts:
+        t=totals[(a.student_id, a.lesson.course_id)]
+        t['attempt_count']+=1; t['hint_sum']+=a.hints_used; t['correctness_sum']+=a.correctness; t['duration_sum']+=a.duration_sec
+        if t['last_timestamp'] is None or a.timestamp>t['last_timestamp']: t['last_timestamp']=a.timestamp
+    return totals
+
+def _increment(student_id, course_id, t, completed: Optional[int]=None)->int:
+    # Single UPDATE ... SET col=col+n, so concurrent writers never lose increments.
+    # ``completed`` is the already OR-ed bitmap, only valid while the caller holds the row lock.
+    extra={} if completed is None else {'completed':encode(completed)}
+    return StudentCourseStats.objects.filter(student_id=student_id, course_id=course_id).update(
+        attempt_count=F('attempt_count')+t['attempt_count'], hint_sum=F('hint_sum')+t['hint_sum'],
+        correctness_sum=F('correctness_sum')+t['correctness_sum'], duration_sum=F('duration_sum')+t['duration_sum'],
+        last_timestamp=Greatest('last_timestamp', t['last_timestamp']), **extra)
+
+def _locked_completed(pairs)->dict:
+    """Lock the stats rows for (student_id, course_id) ``pairs`` in id order; returns their decoded bitmaps."""
+    rows=StudentCourseStats.objects.select_for_update().filter(reduce(or_, (Q(student_id=s, course_id=c) for s, c in pairs))).only('student_id','course_id','completed').order_by('id')
+    return {(r.student_id, r.course_id):decode(r.completed) for r in rows}
+
+def apply_attempts(attempts: Iterable[Attempt]):
+    """Fold newly written attempts into StudentCourseStats and StudentFeatures. Call inside the transaction that wrote them.
+
+    Costs one locking SELECT for the whole batch plus one UPDATE (or INSERT) per
+    (student, course): the bitmap OR is done in Python under the lock and written by that UPDATE.
+    """
+    attempts=list(attempts)
+    totals=_totals(attempts); bits=completed_bits(attempts)
+    if not totals: return
+    old=_locked_completed(totals)
+    for key, t in totals.items():
+        new=bits.get(key, 0)
+        if key in old:
+            _increment(*key, t, completed=old[key]|new if old[key]|new!=old[key] else None); continue
+        try:
+            with transaction.atomic():
+                StudentCourseStats.objects.create(student_id=key[0], course_id=key[1], completed=encode(new), **t)
+        except IntegrityError:
+            # Another writer created the row first; lock it and add on top of theirs.
+            current=_locked_completed([key])[key]
+            _increment(*key, t, completed=current|new)
+    features.apply_attempts(attempts)
+
+def _aggregate(attempts):
+    return attempts.values('student_id','lesson__course_id').annotate(
+        n=Count('id'), last=Max('timestamp'), hints=Sum('hints_used'), correct=Sum('correctness'), duration=Sum('duration_sec')).order_by()
+
+STAT_FIELDS=['attempt_count','last_timestamp','hint_sum','correctness_sum','duration_sum','completed']
+
+def _upsert(rows, done)->int:
+    """Write aggregated ``rows`` over the existing stats rows, inserting missing ones; returns the number written."""
+    objs=StudentCourseStats.objects.bulk_create((StudentCourseStats(student_id=r['student_id'], course_id=r['lesson__course_id'], attempt_count=r['n'], last_timestamp=r['last'], hint_sum=r['hints'], correctness_sum=r['correct'], duration_sum=r['duration'],
+                                                                    completed=encode(done[(r['student_id'], r['lesson__course_id'])])) for r in rows), batch_size=1000,
+                                                update_conflicts=True, unique_fields=['student','course'], update_fields=STAT_FIELDS)
+    return len(objs)
+
+def recompute_pairs(pairs)->int:
+    """Rewrite the stats rows for (student_id, course_id) ``pairs`` from Attempt; returns rows written.
+
+    For attempts that were edited or deleted, which cannot be folded in as increments. The
+    rows are locked before the attempts are read, so a concurrent writer's attempt is either
+    counted here or added on top once this transaction commits. Pairs left without attempts
+    lose their row.
+    """
+    pairs=set(pairs)
+    if not pairs: return 0
+    with transaction.atomic():
+        _locked_completed(pairs)
+        attempts=Attempt.objects.filter(reduce(or_, (Q(student_id=s, lesson__course_id=c) for s, c in pairs)))
+        rows=list(_aggregate(attempts))
+        gone=pairs-{(r['student_id'], r['lesson__course_id']) for r in rows}
+        if gone: StudentCourseStats.objects.filter(reduce(or_, (Q(student_id=s, course_id=c) for s, c in gone))).delete()
+        return _upsert(rows, mastered_bits(attempts))
+
+class _Recompute:
+    """on_commit callback recomputing every pair a transaction's attempt edits and deletes touched, once."""
+    def __init__(self):
+        self.pairs=set(); self.courses={}; self.ran=False
+    def add(self, student_id, lesson_id):
+        if lesson_id not in self.courses: self.courses[lesson_id]=Lesson.objects.filter(pk=lesson_id).values_list('course_id', flat=True).first()
+        if self.courses[lesson_id] is not None: self.pairs.add((student_id, self.courses[lesson_id]))
+    def __call__(self):
+        self.ran=True
+        recompute_pairs(self.pairs)
+        features.recompute_students({s for s, _ in self.pairs})
+
+_pending=threading.local()
+
+def _job()->_Recompute:
+    """This transaction's _Recompute, registered with on_commit on first use."""
+    conn=transaction.get_connection()
+    job=getattr(_pending, 'job', None)
+    # A job no longer queued was dropped by a rollback.
+    if job is None or job.ran or not any(entry[1] is job for entry in conn.run_on_commit):
+        job=_pending.job=_Recompute()
+        if conn.in_atomic_block: transaction.on_commit(job)
+    return job
+
+def _stale(*attempts):
+    """Recompute the pairs of ``attempts`` (student_id, lesson_id) once the current transaction commits."""
+    job=_job()
+    for student_id, lesson_id in attempts: job.add(student_id, lesson_id)
+    if not transaction.get_connection().in_atomic_block: job()
+
+def attempt_moving(sender, instance, raw=False, **kwargs):
+    """pre_save: remember which pair an existing attempt counted towards, for attempt_edited."""
+    if raw or instance.pk is None: return
+    instance._stats_was=Attempt.objects.filter(pk=instance.pk).values_list('student_id','lesson_id').first()
+
+def attempt_edited(sender, instance, created=False, raw=False, **kwargs):
+    """post_save: new attempts are folded in by apply_attempts; an edited one has its pairs recomputed."""
+    if raw or created: return
+    was=getattr(instance, '_stats_was', None)
+    _stale((instance.student_id, instance.lesson_id), *([was] if was else []))
+
+def attempt_deleted(sender, instance, origin=None, **kwargs):
+    """post_delete: recompute the attempt's pair, unless its student is being deleted along with their stats."""
+    if isinstance(origin, Student) or isinstance(origin, QuerySet) and origin.model is Student: return
+    _stale((instance.student_id, instance.lesson_id))
+
+def rebuild_stats()->int:
+    """Recompute every StudentCourseStats row from Attempt in place; returns the number of rows written."""
+    with transaction.atomic():
+        if connection.vendor=='postgresql':
+            # Writers wait for the rebuild instead of having their increments overwritten by it.
+            with connection.cursor() as cur: cur.execute(f'LOCK TABLE {StudentCourseStats._meta.db_table} IN SHARE ROW EXCLUSIVE MODE')
+        attempts=Attempt.objects.all()
+        n=_upsert(_aggregate(attempts).iterator(chunk_size=2000), mastered_bits(attempts))
+        StudentCourseStats.objects.exclude(Exists(Attempt.objects.filter(student_id=OuterRef('student_id'), lesson__course_id=OuterRef('course_id')))).delete()
+    return n
@@ -0,0 +1,130 @@
+"""Per-student cache of rendered overview and recommendation bodies.
+
+Entries are tagged with the catalog version and a per-student generation. A catalog change
+bumps the version; a committed Attempt, or a Student change, bumps the generation
+(invalidate_student). Either way the old entry is never served again. It then expires after
+STUDENT_CACHE_TIMEOUT or is culled once the alias reaches MAX_ENTRIES. STUDENT_CACHE_ALIAS
+must be shared by every worker for a bump to reach them all (settings_prod checks this).
+
+Bodies are built on the primary: a replica read started before a write's pin took effect
+could otherwise cache the pre-write body under the new generation. Hits, the common case,
+touch no database at all.
+
+When an entry is missing, one caller per process rebuilds it and the others, sync or async,
+wait on its future for up to STUDENT_CACHE_LOCK_TIMEOUT (single flight). Across workers a
+cold entry is built at most once per process.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Awaitable, Callable, Dict, Tuple
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from ..db_router import pin_student, primary
+from ..metrics import rendering
+from ..renderers import dumps
+from .catalog import acatalog_version, catalog_version
+
+_flights: Dict[str, Future]={}
+_flights_lock=threading.Lock()
+
+def _cache():
+    return caches[settings.STUDENT_CACHE_ALIAS]
+
+def _gen_key(pk)->str:
+    return f'student:{pk}:gen'
+
+def invalidate_student(pk: int):
+    # A fresh value rather than incr, which is not atomic on every shared backend.
+    _cache().set(_gen_key(pk), time.time_ns(), None)
+
+def student_written(pk: int):
+    """Run once a write about student ``pk`` commits: drop cached bodies and pin reads to the primary."""
+    invalidate_student(pk); pin_student(pk)
+
+def attempt_changed(sender, instance, **kwargs):
+    """Attempt post_save/post_delete receiver; acts once the write is visible to readers."""
+    transaction.on_commit(lambda: student_written(instance.student_id))
+
+def student_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: student_written(instance.pk))
+
+def _fresh(entry, version, gen):
+    return entry is not None and entry[0]==version and entry[1]==gen
+
+def _join(flight: str)->Tuple[Future, bool]:
+    """This process's in-flight build for ``flight``, and whether the caller must run it."""
+    with _flights_lock:
+        future=_flights.get(flight)
+        if future is not None: return future, False
+        future=_flights[flight]=Future()
+        return future, True
+
+def _land(flight: str, future: Future, body: bytes=None, error: BaseException=None):
+    """Hand the owner's result to its waiters. Build errors (e.g. a missing student) are
+    shared; if the owner was cancelled instead, waiters get None and build themselves."""
+    with _flights_lock: _flights.pop(flight, None)
+    if isinstance(error, Exception): future.set_exception(error)
+    else: future.set_result(body)
+
+def cached_student_payload(kind: str, pk: int, build: Callable[[], object])->bytes:
+    """Rendered JSON body of ``build()`` (run against the primary) for student ``pk``; exceptions from ``build`` propagate uncached."""
+    cache=_cache(); key=f'student:{pk}:{kind}'; gen_key=_gen_key(pk)
+    version=catalog_version()
+    got=cache.get_many([key, gen_key])
+    gen=got.get(gen_key)
+    if gen is None:
+        # From the clock, so a culled generation never matches entries written before it.
+        cache.add(gen_key, time.time_ns(), None); gen=cache.get(gen_key)
+    entry=got.get(key)
+    if _fresh(entry, version, gen): return entry[2]
+    flight=f'{key}:{version}:{gen}'
+    future, owner=_join(flight)
+    if not owner:
+        try:
+            body=future.result(settings.STUDENT_CACHE_LOCK_TIMEOUT)
+        except FutureTimeout:
+            body=None  # the owner is stuck; build without it
+        if body is not None: return body
+    try:
+        with primary():
+            payload=build()
+            with rendering(): body=dumps(payload)
+    except BaseException as e:
+        if owner: _land(flight, future, error=e)
+        raise
+    cache.set(key, (version, gen, body), settings.STUDENT_CACHE_TIMEOUT)
+    if owner: _land(flight, future, body)
+    return body
+
+async def acached_student_payload(kind: str, pk: int, build: Callable[[], Awaitable[object]])->bytes:
+    """Async cached_student_payload; ``build`` is a coroutine function using the async ORM."""
+    cache=_cache(); key=f'student:{pk}:{kind}'; gen_key=_gen_key(pk)
+    version=await acatalog_version()
+    got=await cache.aget_many([key, gen_key])
+    gen=got.get(gen_key)
+    if gen is None:
+        await cache.aadd(gen_key, time.time_ns(), None); gen=await cache.aget(gen_key)
+    entry=got.get(key)
+    if _fresh(entry, version, gen): return entry[2]
+    flight=f'{key}:{version}:{gen}'
+    future, owner=_join(flight)
+    if not owner:
+        try:
+            # shield: a timeout must not cancel the owner's future under it.
+            body=await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), settings.STUDENT_CACHE_LOCK_TIMEOUT)
+        except asyncio.TimeoutError:
+            body=None
+        if body is not None: return body
+    try:
+        with primary():
+            payload=await build()
+            with rendering(): body=dumps(payload)
+    except BaseException as e:
+        if owner: _land(flight, future, error=e)
+        raise
+    await cache.aset(key, (version, gen, body), settings.STUDENT_CACHE_TIMEOUT)
+    if owner: _land(flight, future, body)
+    return body
@@ -0,0 +1,69 @@
+import threading
+import time
+from collections import defaultdict
+from typing import FrozenSet, Iterable, Optional
+from django.conf import settings
+from ..db_router import primary
+from ..models import Lesson
+
+class TagIndex:
+    """Inverted index over Lesson.tags with a bit per tag for fast set algebra.
+
+    Each tag gets a bit position; a course's tags and a student's mastered tags are
+    plain ints, so a tag gap is a mask-and-popcount instead of a scan over lessons.
+    """
+    def __init__(self, rows: Iterable[tuple]):
+        lessons=defaultdict(set); courses=defaultdict(set); course_tags=defaultdict(set)
+        for lesson_id, course_id, tags in rows:
+            course_tags[course_id]
+            for tag in tags or ():
+                lessons[tag].add(lesson_id); courses[tag].add(course_id); course_tags[course_id].add(tag)
+        self.bits={tag:1<<i for i, tag in enumerate(sorted(lessons))}
+        self.tag_lessons={t:frozenset(ids) for t, ids in lessons.items()}
+        self.tag_courses={t:frozenset(ids) for t, ids in courses.items()}
+        self.course_masks={cid:self.mask(tags) for cid, tags in course_tags.items()}
+        self.built_at=time.monotonic()
+    @classmethod
+    def from_db(cls)->'TagIndex':
+        with primary(): return cls(Lesson.objects.values_list('id','course_id','tags').order_by().iterator(chunk_size=2000))
+    def mask(self, tags: Iterable[str])->int:
+        """Bitset for ``tags``; tags no lesson uses are ignored."""
+        m=0
+        for t in tags:
+            m|=self.bits.get(t, 0)
+        return m
+    def tags(self, mask: int)->FrozenSet[str]:
+        return frozenset(t for t, b in self.bits.items() if mask & b)
+    def lessons_for(self, tag: str)->FrozenSet[int]:
+        return self.tag_lessons.get(tag, frozenset())
+    def courses_for(self, tag: str)->FrozenSet[int]:
+        return self.tag_courses.get(tag, frozenset())
+    def unmastered(self, course_id: int, mastered_mask: int)->FrozenSet[str]:
+        return self.tags(self.course_masks.get(course_id, 0) & ~mastered_mask)
+    def tag_gap(self, course_id: int, mastered_mask: int)->float:
+        """Share of the course's tags not in ``mastered_mask``; 0 for an untagged course."""
+        course=self.course_masks.get(course_id, 0)
+        if not course: return 0.0
+        return (course & ~mastered_mask).bit_count()/course.bit_count()
+
+_index: Optional[TagIndex]=None
+_lock=threading.Lock()
+
+def get_tag_index()->TagIndex:
+    """This process's index; rebuilt after a Lesson signal or once TAG_INDEX_TTL seconds pass.
+
+    Signals only reach the process that made the change, so the TTL bounds how long
+    other workers can serve a stale index.
+    """
+    global _index
+    idx=_index
+    if idx is None or time.monotonic()-idx.built_at>settings.TAG_INDEX_TTL:
+        with _lock:
+            idx=_index
+            if idx is None or time.monotonic()-idx.built_at>settings.TAG_INDEX_TTL:
+                idx=_index=TagIndex.from_db()
+    return idx
+
+def invalidate_tag_index(**kwargs):
+    global _index
+    _index=None
@@ -0,0 +1,85 @@
+"""Token buckets shared by every worker on a host (core.throttling.TokenBucketThrottle).
+
+Each key is one row (tokens, last refill time) in a local SQLite file in WAL mode. A take
+is a single UPSERT that refills, spends and reports in one atomic statement, so concurrent
+workers serialize on SQLite's write lock instead of racing a read-modify-write. Commits
+skip fsync (synchronous=NORMAL): losing the last few takes on a power cut only refunds tokens.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+from django.conf import settings
+
+logger=logging.getLogger(__name__)
+
+# Rows idle for longer than the longest DRF period ('day') are full buckets; each process
+# drops them every PRUNE_INTERVAL seconds so the table stays at one row per active key.
+MAX_PERIOD=86400
+PRUNE_INTERVAL=60
+
+# The UPDATE only applies when the refilled bucket holds a token, so a returned row means
+# the take succeeded and no row means it was refused (and nothing was written).
+TAKE_SQL='''INSERT INTO token_bucket (key, tokens, ts) VALUES (:key, :capacity-1, :now)
+ON CONFLICT(key) DO UPDATE SET tokens=min(:capacity, tokens+max(0, :now-ts)*:rate)-1, ts=max(ts, :now)
+WHERE min(:capacity, tokens+max(0, :now-ts)*:rate)>=1
+RETURNING tokens'''
+
+class TokenBucketStore:
+    """One connection per process, shared by its threads under a lock.
+
+    ASGI runs each request's sync code on a fresh thread, so a per-thread connection would
+    pay a connect and the WAL pragmas on every request.
+    """
+    clock=staticmethod(time.time)
+    def __init__(self, path: str, timeout: float=1.0):
+        self.path=path; self.timeout=timeout
+        self._lock=threading.Lock(); self._conn=None; self._pid=None; self._pruned=0.0
+    def _db(self)->sqlite3.Connection:
+        # Called with the lock held. A connection inherited across fork (gunicorn --preload) is not reused.
+        if self._pid!=os.getpid():
+            db=sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            db.execute('PRAGMA journal_mode=WAL'); db.execute('PRAGMA synchronous=NORMAL')
+            db.execute('CREATE TABLE IF NOT EXISTS token_bucket (key TEXT PRIMARY KEY, tokens REAL NOT NULL, ts REAL NOT NULL) WITHOUT ROWID')
+            self._conn, self._pid=db, os.getpid()
+        return self._conn
+    def take(self, key: str, capacity: int, rate: float)->Tuple[bool, float]:
+        """Spend one token from ``key``'s bucket (``capacity`` tokens, refilled at ``rate`` per second).
+
+        Returns (allowed, seconds until the next token). If the store cannot be opened, or
+        stays locked for longer than the timeout, the request is allowed: a broken throttle
+        must not block writes.
+        """
+        now=self.clock()
+        try:
+            with self._lock:
+                db=self._db()
+                spent=db.execute(TAKE_SQL, {'key':key,'capacity':capacity,'rate':rate,'now':now}).fetchone()
+                if now-self._pruned>=PRUNE_INTERVAL:
+                    self._pruned=now; db.execute('DELETE FROM token_bucket WHERE ts<?', (now-MAX_PERIOD,))
+                if spent is not None: return True, 0.0
+                tokens, ts=db.execute('SELECT tokens, ts FROM token_bucket WHERE key=?', (key,)).fetchone()
+        except sqlite3.Error:
+            logger.warning('Token bucket store %s unavailable; allowing request', self.path, exc_info=True)
+            return True, 0.0
+        return False, (1-min(capacity, tokens+max(0, now-ts)*rate))/rate
+    def tokens(self, key: str)->Optional[float]:
+        with self._lock:
+            row=self._db().execute('SELECT tokens FROM token_bucket WHERE key=?', (key,)).fetchone()
+        return row[0] if row else None
+    def clear(self):
+        with self._lock: self._db().execute('DELETE FROM token_bucket')
+
+_store=None
+_store_lock=threading.Lock()
+
+def get_bucket_store()->TokenBucketStore:
+    """The per-process store for settings.THROTTLE_BUCKET_PATH (reopened if the setting changes)."""
+    global _store
+    if _store is None or _store.path!=settings.THROTTLE_BUCKET_PATH:
+        with _store_lock:
+            if _store is None or _store.path!=settings.THROTTLE_BUCKET_PATH:
+                _store=TokenBucketStore(settings.THROTTLE_BUCKET_PATH, settings.THROTTLE_BUCKET_TIMEOUT)
+    return _store
@@ -0,0 +1,31 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from .models import Attempt, Course, Lesson, Student
+from .services.catalog import bump_catalog_version
+from .services.stats import attempt_deleted, attempt_edited, attempt_moving
+from .services.completion import invalidate_lesson_order, lesson_deleted, lesson_moved, lesson_moving
+from .services.student_cache import attempt_changed, student_changed
+from .services.tag_index import invalidate_tag_index
+
+post_save.connect(invalidate_tag_index, sender=Lesson, dispatch_uid='tag_index_lesson_save')
+post_delete.connect(invalidate_tag_index, sender=Lesson, dispatch_uid='tag_index_lesson_delete')
+# Completion bits are keyed by Lesson.position, so a new, moved or deleted lesson renumbers its course;
+# LessonOrder is dropped after that, so a rebuild sees the new positions.
+pre_save.connect(lesson_moving, sender=Lesson, dispatch_uid='completion_lesson_presave')
+post_save.connect(lesson_moved, sender=Lesson, dispatch_uid='completion_lesson_save')
+post_delete.connect(lesson_deleted, sender=Lesson, dispatch_uid='completion_lesson_delete')
+post_save.connect(invalidate_lesson_order, sender=Lesson, dispatch_uid='lesson_order_lesson_save')
+post_delete.connect(invalidate_lesson_order, sender=Lesson, dispatch_uid='lesson_order_lesson_delete')
+
+for model in (Course, Lesson):
+    post_save.connect(bump_catalog_version, sender=model, dispatch_uid=f'catalog_{model.__name__}_save')
+    post_delete.connect(bump_catalog_version, sender=model, dispatch_uid=f'catalog_{model.__name__}_delete')
+
+# New attempts are folded into stats by apply_attempts; edits and deletes recompute their (student, course) pairs.
+pre_save.connect(attempt_moving, sender=Attempt, dispatch_uid='stats_attempt_presave')
+post_save.connect(attempt_edited, sender=Attempt, dispatch_uid='stats_attempt_save')
+post_delete.connect(attempt_deleted, sender=Attempt, dispatch_uid='stats_attempt_delete')
+
+# bulk_create sends no post_save; ingest_attempts calls student_written for the students it wrote.
+for model, receiver in ((Attempt, attempt_changed), (Student, student_changed)):
+    post_save.connect(receiver, sender=model, dispatch_uid=f'student_cache_{model.__name__}_save')
+    post_delete.connect(receiver, sender=model, dispatch_uid=f'student_cache_{model.__name__}_delete')
@@ -0,0 +1,24 @@
+import pytest
+from django.conf import settings
+from django.core.cache import caches
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # Test transactions never commit, so on_commit invalidation does not run between tests.
+    for alias in settings.CACHES: caches[alias].clear()
+
+@pytest.fixture(autouse=True)
+def throttle_buckets(settings, tmp_path):
+    # Fresh buckets per test, like the cleared cache the history-list throttle used.
+    settings.THROTTLE_BUCKET_PATH=str(tmp_path/'throttle.sqlite3')
+
+@pytest.fixture
+def make_attempt():
+    """Create an attempt through AttemptCreateSerializer, so stats and features are applied as in the API."""
+    from django.utils import timezone
+    from core.serializers import AttemptCreateSerializer
+    def make(student, lesson, **kw):
+        ser=AttemptCreateSerializer(data={'student':student.id,'lesson':lesson.id,'timestamp':timezone.now(),'correctness':0.5,**kw})
+        ser.is_valid(raise_exception=True)
+        return ser.save()
+    return make
@@ -0,0 +1,185 @@
+import pytest
+from core.benchmarks.bench_analyzer import legacy_analyze, make_snippet
+from core.services import analyzer
+from core.services.analysis_cache import AnalysisCache, DjangoCacheStore, LRUByteStore
+from core.services.analyzer import analyze
+
+
+SNIPPET = 'def f(x): print(x)\ntry:\n  pass\nexcept:\n  pass'
+
+
+class TestRuleEngine:
+    def test_matches_previous_analyzer(self):
+        code = make_snippet(2000)
+        assert analyze(code) == legacy_analyze(code)
+        assert analyze(SNIPPET) == legacy_analyze(SNIPPET)
+
+    def test_names_used_in_nested_functions_count_for_outer(self):
+        code = 'def outer(a, b):\n    def inner(c):\n        return a\n    return inner\n'
+        messages = [i['message'] for i in analyze(code)]
+        assert messages == ['Function arg "b" appears unused.', 'Function arg "c" appears unused.']
+
+    def test_syntax_error(self):
+        issues = analyze('def f(:')
+        assert [i['rule'] for i in issues] == ['syntax-error']
+
+    def test_registered_rule_joins_single_traversal(self, monkeypatch):
+        import ast
+        monkeypatch.setattr(analyzer, 'RULES', list(analyzer.RULES))
+        monkeypatch.setattr(analyzer, '_dispatch', None)
+
+        @analyzer.register
+        class GlobalRule(analyzer.Rule):
+            name = 'global'
+            enter_types = (ast.Global,)
+            def enter(self, node):
+                self.report('Avoid global.', 'warn')
+
+        issues = analyze('def f():\n    global x\n    print(x)\n')
+        assert [i['rule'] for i in issues] == ['print-call', 'global']
+
+
+class TestAnalysisCache:
+    def test_hit_returns_same_result(self):
+        cache = AnalysisCache(LRUByteStore(1024 * 1024))
+        first = cache.analyze(SNIPPET)
+        second = cache.analyze(SNIPPET)
+        assert first == second == analyze(SNIPPET)
+        assert cache.stats()['hits'] == 1
+        assert cache.stats()['misses'] == 1
+
+    def test_key_depends_on_ruleset_version(self):
+        assert AnalysisCache(None, version='1').key(SNIPPET) != AnalysisCache(None, version='2').key(SNIPPET)
+
+    def test_byte_bound_evicts_least_recently_used(self):
+        store = LRUByteStore(400)
+        cache = AnalysisCache(store, analyzer=lambda code: [{'rule': 'r', 'message': code * 10, 'severity': 'info'}])
+        cache.analyze('a')
+        cache.analyze('b')
+        cache.analyze('a')
+        cache.analyze('c')
+        stats = cache.stats()
+        assert stats['bytes'] <= 400
+        assert stats['evictions'] >= 1
+        cache.analyze('a')
+        assert cache.stats()['hits'] == 2  # 'a' was recently used, so 'b' went first
+
+    def test_oversized_results_are_not_stored(self):
+        cache = AnalysisCache(LRUByteStore(10))
+        cache.analyze(SNIPPET)
+        assert cache.stats()['entries'] == 0
+
+    def test_django_cache_store(self, settings):
+        settings.CACHES = {'analysis': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'analysis-test'}}
+        cache = AnalysisCache(DjangoCacheStore('analysis'))
+        cache.analyze(SNIPPET)
+        other_worker = AnalysisCache(DjangoCacheStore('analysis'))
+        assert other_worker.analyze(SNIPPET) == analyze(SNIPPET)
+        assert other_worker.stats()['hits'] == 1
+
+
+class TestAnalysisPool:
+    def test_pool_runs_analysis_and_rejects_when_full(self):
+        from core.services.analysis_pool import AnalysisBusy, AnalysisPool, AnalysisTooLarge
+        pool = AnalysisPool(workers=1, queue_depth=0, cpu_timeout=2, wall_timeout=10)
+        try:
+            assert pool.run(SNIPPET) == analyze(SNIPPET)
+            pool._acquire(1)  # occupy the only slot
+            with pytest.raises(AnalysisBusy):
+                pool.run(SNIPPET)
+            pool._release(1)
+            # With a byte budget, one large job in flight refuses more work while job slots are free.
+            pool.max_jobs, pool.max_bytes = 4, 2 * len(SNIPPET)
+            pool._acquire(len(SNIPPET) + 1)
+            with pytest.raises(AnalysisBusy):
+                pool.run(SNIPPET)
+            pool._release(len(SNIPPET) + 1)
+            assert pool.run(SNIPPET) == analyze(SNIPPET)
+            with pytest.raises(AnalysisTooLarge):
+                pool.run(SNIPPET * 3)
+        finally:
+            pool.shutdown()
+
+    def test_cpu_timeout(self):
+        from core.services.analysis_pool import AnalysisPool, AnalysisTimeout
+        pool = AnalysisPool(workers=1, queue_depth=0, cpu_timeout=0.001, wall_timeout=10)
+        try:
+            with pytest.raises(AnalysisTimeout):
+                pool.run(make_snippet(10000) * 20)
+        finally:
+            pool.shutdown()
+
+    def test_busy_response_has_retry_after(self, client, monkeypatch):
+        from core.services import analysis_pool
+        class FullPool:
+            def run(self, code):
+                raise analysis_pool.AnalysisBusy()
+        monkeypatch.setattr(analysis_pool, 'get_analysis_pool', lambda: FullPool())
+        r = client.post('/api/analyze-code/', data={'code': 'x = "busy test"'})
+        assert r.status_code == 503
+        assert r['Retry-After']
+
+
+class TestIncrementalAnalysis:
+    def test_statements_split_outside_strings_and_brackets(self):
+        from core.services.incremental_analysis import diagnostics, split_statements
+        code = 'import os\n@dec(\n1)\ndef f(a):\n    s = """\nx = 1\n"""\ntry:\n  pass\nexcept:\n  pass\ny = 1\n'
+        assert [line for line, _ in split_statements(code)] == [1, 2, 8, 12]
+        assert ''.join(src for _, src in split_statements(code)) == code
+        # Brackets and quotes inside strings or comments do not move the boundaries.
+        code = 'x = foo(")",\n1)\ny = 2  # (\nz = \'\'\'\n"\n\'\'\'\nw = 1 \\\n+ 2\n'
+        assert [line for line, _ in split_statements(code)] == [1, 3, 4, 7]
+        assert diagnostics(code, analyze) == {}
+
+    def test_matches_full_analysis(self):
+        from core.services.incremental_analysis import diagnostics
+        code = make_snippet(3000) + SNIPPET
+        assert sorted(map(str, diagnostics(code, analyze).values())) == sorted(map(str, analyze(code)))
+
+    def test_edit_reanalyzes_only_changed_statement(self):
+        from core.services.incremental_analysis import DocumentStore
+        store = DocumentStore('default', 60)
+        cache = AnalysisCache(LRUByteStore(1 << 20))
+        code = make_snippet(2000)
+        opened = store.update('doc-1', cache.analyze, text=code)
+        assert opened['reset'] and opened['version'] == 1 and len(opened['added']) == len(analyze(code))
+        misses = cache.misses
+        at = code.index('print(x)', len(code) // 2)
+        body = store.update('doc-1', cache.analyze, base_version=1, edits=[{'start': at, 'end': at + len('print(x)'), 'text': 'pass'}])
+        assert cache.misses == misses + 1
+        assert body['version'] == 2 and not body['reset']
+        assert [i['rule'] for i in body['added']] == ['unused-arg', 'bare-except']
+        assert len(body['removed']) == 3
+        assert store.update('doc-1', cache.analyze, base_version=1, edits=[]) is None
+        assert store.update('unknown', cache.analyze, base_version=1, edits=[]) is None
+
+    def test_local_edits_match_a_full_split(self):
+        from core.services.incremental_analysis import Document
+        document = Document(make_snippet(2000), analyze)
+        at = document.text.index('def handler_3')
+        # Opening a string hides every later statement; closing it brings them back.
+        for start, end, text in ((at, at, 's = """\n'), (len(document.text), len(document.text), '"""\n'), (at, at + 8, ''), (0, 0, '    ')):
+            document.edit(start, end, text, analyze)
+            fresh = Document(document.text, analyze)
+            assert (document.starts, document.lines) == (fresh.starts, fresh.lines)
+            assert list(map(str, document.issues().values())) == list(map(str, fresh.issues().values()))
+
+    def test_concurrent_edits_to_one_version(self):
+        from core.services.incremental_analysis import DocumentStore
+        store = DocumentStore('default', 60)
+        store.update('doc-2', analyze, text='x = 1\n')
+        def racing(source):
+            # Another worker applies its edit to version 1 while this one is analyzing.
+            if source == 'x = 3\n':
+                store.update('doc-2', analyze, base_version=1, edits=[{'start': 4, 'end': 5, 'text': '2'}])
+            return analyze(source)
+        assert store.update('doc-2', racing, base_version=1, edits=[{'start': 4, 'end': 5, 'text': '3'}]) is None
+        state = store.cache.get('analyze-doc:doc-2')
+        assert state['version'] == 2 and state['text'] == 'x = 2\n'
+        reopened = store.update('doc-2', analyze, text='y = 1\n')
+        assert reopened['version'] == 3 and reopened['reset']
+
+    def test_syntax_error_lines_are_absolute(self):
+        from core.services.incremental_analysis import diagnostics
+        issues = list(diagnostics('x = 1\ny = 2\ndef f(:\n    pass\n', analyze).values())
+        assert issues[0]['rule'] == 'syntax-error' and issues[0]['message'].endswith('line 3)')
@@ -1,5 +1,15 @@
+import json
 import pytest
+from asgiref.sync import async_to_sync
 from core.models import Student, Course, Lesson
+
+def asgi_stream(path):
+    """GET ``path`` through the ASGI handler; returns the response and its streamed body."""
+    from django.test import AsyncClient
+    async def get():
+        r=await AsyncClient().get(path)
+        return r, b''.join([part async for part in r.streaming_content])
+    return async_to_sync(get)()
 @pytest.mark.django_db
 def test_overview(client):
     s=Student.objects.create(name='A', email='a@example.com')
@@ -12,6 +22,381 @@ def test_recommendation(client):
     Lesson.objects.create(course=c, title='L1', tags=['t'], order_index=1)
     r=client.get(f'/api/students/{s.id}/recommendation/'); assert r.status_code==200; j=r.json(); assert 'recommendation' in j and 'confidence' in j
 @pytest.mark.django_db
+def test_recommendation_with_empty_catalog(client, rf):
+    from core import async_views
+    s=Student.objects.create(name='A', email='a14@example.com')
+    empty={'recommendation':None,'confidence':None,'reason_features':{},'alternatives':[]}
+    r=client.get(f'/api/students/{s.id}/recommendation/'); assert r.status_code==200 and r.json()==empty
+    r=async_to_sync(async_views.student_recommendation)(rf.get('/x'), pk=s.id); assert r.status_code==200 and json.loads(r.content)==empty
+@pytest.mark.django_db
 def test_analyze_code(client):
     r=client.post('/api/analyze-code/', data={'code':'def f(x): print(x)\ntry:\n  pass\nexcept:\n  pass'})
     assert r.status_code==200; assert 'issues' in r.json()
+@pytest.mark.django_db
+def test_overview_constant_queries(client, django_assert_num_queries):
+    from django.utils import timezone
+    from core.serializers import AttemptCreateSerializer
+    from core.services.completion import get_lesson_order
+    s=Student.objects.create(name='A', email='a3@example.com')
+    for i in range(5):
+        c=Course.objects.create(name=f'C{i}', description='', difficulty=1)
+        l=Lesson.objects.create(course=c, title=f'L{i}', tags=['t'], order_index=1)
+        Lesson.objects.create(course=c, title=f'L{i}b', tags=['t'], order_index=2)
+        ser=AttemptCreateSerializer(data={'student':s.id,'lesson':l.id,'timestamp':timezone.now(),'correctness':0.5}); ser.is_valid(raise_exception=True); ser.save()
+    get_lesson_order()  # in-process lesson index, normally already built
+    with django_assert_num_queries(3):
+        r=client.get(f'/api/students/{s.id}/overview/')
+    courses=r.json()['courses']; assert len(courses)==5
+    assert all(c['progress']==10 and c['last_activity'] and c['next_up']==f"L{c['name'][1:]}" for c in courses)
+@pytest.mark.django_db
+def test_bulk_attempts_json_and_ndjson(client, django_assert_max_num_queries):
+    import json
+    from django.test import override_settings
+    from core.models import Attempt, StudentCourseStats
+    s=Student.objects.create(name='A', email='a4@example.com')
+    c=Course.objects.create(name='C', description='', difficulty=1)
+    l=Lesson.objects.create(course=c, title='L1', tags=['t'], order_index=1)
+    row=lambda **kw: {'student':s.id,'lesson':l.id,'timestamp':'2025-01-01T00:00:00Z','correctness':0.5,**kw}
+    rows=[row() for _ in range(38)]+[row(correctness=1.5), row(lesson=999999)]
+    # Two chunks; a per-row lookup or insert would need well over 40 queries.
+    with override_settings(ATTEMPT_BULK_CHUNK_SIZE=20), django_assert_max_num_queries(30):
+        r=client.post('/api/attempts/bulk/', data=json.dumps(rows), content_type='application/json')
+    assert r.status_code==207; j=r.json()
+    assert j['created']==38 and [e['index'] for e in j['errors']]==[38, 39]
+    assert 'correctness' in j['errors'][0]['errors'] and 'lesson' in j['errors'][1]['errors']
+    body=b'\n'.join(json.dumps(row()).encode() for _ in range(3))+b'\n{bad\n'
+    r=client.post('/api/attempts/bulk/', data=body, content_type='application/x-ndjson')
+    assert r.status_code==207 and r.json()['created']==3 and r.json()['errors'][0]['index']==3
+    assert Attempt.objects.count()==41
+    assert StudentCourseStats.objects.get(student=s, course=c).attempt_count==41
+@pytest.mark.django_db
+def test_recommendation_constant_queries(client, django_assert_num_queries):
+    from django.utils import timezone
+    from core.serializers import AttemptCreateSerializer
+    s=Student.objects.create(name='A', email='a5@example.com')
+    for i in range(4):
+        c=Course.objects.create(name=f'C{i}', description='', difficulty=1)
+        l=Lesson.objects.create(course=c, title=f'L{i}', tags=[f't{i}'], order_index=1)
+        for _ in range(i):
+            ser=AttemptCreateSerializer(data={'student':s.id,'lesson':l.id,'timestamp':timezone.now(),'correctness':0.9}); ser.is_valid(raise_exception=True); ser.save()
+    with django_assert_num_queries(3):
+        r=client.get(f'/api/students/{s.id}/recommendation/')
+    j=r.json(); assert j['recommendation']['title']=='Continue "C0" — next lesson'
+    assert j['reason_features']['tag_gap']==1.0 and len(j['alternatives'])==2
+@pytest.mark.django_db
+def test_catalog_etag_and_invalidation(client, django_assert_num_queries, django_capture_on_commit_callbacks):
+    c=Course.objects.create(name='C', description='', difficulty=1)
+    Lesson.objects.create(course=c, title='L1', tags=['t'], order_index=1)
+    r=client.get('/api/courses/'); assert r.status_code==200
+    etag=r['ETag']; assert etag.startswith('"') and 'max-age' in r['Cache-Control']
+    assert r.json()[0]['lessons'][0]['title']=='L1'
+    with django_assert_num_queries(0):
+        assert client.get('/api/courses/').content==r.content
+        r304=client.get('/api/courses/', HTTP_IF_NONE_MATCH=etag)
+    assert r304.status_code==304 and r304['ETag']==etag
+    with django_capture_on_commit_callbacks(execute=True):
+        Lesson.objects.create(course=c, title='L2', tags=['t'], order_index=2)
+        # The version moves only once the change commits.
+        assert client.get('/api/courses/', HTTP_IF_NONE_MATCH=etag).status_code==304
+    r=client.get('/api/courses/', HTTP_IF_NONE_MATCH=etag)
+    assert r.status_code==200 and r['ETag']!=etag and len(r.json()[0]['lessons'])==2
+    assert client.get(f'/api/courses/{c.id}/lessons/').json()[1]['title']=='L2'
+    assert client.get('/api/courses/999999/').status_code==404
+@pytest.mark.django_db
+def test_metrics_endpoint_and_budget_sampling(client, settings, caplog):
+    from core.metrics import registry
+    registry.reset()
+    settings.METRICS_QUERY_BUDGET=0; settings.METRICS_SAMPLE_RATE=1.0
+    s=Student.objects.create(name='A', email='a6@example.com')
+    Course.objects.create(name='C', description='', difficulty=1)
+    with caplog.at_level('WARNING', logger='core.metrics'):
+        client.get(f'/api/students/{s.id}/overview/')
+    assert 'Over budget' in caplog.text
+    assert client.get('/api/metrics/').status_code==403
+    settings.METRICS_TOKEN='scrape'
+    assert client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer wrong').status_code==403
+    body=client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer scrape').content.decode()
+    assert 'coach_db_queries_count{route="api/students/<int:pk>/overview/",method="GET"} 1' in body
+    assert 'coach_db_queries_bucket{route="api/students/<int:pk>/overview/",method="GET",le="5"} 1' in body
+    assert 'coach_requests_over_budget_total{route="api/students/<int:pk>/overview/"} 1' in body
+    # The fast path times its dumps(); a cache hit renders nothing and reports no render time.
+    client.get(f'/api/students/{s.id}/overview/')
+    render=registry._series[('coach_render_duration_seconds', 'api/students/<int:pk>/overview/', 'GET')]
+    assert render.count==1 and render.sum>0
+@pytest.mark.django_db
+def test_metrics_count_queries_of_streamed_bodies(client):
+    from core.metrics import registry
+    registry.reset()
+    s=Student.objects.create(name='A', email='a13@example.com')
+    response=client.get(f'/api/students/{s.id}/attempts/?export=ndjson')
+    assert ('coach_db_queries', 'api/students/<int:pk>/attempts/', 'GET') not in registry._series
+    b''.join(response.streaming_content)
+    series=registry._series[('coach_db_queries', 'api/students/<int:pk>/attempts/', 'GET')]
+    assert series.count==1 and series.sum>0
+    assert ('coach_render_duration_seconds', 'api/students/<int:pk>/attempts/', 'GET') not in registry._series
+@pytest.mark.django_db
+def test_metrics_count_queries_under_asgi():
+    from asgiref.sync import async_to_sync
+    from django.test import AsyncClient
+    from core.metrics import registry
+    registry.reset()
+    s=Student.objects.create(name='A', email='a12@example.com')
+    Course.objects.create(name='C', description='', difficulty=1)
+    assert async_to_sync(AsyncClient().get)(f'/api/students/{s.id}/overview/').status_code==200
+    series=registry._series[('coach_db_queries', 'api/students/<int:pk>/overview/', 'GET')]
+    assert series.count==1 and series.sum>0
+@pytest.mark.django_db
+def test_async_read_views_match_sync(client, rf):
+    from asgiref.sync import async_to_sync
+    from core import async_views
+    s=Student.objects.create(name='A', email='a7@example.com')
+    c=Course.objects.create(name='C', description='', difficulty=1)
+    Lesson.objects.create(course=c, title='L1', tags=['t'], order_index=1)
+    call=lambda view, path, **kw: async_to_sync(view)(rf.get(path), **kw)
+    for view, path, kw in [(async_views.student_overview, f'/api/students/{s.id}/overview/', {'pk':s.id}),
+                           (async_views.student_recommendation, f'/api/students/{s.id}/recommendation/', {'pk':s.id}),
+                           (async_views.course_list, '/api/courses/', {}),
+                           (async_views.course_detail, f'/api/courses/{c.id}/', {'pk':c.id}),
+                           (async_views.lesson_list, f'/api/courses/{c.id}/lessons/', {'course_id':c.id})]:
+        r=call(view, path, **kw); assert r.status_code==200
+        expected=client.get(path).json()
+        assert json.loads(r.content)==expected
+    assert call(async_views.student_overview, '/x', pk=999999).status_code==404
+    assert call(async_views.course_detail, '/x', pk=999999).status_code==404
+    assert call(async_views.lesson_list, '/x', course_id=999999).status_code==404
+@pytest.mark.django_db
+def test_student_attempts_keyset_and_export(client):
+    from datetime import timedelta
+    from django.utils import timezone
+    from core.models import Attempt
+    s=Student.objects.create(name='A', email='a8@example.com')
+    c=Course.objects.create(name='C', description='', difficulty=1)
+    l=Lesson.objects.create(course=c, title='L1', tags=['t'], order_index=1)
+    now=timezone.now()
+    # Pairs share a timestamp so the id tie-break matters.
+    Attempt.objects.bulk_create([Attempt(student=s, lesson=l, timestamp=now-timedelta(minutes=i//2), correctness=0.5) for i in range(7)])
+    expected=list(Attempt.objects.filter(student=s).order_by('-timestamp','-id').values_list('id', flat=True))
+    seen=[]; url=f'/api/students/{s.id}/attempts/?limit=3'
+    while url:
+        j=client.get(url).json(); seen+=[a['id'] for a in j['results']]; url=j['next']
+    assert seen==expected
+    r=client.get(f'/api/students/{s.id}/attempts/?export=ndjson')
+    assert r['Content-Type']=='application/x-ndjson'
+    lines=b''.join(r.streaming_content).decode().splitlines()
+    assert [json.loads(x)['id'] for x in lines]==expected
+    # Under ASGI the export is an async iterator, so it streams rather than being buffered.
+    r, body=asgi_stream(f'/api/students/{s.id}/attempts/?export=ndjson')
+    assert r.is_async and [json.loads(x)['id'] for x in body.decode().splitlines()]==expected
+    assert client.get(f'/api/students/{s.id}/attempts/?cursor=bogus').status_code==400
+    assert client.get('/api/students/999999/attempts/').status_code==404
+@pytest.mark.django_db
+def test_projections_match_serializers(client):
+    from core import renderers
+    from core.serializers import CourseSerializer, LessonSerializer
+    from core.services.projections import course_rows, lesson_rows
+    for i in range(3):
+        c=Course.objects.create(name=f'Ç{i}', description='d', difficulty=i)
+        for j in (3, 1, 2): Lesson.objects.create(course=c, title=f'L{i}.{j}', tags=['a', f't{j}'], order_index=j)
+    Course.objects.create(name='Empty', description='', difficulty=1)
+    expected=CourseSerializer(Course.objects.prefetch_related('lessons'), many=True).data
+    assert course_rows()==json.loads(json.dumps(expected))
+    assert course_rows(c.id)==[expected[2]]
+    assert lesson_rows(c.id)==json.loads(json.dumps(LessonSerializer(c.lessons.all(), many=True).data))
+    assert client.get('/api/courses/').json()==expected
+    assert client.post('/api/courses/').status_code==405
+    # orjson and the stdlib fallback produce the same bytes for these payloads
+    body=renderers.dumps(expected)
+    if renderers.orjson is not None:
+        renderers.orjson, saved=None, renderers.orjson
+        try: assert renderers.dumps(expected)==body
+        finally: renderers.orjson=saved
+@pytest.mark.django_db
+def test_create_attempt_write_behind(client, tmp_path):
+    from django.test import override_settings
+    from core.models import Attempt, StudentCourseStats
+    from core.services.attempt_spool import AttemptSpool, get_attempt_spool
+    s=Student.objects.create(name='A', email='a9@example.com')
+    c=Course.objects.create(name='C', description='', difficulty=1)
+    l=Lesson.objects.create(course=c, title='L1', tags=['t'], order_index=1)
+    path=str(tmp_path/'spool.sqlite3')
+    row={'student':s.id,'lesson':l.id,'timestamp':'2024-05-01T10:00:00.123456Z','correctness':0.8}
+    with override_settings(ATTEMPT_WRITE_BEHIND=True, ATTEMPT_SPOOL_PATH=path, ATTEMPT_SPOOL_FLUSH_INTERVAL=0):
+        for _ in range(3):
+            r=client.post('/api/attempts/', data=row, content_type='application/json'); assert r.status_code==202
+        assert client.post('/api/attempts/', data={**row,'correctness':2}, content_type='application/json').status_code==400
+        spool=get_attempt_spool()
+        assert spool.pending()==3 and not Attempt.objects.exists()
+        # A fresh spool on the same file (a restarted worker) recovers the queued rows.
+        recovered=AttemptSpool(path)
+        recovered.append({**row,'student':999999})
+        assert recovered.wait_flushed() and spool.pending()==0
+        # A crash after commit but before the spool delete replays the batch; nothing is written twice.
+        for a in Attempt.objects.all(): spool.append({**row,'ingest_key':str(a.ingest_key)})
+        assert spool.wait_flushed() and spool.pending()==0
+    assert Attempt.objects.count()==3 and Attempt.objects.filter(ingest_key__isnull=False).count()==3
+    assert Attempt.objects.first().timestamp.microsecond==123456
+    assert StudentCourseStats.objects.get(student=s, course=c).attempt_count==3
+@pytest.mark.django_db
+def test_ingest_survives_a_concurrent_replay(monkeypatch):
+    import uuid
+    from django.utils import timezone
+    from core.models import Attempt, StudentCourseStats
+    from core.services import ingest
+    s=Student.objects.create(name='A', email='a15@example.com')
+    l=Lesson.objects.create(course=Course.objects.create(name='C', description='', difficulty=1), title='L1')
+    ts=timezone.now(); raced, fresh=uuid.uuid4(), uuid.uuid4()
+    rows=[{'student':s.id,'lesson':l.id,'timestamp':ts.isoformat(),'correctness':0.5,'ingest_key':str(k)} for k in (raced, fresh)]
+    check=ingest._already_ingested
+    def racing(keyed):
+        # The other request commits its copy of ``raced`` just after this one checked.
+        monkeypatch.setattr(ingest, '_already_ingested', check)
+        Attempt.objects.create(student=s, lesson=l, timestamp=ts, correctness=0.5, ingest_key=raced)
+        return set()
+    monkeypatch.setattr(ingest, '_already_ingested', racing)
+    assert ingest.ingest_attempts(rows)==(1, [])
+    assert Attempt.objects.filter(ingest_key__in=[raced, fresh]).count()==2
+    assert StudentCourseStats.objects.get(student=s).attempt_count==1  # the racer's row went in without apply_attempts here
+@pytest.mark.django_db
+def test_student_cache_invalidation(client, django_assert_num_queries, django_capture_on_commit_callbacks):
+    s=Student.objects.create(name='A', email='a10@example.com')
+    c=Course.objects.create(name='C', description='', difficulty=1)
+    l=Lesson.objects.create(course=c, title='L1', tags=['t'], order_index=1)
+    url=f'/api/students/{s.id}/overview/'
+    assert client.get(url).json()['courses'][0]['progress']==0
+    with django_assert_num_queries(0):
+        assert client.get(url).json()['courses'][0]['progress']==0
+    with django_capture_on_commit_callbacks(execute=True):
+        client.post('/api/attempts/', data={'student':s.id,'lesson':l.id,'timestamp':'2024-05-01T10:00:00Z','correctness':0.8}, content_type='application/json')
+    assert client.get(url).json()['courses'][0]['progress']==10
+    with django_capture_on_commit_callbacks(execute=True):
+        Lesson.objects.create(course=c, title='L0', tags=['t'], order_index=0)  # catalog change
+    assert client.get(url).json()['courses'][0]['next_up']=='L0'
+    assert client.get('/api/students/999999/overview/').status_code==404
+def test_student_cache_single_flight():
+    import asyncio, threading, time
+    from core.services.student_cache import acached_student_payload, cached_student_payload
+    calls=[]; barrier=threading.Barrier(6)
+    def build():
+        calls.append(1); time.sleep(0.1)
+        if len(calls)>1: raise Student.DoesNotExist
+        return {'n':len(calls)}
+    async def abuild():
+        await asyncio.sleep(0); return build()
+    def worker(i, pk, out):
+        # Sync and async callers share one in-process build, including its error.
+        barrier.wait()
+        try: out.append(cached_student_payload('probe', pk, build) if i%2 else async_to_sync(acached_student_payload)('probe', pk, abuild))
+        except Student.DoesNotExist as e: out.append(type(e))
+    for pk, expected in ((1, b'{"n":1}'), (2, Student.DoesNotExist)):
+        out=[]; threads=[threading.Thread(target=worker, args=(i, pk, out)) for i in range(6)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        assert out==[expected]*6
+    assert len(calls)==2
+def test_analyze_code_incremental(client):
+    url='/api/analyze-code/incremental/'
+    r=client.post(url, data={'document':'ed-1','text':'def f(a):\n    return 1\n'}, content_type='application/json')
+    assert r.status_code==200 and [i['rule'] for i in r.json()['added']]==['unused-arg']
+    removed=r.json()['added'][0]['id']
+    r=client.post(url, data={'document':'ed-1','base_version':1,'edits':[{'start':21,'end':22,'text':'a'}]}, content_type='application/json')
+    assert r.json()=={'document':'ed-1','version':2,'reset':False,'added':[],'removed':[removed]}
+    assert client.post(url, data={'document':'ed-1','base_version':1,'edits':[]}, content_type='application/json').status_code==409
+    assert client.post(url, data={'document':'ed-1','base_version':2,'edits':[{'start':0,'end':99}]}, content_type='application/json').status_code==400
+    assert client.post(url, data={'document':'bad id','text':''}, content_type='application/json').status_code==400
+    assert client.post(url, data={'document':'ed-1','text':'x'*10001}, content_type='application/json').status_code==400
+@pytest.mark.django_db
+def test_students_overview_batch(client, django_assert_num_queries, make_attempt):
+    students=[Student.objects.create(name=f'S{i}', email=f'batch{i}@example.com') for i in range(3)]
+    courses=[Course.objects.create(name=f'C{i}', description='', difficulty=1) for i in range(2)]
+    lessons=[Lesson.objects.create(course=c, title='L', tags=[], order_index=1) for c in courses]
+    for _ in range(2): make_attempt(students[0], lessons[1])
+    make_attempt(students[0], lessons[0])
+    make_attempt(students[2], lessons[0])
+    ids=','.join(str(s.id) for s in reversed(students))
+    with django_assert_num_queries(2):
+        r=client.get(f'/api/students/overview/?ids={ids},999999')
+        lines=[json.loads(x) for x in b''.join(r.streaming_content).splitlines()]
+    assert r['Content-Type']=='application/x-ndjson'
+    assert [(l['id'], [c[:2] for c in l['courses']]) for l in lines]==[
+        (students[0].id, [[courses[0].id, 10], [courses[1].id, 20]]), (students[1].id, []), (students[2].id, [[courses[0].id, 10]])]
+    r, body=asgi_stream(f'/api/students/overview/?ids={ids},999999')
+    assert r.is_async and [json.loads(x) for x in body.splitlines()]==lines
+    assert all(c[2] for l in lines for c in l['courses'])
+    assert client.get('/api/students/overview/?ids=1,x').status_code==400
+    assert client.get('/api/students/overview/').status_code==400
+@pytest.mark.django_db
+def test_replica_routing_with_read_your_writes(client, rf, django_capture_on_commit_callbacks):
+    from asgiref.sync import async_to_sync
+    from django.test import override_settings
+    from core.db_router import ReplicaRouter, replica_reads, student_pk
+    from core.renderers import json_response
+    router=ReplicaRouter(); seen=[]
+    @replica_reads(student_pk)
+    def view(request, pk):
+        seen.append(router.db_for_read(Student)); return json_response({})
+    @replica_reads(student_pk)
+    async def aview(request, pk):
+        seen.append(router.db_for_read(Student)); return json_response({})
+    s=Student.objects.create(name='A', email='a11@example.com')
+    c=Course.objects.create(name='C', description='', difficulty=1)
+    l=Lesson.objects.create(course=c, title='L1', tags=['t'], order_index=1)
+    view(rf.get('/'), pk=s.id)
+    with override_settings(DATABASE_REPLICAS=['replica']):
+        view(rf.get('/'), pk=s.id); async_to_sync(aview)(rf.get('/'), pk=s.id); view(rf.post('/'), pk=s.id)
+        with django_capture_on_commit_callbacks(execute=True):
+            client.post('/api/attempts/', data={'student':s.id,'lesson':l.id,'timestamp':'2024-05-01T10:00:00Z','correctness':0.8}, content_type='application/json')
+        view(rf.get('/'), pk=s.id); view(rf.get('/'), pk=s.id+1)
+    assert seen==[None, 'replica', 'replica', None, None, 'replica']
+    assert router.db_for_read(Student) is None and router.db_for_write(Student)=='default'
+    from core.db_router import _read_db
+    from core.services.catalog import cached_payload
+    from core.services.completion import LessonOrder
+    from core.services.student_cache import cached_student_payload
+    from core.services.tag_index import TagIndex
+    from django.core.cache.backends.db import DatabaseCache
+    token=_read_db.set('replica')
+    try:
+        assert router.db_for_read(DatabaseCache('t', {}).cache_model_class) is None and router.db_for_read(Student)=='replica'
+        # Catalog and student payloads and in-process indexes outlive the request, so they are built
+        # from the primary (a query routed to the unconfigured 'replica' alias would raise).
+        cached_payload('probe', lambda: seen.append(router.db_for_read(Course)) or {})
+        cached_student_payload('probe', s.id, lambda: seen.append(router.db_for_read(Student)) or {})
+        TagIndex.from_db(); LessonOrder.from_db()
+        assert seen[-2:]==[None, None] and router.db_for_read(Student)=='replica'
+    finally: _read_db.reset(token)
+    with override_settings(DATABASE_REPLICAS=['replica']):
+        view(rf.get('/'), pk=s.id+1)
+        with django_capture_on_commit_callbacks(execute=True):
+            Course.objects.create(name='C2', description='', difficulty=1)
+        view(rf.get('/'), pk=s.id+1)
+    assert seen[-2:]==['replica', None]
+@pytest.mark.django_db
+def test_write_throttle_token_bucket(client, settings):
+    from core.services.token_bucket import TokenBucketStore
+    codes=[client.post('/api/attempts/bulk/', data='{}', content_type='application/json').status_code for _ in range(11)]
+    assert codes[:10]==[400]*10 and codes[10]==429
+    assert 0<int(client.post('/api/attempts/bulk/', data='{}', content_type='application/json')['Retry-After'])<=6
+    # Two stores on one file stand in for two workers: they share every bucket.
+    a, b=TokenBucketStore(settings.THROTTLE_BUCKET_PATH), TokenBucketStore(settings.THROTTLE_BUCKET_PATH)
+    a.clock=b.clock=lambda: 1000.0
+    assert sum((a if i%2 else b).take('k', 3, 0.5)[0] for i in range(6))==3
+    assert a.take('k', 3, 0.5)==(False, 2.0)
+    a.clock=b.clock=lambda: 1003.0
+    assert b.take('k', 3, 0.5)==(True, 0.0) and a.tokens('k')==0.5
+def test_token_bucket_store_shares_one_connection(monkeypatch, tmp_path):
+    import sqlite3
+    import threading
+    from core.services import token_bucket
+    path=str(tmp_path/'buckets.sqlite3'); connect=sqlite3.connect; opened=[]
+    monkeypatch.setattr(token_bucket.sqlite3, 'connect', lambda *a, **kw: (opened.append(a[0]) if a[0]==path else None) or connect(*a, **kw))
+    store=token_bucket.TokenBucketStore(path); store.clock=lambda: 0.0
+    # ASGI gives every request a new thread; they must not each open a connection.
+    threads=[threading.Thread(target=store.take, args=('old', 10, 1.0)) for _ in range(5)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert opened==[path] and store.tokens('old')==5.0
+    store.clock=lambda: token_bucket.MAX_PERIOD+token_bucket.PRUNE_INTERVAL
+    store.take('new', 10, 1.0)
+    assert store.tokens('old') is None and store.tokens('new')==9.0
+    # An unopenable store fails open instead of failing the request.
+    assert token_bucket.TokenBucketStore(str(tmp_path/'missing'/'buckets.sqlite3')).take('k', 1, 1.0)==(True, 0.0)
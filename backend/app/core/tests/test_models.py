@@ -1,7 +1,8 @@
+import os
 import pytest
 from django.core.exceptions import ValidationError
 from django.db import IntegrityError
-from core.models import Student, Course, Lesson, Attempt
+from core.models import Student, Course, Lesson, Attempt, StudentCourseStats, StudentFeatures
 from django.utils import timezone
 
 
@@ -179,3 +180,300 @@ class TestAttemptModel:
         # This query should use the index on (student, timestamp)
         attempts = Attempt.objects.filter(student=student).order_by('-timestamp')
         assert attempts.count() == 5
+
+
+@pytest.mark.django_db
+class TestStudentCourseStats:
+    def test_stats_updated_incrementally(self, make_attempt):
+        student = Student.objects.create(name='Test Student', email='test@example.com')
+        course = Course.objects.create(name='Test Course')
+        lesson = Lesson.objects.create(course=course, title='Test Lesson')
+
+        first = make_attempt(student, lesson, hints_used=1, duration_sec=60, correctness=0.25)
+        second = make_attempt(student, lesson, hints_used=2, duration_sec=30, correctness=0.75,
+                               timestamp=first.timestamp - timezone.timedelta(days=1))
+
+        stats = StudentCourseStats.objects.get(student=student, course=course)
+        assert stats.attempt_count == 2
+        assert stats.hint_sum == 3
+        assert stats.correctness_sum == 1.0
+        assert stats.duration_sum == 90
+        assert stats.last_timestamp == first.timestamp
+        assert second.timestamp < stats.last_timestamp
+
+    def test_rebuild_matches_incremental(self, make_attempt):
+        from django.core.management import call_command
+        student = Student.objects.create(name='Test Student', email='test@example.com')
+        course = Course.objects.create(name='Test Course')
+        lesson = Lesson.objects.create(course=course, title='Test Lesson')
+        for i in range(3):
+            make_attempt(student, lesson, hints_used=i, duration_sec=10 * i)
+        before = StudentCourseStats.objects.values('attempt_count', 'last_timestamp', 'hint_sum', 'correctness_sum', 'duration_sum').get()
+
+        StudentCourseStats.objects.all().delete()
+        call_command('rebuild_stats', stdout=open(os.devnull, 'w'))
+
+        after = StudentCourseStats.objects.values('attempt_count', 'last_timestamp', 'hint_sum', 'correctness_sum', 'duration_sum').get()
+        assert after == before
+
+    def test_edit_and_delete_recompute_stats(self, django_capture_on_commit_callbacks, make_attempt):
+        from core.services.completion import decode
+        student = Student.objects.create(name='Test Student', email='test@example.com')
+        course = Course.objects.create(name='Test Course')
+        lesson = Lesson.objects.create(course=course, title='Test Lesson', tags=['loops'])
+        other = Lesson.objects.create(course=Course.objects.create(name='Other Course'), title='Other Lesson')
+        first = make_attempt(student, lesson, hints_used=1, correctness=0.9)
+        second = make_attempt(student, lesson, hints_used=2, correctness=0.25)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            first.correctness = 0.5
+            first.save()
+        stats = StudentCourseStats.objects.get()
+        assert (stats.attempt_count, stats.correctness_sum, decode(stats.completed)) == (2, 0.75, 0)
+        assert StudentFeatures.objects.get().mastered_tags == []
+
+        with django_capture_on_commit_callbacks(execute=True):
+            second.lesson = other
+            second.save()
+        assert StudentCourseStats.objects.get(course=course).hint_sum == 1
+        assert StudentCourseStats.objects.get(course=other.course).hint_sum == 2
+
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            Attempt.objects.all().delete()
+        assert len(callbacks) == 3  # a cache invalidation per attempt, but a single stats recompute
+        assert not StudentCourseStats.objects.exists() and not StudentFeatures.objects.exists()
+
+    def test_rebuild_keeps_rows_and_drops_orphans(self, make_attempt):
+        from core.services.stats import rebuild_stats
+        student = Student.objects.create(name='Test Student', email='test@example.com')
+        course = Course.objects.create(name='Test Course')
+        lesson = Lesson.objects.create(course=course, title='Test Lesson')
+        make_attempt(student, lesson, hints_used=3)
+        row = StudentCourseStats.objects.get()
+        StudentCourseStats.objects.update(hint_sum=0)
+        orphan = StudentCourseStats.objects.create(student=student, course=Course.objects.create(name='Empty Course'), attempt_count=1)
+        assert rebuild_stats() == 1
+        rebuilt = StudentCourseStats.objects.get()
+        assert (rebuilt.pk, rebuilt.hint_sum) == (row.pk, 3)
+        assert not StudentCourseStats.objects.filter(pk=orphan.pk).exists()
+
+    def test_completion_bitmap_drives_next_up(self, client, make_attempt):
+        from django.core.cache import caches
+        from django.core.management import call_command
+        from core.services.completion import decode
+        student = Student.objects.create(name='Test Student', email='test@example.com')
+        course = Course.objects.create(name='Test Course')
+        lessons = [Lesson.objects.create(course=course, title=f'L{i}', order_index=i) for i in (1, 2, 500)]
+        assert [l.position for l in lessons] == [0, 1, 2]
+        next_up = lambda: client.get(f'/api/students/{student.id}/overview/').json()['courses'][0]['next_up']
+        assert next_up() == 'L1'
+        make_attempt(student, lessons[0], correctness=0.5)
+        make_attempt(student, lessons[1], correctness=0.9)
+        caches['students'].clear()  # on_commit invalidation does not run inside the test transaction
+        assert decode(StudentCourseStats.objects.get().completed) == 0b10 and next_up() == 'L1'
+        make_attempt(student, lessons[0], correctness=0.7)
+        make_attempt(student, lessons[2], correctness=1.0)
+        caches['students'].clear()
+        assert decode(StudentCourseStats.objects.get().completed) == 0b111 and next_up() is None
+        StudentCourseStats.objects.update(completed=b'')
+        call_command('rebuild_stats', stdout=open(os.devnull, 'w'))
+        assert decode(StudentCourseStats.objects.get().completed) == 0b111
+        # Bits follow the lessons when they are reordered, and a deleted lesson's bit is removed.
+        lessons[2].order_index = 0
+        lessons[2].save()
+        assert lessons[2].position == 0 and decode(StudentCourseStats.objects.get().completed) == 0b111
+        lessons[0].delete()
+        assert decode(StudentCourseStats.objects.get().completed) == 0b11
+        Lesson.objects.create(course=course, title='L1b', order_index=1)
+        caches['students'].clear()
+        assert decode(StudentCourseStats.objects.get().completed) == 0b101 and next_up() == 'L1b'
+
+    def test_completion_with_shared_order_index(self, client, make_attempt):
+        from core.services.completion import decode
+        student = Student.objects.create(name='Test Student', email='test@example.com')
+        course = Course.objects.create(name='Test Course')
+        first, second = [Lesson.objects.create(course=course, title=f'L{i}') for i in (1, 2)]
+        make_attempt(student, first, correctness=0.9)
+        assert decode(StudentCourseStats.objects.get().completed) == 0b1
+        assert client.get(f'/api/students/{student.id}/overview/').json()['courses'][0]['next_up'] == 'L2'
+
+
+@pytest.mark.django_db
+class TestStudentFeatures:
+    def test_features_updated_incrementally(self, make_attempt):
+        from core.services.features import feature_columns
+        from core.services.tag_index import TagIndex
+        student = Student.objects.create(name='Test Student', email='test@example.com')
+        course = Course.objects.create(name='Test Course')
+        l1 = Lesson.objects.create(course=course, title='L1', tags=['loops', 'vars'])
+        Lesson.objects.create(course=course, title='L2', tags=['funcs'])
+        now = timezone.now()
+        make_attempt(student, l1, correctness=0.9, hints_used=2, timestamp=now - timezone.timedelta(days=3))
+        make_attempt(student, l1, correctness=0.2, hints_used=1, timestamp=now - timezone.timedelta(days=4))
+
+        features = StudentFeatures.objects.get(student=student)
+        assert features.mastered_tags == ['loops', 'vars']
+        count, last_ts, hints = features.courses[str(course.id)]
+        assert (count, hints) == (2, 3)
+
+        progress, recency, tag_gap, hint_rate = feature_columns(features, [course.id], TagIndex.from_db(), now)
+        assert progress == [20]
+        assert recency[0] == pytest.approx(3.0)
+        assert tag_gap[0] == pytest.approx(1 / 3)
+        assert hint_rate[0] == pytest.approx(0.5)
+
+    def test_rebuild_matches_incremental(self, make_attempt):
+        from core.services.features import rebuild_features
+        student = Student.objects.create(name='Test Student', email='test@example.com')
+        course = Course.objects.create(name='Test Course')
+        lesson = Lesson.objects.create(course=course, title='L1', tags=['loops'])
+        for i in range(3):
+            make_attempt(student, lesson, correctness=0.3 * i, hints_used=i)
+        before = StudentFeatures.objects.values('courses', 'mastered_tags').get()
+        assert rebuild_features() == 1
+        assert StudentFeatures.objects.values('courses', 'mastered_tags').get() == before
+
+
+@pytest.mark.django_db
+class TestTagIndex:
+    def test_index_and_tag_gap(self):
+        from core.services.tag_index import TagIndex
+        c1 = Course.objects.create(name='C1')
+        c2 = Course.objects.create(name='C2')
+        l1 = Lesson.objects.create(course=c1, title='L1', tags=['loops', 'vars'])
+        l2 = Lesson.objects.create(course=c1, title='L2', tags=['funcs'])
+        l3 = Lesson.objects.create(course=c2, title='L3', tags=['loops'])
+        Lesson.objects.create(course=c2, title='L4')
+
+        index = TagIndex.from_db()
+        assert index.lessons_for('loops') == {l1.id, l3.id}
+        assert index.courses_for('funcs') == {c1.id}
+        mastered = index.mask(['loops', 'unknown'])
+        assert index.unmastered(c1.id, mastered) == {'vars', 'funcs'}
+        assert index.tag_gap(c1.id, mastered) == pytest.approx(2 / 3)
+        assert index.tag_gap(c2.id, mastered) == 0.0
+        assert index.tag_gap(999, mastered) == 0.0
+        assert l2.id in index.lessons_for('funcs')
+
+    def test_lesson_signals_invalidate(self):
+        from core.services.tag_index import get_tag_index
+        course = Course.objects.create(name='C1')
+        lesson = Lesson.objects.create(course=course, title='L1', tags=['loops'])
+        assert get_tag_index().lessons_for('loops') == {lesson.id}
+        lesson.tags = ['arrays']
+        lesson.save()
+        assert get_tag_index().lessons_for('loops') == frozenset()
+        lesson.delete()
+        assert get_tag_index().lessons_for('arrays') == frozenset()
+
+
+@pytest.mark.django_db
+class TestSeedScale:
+    def test_count_suffixes(self):
+        from core.management.commands.seed_scale import count
+        assert count('500') == 500
+        assert count('100k') == 100_000
+        assert count('2.5M') == 2_500_000
+
+    def test_seed_scale_creates_consistent_data(self):
+        from django.core.management import call_command
+        from django.db.models import Sum
+        call_command('seed_scale', students=5, courses=3, lessons_per_course=2, attempts=200, batch_size=64, stdout=open(os.devnull, 'w'))
+        assert Student.objects.count() == 5
+        assert Lesson.objects.count() == 6
+        assert Attempt.objects.count() == 200
+        assert StudentCourseStats.objects.aggregate(n=Sum('attempt_count'))['n'] == 200
+        assert Attempt.objects.filter(correctness__gt=1).count() == 0
+
+
+@pytest.mark.django_db
+class TestPrecomputeRecommendations:
+    def _setup(self, make_attempt):
+        student = Student.objects.create(name='Test Student', email='test@example.com')
+        idle = Student.objects.create(name='Idle Student', email='idle@example.com')
+        course = Course.objects.create(name='Test Course')
+        Course.objects.create(name='Other Course')
+        lesson = Lesson.objects.create(course=course, title='L1', tags=['loops'])
+        make_attempt(student, lesson, correctness=0.9)
+        return student, idle, lesson
+
+    @pytest.mark.parametrize('workers', [0, 1])
+    def test_precompute_matches_live_scoring(self, client, workers, make_attempt):
+        from django.core.management import call_command
+        from core.models import StudentRecommendation
+        student, idle, _ = self._setup(make_attempt)
+        live = client.get(f'/api/students/{student.id}/recommendation/').json()
+        call_command('precompute_recommendations', workers=workers, chunk_size=1, stdout=open(os.devnull, 'w'))
+        assert StudentRecommendation.objects.count() == 2
+        stored = StudentRecommendation.objects.get(student=student).payload
+        assert stored['recommendation'] == live['recommendation']
+        assert stored['alternatives'] == live['alternatives']
+
+    def test_endpoint_serves_fresh_and_skips_stale(self, client, django_capture_on_commit_callbacks, make_attempt):
+        from django.core.management import call_command
+        from core.models import StudentRecommendation
+        student, idle, lesson = self._setup(make_attempt)
+        call_command('precompute_recommendations', workers=0, stdout=open(os.devnull, 'w'))
+        StudentRecommendation.objects.filter(student=student).update(payload={'marker': 'stored'})
+        assert client.get(f'/api/students/{student.id}/recommendation/').json() == {'marker': 'stored'}
+
+        with django_capture_on_commit_callbacks(execute=True):
+            make_attempt(student, lesson)  # new attempt makes it stale
+        assert 'recommendation' in client.get(f'/api/students/{student.id}/recommendation/').json()
+
+        call_command('precompute_recommendations', workers=0, changed=True, stdout=open(os.devnull, 'w'))
+        assert StudentRecommendation.objects.get(student=student).payload != {'marker': 'stored'}
+
+    def test_catalog_change_makes_stored_payloads_stale(self, client, django_capture_on_commit_callbacks, make_attempt):
+        from django.core.management import call_command
+        from core.models import StudentRecommendation
+        student, idle, lesson = self._setup(make_attempt)
+        call_command('precompute_recommendations', workers=0, stdout=open(os.devnull, 'w'))
+        StudentRecommendation.objects.update(payload={'marker': 'stored'})
+        assert client.get(f'/api/students/{idle.id}/recommendation/').json() == {'marker': 'stored'}
+        with django_capture_on_commit_callbacks(execute=True):
+            Course.objects.get(name='Other Course').delete()
+        body = client.get(f'/api/students/{idle.id}/recommendation/').json()
+        assert body['recommendation']['id'] == str(lesson.course_id)
+        call_command('precompute_recommendations', workers=0, changed=True, stdout=open(os.devnull, 'w'))
+        assert not StudentRecommendation.objects.filter(payload={'marker': 'stored'}).exists()
+
+
+@pytest.mark.django_db
+class TestAttemptPartitions:
+    def test_month_helpers(self):
+        from datetime import date
+        from core.services.partition_ddl import add_months, partition_name
+        assert add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+        assert add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+        assert partition_name(date(2024, 3, 1)) == 'core_attempt_p202403'
+
+    def test_closed_months_are_rolled_up_once(self):
+        from datetime import datetime, timezone as dt_timezone
+        from django.core.management import CommandError, call_command
+        from datetime import date
+        from core.models import Attempt, AttemptDailyRollup
+        from core.services.partitions import add_to_rollups, closed_months_needing_rollup
+        student = Student.objects.create(name='Test Student', email='test@example.com')
+        course = Course.objects.create(name='Test Course')
+        lesson = Lesson.objects.create(course=course, title='L1')
+        at = lambda *a: datetime(*a, tzinfo=dt_timezone.utc)
+        Attempt.objects.bulk_create([Attempt(student=student, lesson=lesson, timestamp=ts, correctness=c, hints_used=1)
+                                     for ts, c in ((at(2024, 1, 5, 9), 0.5), (at(2024, 1, 5, 23), 1.0), (at(2024, 2, 1), 0.2), (timezone.now(), 0.9))])
+        call_command('attempt_partitions', stdout=open(os.devnull, 'w'))
+        rows = list(AttemptDailyRollup.objects.order_by('day').values_list('day', 'attempt_count', 'correctness_sum', 'hint_sum'))
+        assert [(d.isoformat(), n, c, h) for d, n, c, h in rows] == [('2024-01-05', 2, 1.5, 2), ('2024-02-01', 1, 0.2, 1)]
+        pending = closed_months_needing_rollup(timezone.now())
+        assert date(2024, 1, 1) not in pending and date(2024, 2, 1) not in pending
+        # A late attempt for a rolled-up month makes it stale, and the next run folds it in.
+        Attempt.objects.create(student=student, lesson=lesson, timestamp=at(2024, 1, 6), correctness=0.25)
+        assert closed_months_needing_rollup(timezone.now()) == [date(2024, 1, 1)]
+        call_command('attempt_partitions', stdout=open(os.devnull, 'w'))
+        rows = list(AttemptDailyRollup.objects.order_by('day').values_list('day', 'attempt_count', 'correctness_sum', 'hint_sum'))
+        assert [(d.isoformat(), n, c, h) for d, n, c, h in rows] == [('2024-01-05', 2, 1.5, 2), ('2024-01-06', 1, 0.25, 0), ('2024-02-01', 1, 0.2, 1)]
+        assert closed_months_needing_rollup(timezone.now()) == []
+        # Retention adds late rows for dropped months on top of the rollups instead of rewriting them.
+        assert add_to_rollups(Attempt.objects.filter(timestamp__lt=at(2024, 1, 6, 1))) == 2
+        assert AttemptDailyRollup.objects.get(day=date(2024, 1, 6)).attempt_count == 2
+        with pytest.raises(CommandError):
+            call_command('attempt_partitions', retain_months=6, stdout=open(os.devnull, 'w'))
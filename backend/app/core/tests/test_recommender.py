@@ -1,5 +1,6 @@
 import pytest
-from core.services.recommender import score_candidate, to_confidence
+from core.services import recommender
+from core.services.recommender import score_batch, score_candidate, to_confidence
 
 
 class TestRecommenderDeterminism:
@@ -148,3 +149,43 @@ class TestRecommenderDeterminism:
                 assert result[0] == first_result[0]  # score
                 assert result[1] == first_result[1]  # features
                 assert result[2] == first_result[2]  # confidence
+
+
+class TestScoreBatch:
+    CASES = [
+        (25.0, 2.0, 0.1, 0.05),
+        (60, 8.0, 0.4, 0.2),
+        (90.0, 15.0, 0.8, 0.5),
+        (10, 1.0, 0.05, 0.01),
+        (60, 8.0, 0.4, 0.2),
+    ]
+
+    def _columns(self):
+        return [list(col) for col in zip(*self.CASES)]
+
+    def _check_matches_scalar(self, batch):
+        for i, case in enumerate(self.CASES):
+            score, _ = score_candidate(*case)
+            assert batch.scores[i] == score
+            assert batch.confidences[i] == to_confidence(score)
+
+    def test_score_batch_matches_scalar(self):
+        """Batch scores and confidences are bit-identical to the scalar functions"""
+        self._check_matches_scalar(score_batch(*self._columns()))
+
+    def test_score_batch_pure_python_fallback(self, monkeypatch):
+        """The pure-Python path gives the same results when NumPy is unavailable"""
+        monkeypatch.setattr(recommender, 'np', None)
+        self._check_matches_scalar(score_batch(*self._columns()))
+
+    def test_score_batch_top_k_is_stable(self):
+        """Top-k is ordered by score, and ties keep input order"""
+        batch = score_batch(*self._columns(), k=len(self.CASES))
+        expected = sorted(range(len(self.CASES)), key=lambda i: batch.scores[i], reverse=True)
+        assert batch.top == expected
+        assert batch.top.index(1) < batch.top.index(4)
+        assert len(score_batch(*self._columns(), k=2).top) == 2
+
+    def test_score_batch_length_mismatch(self):
+        with pytest.raises(ValueError):
+            score_batch([1.0, 2.0], [1.0], [1.0], [1.0])
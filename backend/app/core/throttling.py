@@ -0,0 +1,21 @@
+from django.conf import settings
+from rest_framework.throttling import UserRateThrottle
+from .services.token_bucket import get_bucket_store
+
+class TokenBucketThrottle(UserRateThrottle):
+    """UserRateThrottle keyed per user (or IP) as usual, but enforced by a token bucket shared by all workers.
+
+    A rate of ``N/period`` is a bucket of N tokens refilled at N per period, so bursts up
+    to N pass and the sustained rate matches. State is one row per key in
+    core.services.token_bucket instead of a pickled timestamp list in the cache.
+    """
+    def allow_request(self, request, view):
+        if not settings.THROTTLE_BUCKET_PATH: return super().allow_request(request, view)
+        if self.rate is None: return True
+        key=self.get_cache_key(request, view)
+        if key is None: return True
+        allowed, self._wait=get_bucket_store().take(key, self.num_requests, self.num_requests/self.duration)
+        return allowed
+    def wait(self):
+        if not settings.THROTTLE_BUCKET_PATH: return super().wait()
+        return self._wait
@@ -1,12 +1,21 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+# Read endpoints: async-native under ASGI deployments, DRF views otherwise
+reads=async_views if settings.ASYNC_READ_VIEWS else views
 urlpatterns=[
     path('', views.health_check, name='health_check'),  # Fast health check for ALB
-    path('students/<int:pk>/overview/',views.student_overview),
-    path('students/<int:pk>/recommendation/',views.student_recommendation),
+    path('metrics/',views.metrics),
+    path('students/overview/',views.students_overview),
+    path('students/<int:pk>/overview/',reads.student_overview),
+    path('students/<int:pk>/recommendation/',reads.student_recommendation),
+    path('students/<int:pk>/attempts/',views.student_attempts),
     path('attempts/',views.create_attempt),
+    path('attempts/bulk/',views.bulk_create_attempts),
     path('analyze-code/',views.analyze_code),
-    path('courses/',views.course_list),
-    path('courses/<int:pk>/',views.course_detail),
-    path('courses/<int:course_id>/lessons/',views.lesson_list),
+    path('analyze-code/cache-stats/',views.analyze_code_cache_stats),
+    path('analyze-code/incremental/',views.analyze_code_incremental),
+    path('courses/',reads.course_list),
+    path('courses/<int:pk>/',reads.course_detail),
+    path('courses/<int:course_id>/lessons/',reads.lesson_list),
 ]
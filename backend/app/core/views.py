@@ -1,16 +1,38 @@
+import json
+import re
 from rest_framework.decorators import api_view, throttle_classes
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.throttling import UserRateThrottle
-from django.db.models import Avg
-from django.http import JsonResponse
-from .models import Student, Course, Lesson, Attempt
-from .serializers import CourseSerializer, LessonSerializer, AttemptCreateSerializer
-from .services.recommender import score_candidate, to_confidence
-
-class WriteThrottle(UserRateThrottle):
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+from .db_router import replica_reads, student_pk
+from .metrics import can_scrape, registry
+from .models import Student, Course, Lesson, Attempt, StudentCourseStats
+from .pagination import KeysetPagination
+from .renderers import dumps, json_response
+from .serializers import AttemptCreateSerializer
+from .services.analysis_cache import get_analysis_cache
+from .services.analysis_pool import AnalysisBusy, AnalysisTimeout, AnalysisTooLarge
+from .services.attempt_spool import get_attempt_spool, spool_row
+from .services.catalog import cached_payload, catalog_version
+from .services.completion import decode, get_lesson_order
+from .services.incremental_analysis import EditError, get_document_store
+from .services.ingest import ingest_attempts, iter_ndjson
+from .services.projections import course_rows, lesson_rows, overview_courses
+from .services.recommendations import CourseRef, fresh_payload, recommendation_payload
+from .services.student_cache import cached_student_payload
+from .services.tag_index import get_tag_index
+from .throttling import TokenBucketThrottle
+
+class WriteThrottle(TokenBucketThrottle):
     rate='30/min'
 
+class BulkWriteThrottle(TokenBucketThrottle):
+    scope='bulk_write'; rate='10/min'
+
 def health_check(request):
     """Fast health check endpoint for ALB - no database calls"""
     return JsonResponse({
@@ -19,51 +41,180 @@ def health_check(request):
         'timestamp': '2024-01-01T00:00:00Z'  # Static timestamp for speed
     }, status=200)
 
-@api_view(['GET'])
-def student_overview(request, pk:int):
-    try:
-        student=Student.objects.get(pk=pk)
-    except Student.DoesNotExist:
-        return Response({'detail':'Not found'}, status=404)
-    courses=Course.objects.prefetch_related('lessons').all()
+def metrics(request):
+    """Prometheus text exposition of this worker's request histograms and analyzer cache counters; see can_scrape."""
+    if not can_scrape(request): return json_response({'detail':'You do not have permission to perform this action.'}, status=403)
+    lines=[registry.render()]
+    for name, value in get_analysis_cache().stats().items():
+        kind='counter' if name in ('hits','misses','evictions') else 'gauge'
+        metric=f'coach_analysis_cache_{name}'+('_total' if kind=='counter' else '')
+        lines.append(f'# TYPE {metric} {kind}\n{metric} {value}\n')
+    return HttpResponse(''.join(lines), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def course_progress(attempt_count: int)->int:
+    return min(100, attempt_count*10)
+
+def overview_payload(student, courses, stats, lesson_order):
+    """Overview body from a (id, name) student row, overview_courses() rows, overview_stats() rows and a LessonOrder."""
+    stats={cid:(n, last, completed) for cid, n, last, completed in stats}
     data=[]
     for c in courses:
-        attempts=Attempt.objects.filter(student=student, lesson__course=c).order_by('-timestamp')
-        progress=min(100, attempts.count()*10)
-        last_activity=attempts.first().timestamp.isoformat() if attempts.exists() else None
-        data.append({'id':c.id,'name':c.name,'description':c.description,'difficulty':c.difficulty,'progress':progress,'last_activity':last_activity,'next_up': (c.lessons.first().title if c.lessons.exists() else None)})
-    return Response({'student':{'id':student.id,'name':student.name},'courses':data})
+        n, last, completed=stats.get(c['id'], (0, None, b''))
+        data.append({'id':c['id'],'name':c['name'],'description':c['description'],'difficulty':c['difficulty'],'progress':course_progress(n),
+                     'last_activity':last.isoformat() if last else None,'next_up':lesson_order.next_up(c['id'], decode(completed))})
+    return {'student':{'id':student[0],'name':student[1]},'courses':data}
 
-@api_view(['GET'])
-def student_recommendation(request, pk:int):
+def overview_stats(pk):
+    return StudentCourseStats.objects.filter(student_id=pk).values_list('course_id','attempt_count','last_timestamp','completed')
+
+def student_response(kind, pk, build):
+    """Cached per-student JSON body (see core.services.student_cache); 404 when ``build`` finds no student."""
     try:
-        student=Student.objects.get(pk=pk)
+        return HttpResponse(cached_student_payload(kind, pk, build), content_type='application/json')
     except Student.DoesNotExist:
+        return json_response({'detail':'Not found'}, status=404)
+
+# Hot reads: plain Django views over values() projections, rendered straight to bytes
+# without DRF's Request/Response, content negotiation or serializer field machinery.
+@replica_reads(student_pk)
+@require_GET
+def student_overview(request, pk:int):
+    def build():
+        student=Student.objects.filter(pk=pk).values_list('id','name').first()
+        if student is None: raise Student.DoesNotExist
+        return overview_payload(student, overview_courses(), overview_stats(pk), get_lesson_order())
+    return student_response('overview', pk, build)
+
+@replica_reads(student_pk)
+@require_GET
+def student_recommendation(request, pk:int):
+    def build():
+        student=Student.objects.select_related('features','recommendation').get(pk=pk)
+        now=timezone.now()
+        stored=fresh_payload(student, now, catalog_version())
+        if stored is not None: return stored
+        courses=[CourseRef(*row) for row in Course.objects.values_list('id','name')]
+        return recommendation_payload(getattr(student, 'features', None), courses, get_tag_index(), now)
+    return student_response('recommendation', pk, build)
+
+def is_asgi(request)->bool:
+    """True under the ASGI handler, which buffers a sync-iterator StreamingHttpResponse whole."""
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+async def amap(func, aiterable):
+    async for item in aiterable: yield func(item)
+
+def _batch_stats(names):
+    # named=True: plain values_list().aiterator() runs its query on the event loop in Django 5.1.
+    return (StudentCourseStats.objects.filter(student_id__in=names).order_by('student_id','course_id')
+            .values_list('student_id','course_id','attempt_count','last_timestamp', named=True))
+
+def _overview_line(pk, name, rows):
+    return dumps({'id':pk,'name':name,'courses':[[cid, course_progress(n), last.isoformat() if last else None] for _, cid, n, last in rows]})+b'\n'
+
+def _overview_lines_through(order, names, rows):
+    """Lines for the students left in ``order`` up to and including the one ``rows`` belong to."""
+    for pk in order:
+        mine=pk==rows[0][0]
+        yield _overview_line(pk, names[pk], rows if mine else ())
+        if mine: return
+
+def batch_overview_lines(ids):
+    """One compact NDJSON line per existing student: {"id", "name", "courses": [[course_id, progress, last_activity], ...]}.
+
+    Courses without attempts are omitted. Reads the students and their StudentCourseStats
+    rows (grouped per student and course as attempts are written) in two queries.
+    """
+    names=dict(Student.objects.filter(id__in=ids).values_list('id','name'))
+    order=iter(sorted(names)); rows=[]
+    for row in _batch_stats(names).iterator(chunk_size=settings.ATTEMPT_EXPORT_CHUNK_SIZE):
+        if rows and row[0]!=rows[0][0]:
+            yield from _overview_lines_through(order, names, rows); rows=[]
+        rows.append(row)
+    if rows: yield from _overview_lines_through(order, names, rows)
+    for pk in order: yield _overview_line(pk, names[pk], ())
+
+async def abatch_overview_lines(ids):
+    """batch_overview_lines over aiterator(), for ASGI."""
+    names=dict([row async for row in Student.objects.filter(id__in=ids).values_list('id','name')])
+    order=iter(sorted(names)); rows=[]
+    async for row in _batch_stats(names).aiterator(chunk_size=settings.ATTEMPT_EXPORT_CHUNK_SIZE):
+        if rows and row[0]!=rows[0][0]:
+            for line in _overview_lines_through(order, names, rows): yield line
+            rows=[]
+        rows.append(row)
+    if rows:
+        for line in _overview_lines_through(order, names, rows): yield line
+    for pk in order: yield _overview_line(pk, names[pk], ())
+
+def batch_students(request, **kwargs):
+    try:
+        return [int(x) for x in request.GET.get('ids', '').split(',') if x.strip()]
+    except ValueError:
+        return []
+
+@replica_reads(batch_students)
+@require_GET
+def students_overview(request):
+    """Teacher dashboards: ?ids=1,2,3 streams batch_overview_lines for up to BATCH_OVERVIEW_MAX_STUDENTS students."""
+    try:
+        ids={int(x) for x in request.GET.get('ids', '').split(',') if x.strip()}
+    except ValueError:
+        return json_response({'detail':'ids must be a comma-separated list of student ids'}, status=400)
+    if not ids or len(ids)>settings.BATCH_OVERVIEW_MAX_STUDENTS:
+        return json_response({'detail':f'Pass between 1 and {settings.BATCH_OVERVIEW_MAX_STUDENTS} ids'}, status=400)
+    lines=abatch_overview_lines(ids) if is_asgi(request) else batch_overview_lines(ids)
+    return StreamingHttpResponse(lines, content_type='application/x-ndjson')
+
+ATTEMPT_FIELDS=('id','lesson_id','timestamp','correctness','hints_used','duration_sec')
+
+def attempt_row(row):
+    return {'id':row['id'],'lesson':row['lesson_id'],'timestamp':row['timestamp'].isoformat(),'correctness':row['correctness'],'hints_used':row['hints_used'],'duration_sec':row['duration_sec']}
+
+@replica_reads(student_pk)
+@api_view(['GET'])
+def student_attempts(request, pk:int):
+    """Attempt history, newest first: keyset pages by default, or ?export=ndjson to stream all of it."""
+    if not Student.objects.filter(pk=pk).exists():
         return Response({'detail':'Not found'}, status=404)
-    courses=Course.objects.all()
-    items=[]
-    for c in courses:
-        attempts=Attempt.objects.filter(student=student, lesson__course=c).order_by('-timestamp')
-        progress=min(100, attempts.count()*10)
-        recency_gap_days=5.0; tag_gap=0.3
-        hint_rate=(attempts.aggregate(avg=Avg('hints_used'))['avg'] or 0)/3.0
-        s, feats=score_candidate(progress, recency_gap_days, tag_gap, hint_rate)
-        items.append({'id':str(c.id),'title':f'Continue "{c.name}" — next lesson','score':s,'features':feats})
-    items.sort(key=lambda x:x['score'], reverse=True)
-    top=items[0]; alts=items[1:3]
-    return Response({'recommendation':{'id':top['id'],'title':top['title']},'confidence':to_confidence(top['score']),'reason_features':top['features'],'alternatives':[{'id':a['id'],'title':a['title']} for a in alts]})
+    qs=Attempt.objects.filter(student_id=pk).values(*ATTEMPT_FIELDS)
+    if request.query_params.get('export')=='ndjson':
+        qs=qs.order_by('-timestamp','-id'); chunk=settings.ATTEMPT_EXPORT_CHUNK_SIZE
+        line=lambda r: json.dumps(attempt_row(r))+'\n'
+        lines=amap(line, qs.aiterator(chunk_size=chunk)) if is_asgi(request) else map(line, qs.iterator(chunk_size=chunk))
+        resp=StreamingHttpResponse(lines, content_type='application/x-ndjson')
+        resp['Content-Disposition']=f'attachment; filename="student-{pk}-attempts.ndjson"'
+        return resp
+    paginator=KeysetPagination()
+    page=paginator.paginate_queryset(qs, request)
+    return paginator.get_paginated_response([attempt_row(r) for r in page])
 
 @api_view(['POST'])
 @throttle_classes([WriteThrottle])
 def create_attempt(request):
     ser=AttemptCreateSerializer(data=request.data)
     if ser.is_valid():
+        spool=get_attempt_spool()
+        if spool is not None:
+            return Response({'queued':spool.append(spool_row(ser.validated_data))}, status=status.HTTP_202_ACCEPTED)
         a=ser.save(); return Response({'id':a.id}, status=status.HTTP_201_CREATED)
     return Response(ser.errors, status=400)
 
+@api_view(['POST'])
+@throttle_classes([BulkWriteThrottle])
+def bulk_create_attempts(request):
+    if request.content_type.startswith('application/x-ndjson'):
+        rows=iter_ndjson(request.stream or ())
+    else:
+        rows=request.data
+        if not isinstance(rows, list):
+            return Response({'detail':'Expected a JSON array or NDJSON stream of attempts.'}, status=400)
+    created, errors=ingest_attempts(rows, chunk_size=settings.ATTEMPT_BULK_CHUNK_SIZE)
+    code=status.HTTP_201_CREATED if not errors else (status.HTTP_207_MULTI_STATUS if created else status.HTTP_400_BAD_REQUEST)
+    return Response({'created':created,'errors':errors}, status=code)
+
 @api_view(['POST'])
 def analyze_code(request):
-    import ast
     code=request.data.get('code','')
     
     # Input validation
@@ -73,53 +224,84 @@ def analyze_code(request):
     if len(code) > 10000:  # Limit code size
         return Response({'error': 'Code too large (max 10KB)'}, status=400)
     
-    issues=[]
     try:
-        tree=ast.parse(code)
-        class ArgVisitor(ast.NodeVisitor):
-            def visit_FunctionDef(self, node):
-                arg_names=[a.arg for a in node.args.args]
-                used=set()
-                class UseVisitor(ast.NodeVisitor):
-                    def visit_Name(self, n):
-                        if isinstance(n.ctx, ast.Load): used.add(n.id)
-                UseVisitor().visit(node)
-                for a in arg_names:
-                    if a not in used: issues.append({'rule':'unused-arg','message':f'Function arg "{a}" appears unused.','severity':'info'})
-        ArgVisitor().visit(tree)
-        class ExceptVisitor(ast.NodeVisitor):
-            def visit_ExceptHandler(self, node):
-                if node.type is None: issues.append({'rule':'bare-except','message':'Avoid bare except; catch specific exceptions.','severity':'warn'})
-        ExceptVisitor().visit(tree)
-        class PrintVisitor(ast.NodeVisitor):
-            def visit_Call(self, node):
-                if getattr(node.func,'id',None)=='print': issues.append({'rule':'print-call','message':'Avoid print statements; use logging.','severity':'info'})
-        PrintVisitor().visit(tree)
-    except SyntaxError as e:
-        issues.append({'rule':'syntax-error','message':str(e),'severity':'error'})
+        issues=get_analysis_cache().analyze(code)
+    except AnalysisBusy:
+        return Response({'error': 'Analyzer busy, retry shortly'}, status=503, headers={'Retry-After': str(settings.ANALYSIS_RETRY_AFTER)})
+    except AnalysisTimeout:
+        return Response({'error': 'Analysis timed out'}, status=422)
+    except AnalysisTooLarge:
+        return Response({'error': 'Code too large for the analyzer'}, status=413)
     return Response({'issues':issues})
 
+DOCUMENT_ID=re.compile(r'[\w.-]{1,64}')
+
+@api_view(['POST'])
+def analyze_code_incremental(request):
+    """Editor sessions: {document, text} opens or resets a document, {document, base_version, edits} updates it.
+
+    Answers with the diagnostics delta (added/removed ids); 409 means resend the full text.
+    """
+    document=request.data.get('document'); text=request.data.get('text'); edits=request.data.get('edits')
+    if not isinstance(document, str) or not DOCUMENT_ID.fullmatch(document):
+        return Response({'error': 'document must be 1-64 letters, digits, ".", "_" or "-"'}, status=400)
+    valid=isinstance(text, str) if text is not None else isinstance(edits, list) and isinstance(request.data.get('base_version'), int)
+    if not valid:
+        return Response({'error': 'Send text, or base_version and a list of edits'}, status=400)
+    try:
+        body=get_document_store().update(document, get_analysis_cache().analyze, text=text, base_version=request.data.get('base_version'), edits=edits or ())
+    except EditError as e:
+        return Response({'error': str(e)}, status=400)
+    except AnalysisBusy:
+        return Response({'error': 'Analyzer busy, retry shortly'}, status=503, headers={'Retry-After': str(settings.ANALYSIS_RETRY_AFTER)})
+    except AnalysisTimeout:
+        return Response({'error': 'Analysis timed out'}, status=422)
+    except AnalysisTooLarge:
+        return Response({'error': 'Code too large for the analyzer'}, status=413)
+    if body is None:
+        return Response({'error': 'Unknown document or version; resend the full text'}, status=409)
+    return Response(body)
+
 @api_view(['GET'])
+def analyze_code_cache_stats(request):
+    return Response(get_analysis_cache().stats())
+
+def etag_response(request, body, etag):
+    """JSON response with a strong ETag and Cache-Control, or 304 when If-None-Match matches."""
+    inm=request.headers.get('If-None-Match', '')
+    if inm.strip()=='*' or etag in (t.strip() for t in inm.split(',')):
+        resp=HttpResponseNotModified()
+    else:
+        resp=HttpResponse(body, content_type='application/json')
+    resp['ETag']=etag
+    resp['Cache-Control']=f'public, max-age={settings.CATALOG_MAX_AGE}'
+    return resp
+
+def catalog_response(request, name, build):
+    """Serve a cached catalog payload with a strong ETag, answering If-None-Match with 304."""
+    return etag_response(request, *cached_payload(name, build))
+
+def course_or_404(rows):
+    if not rows: raise Course.DoesNotExist
+    return rows
+
+@require_GET
 def course_detail(request, pk: int):
     try:
-        course = Course.objects.prefetch_related('lessons').get(pk=pk)
-        serializer = CourseSerializer(course)
-        return Response(serializer.data)
+        return catalog_response(request, f'course:{pk}', lambda: course_or_404(course_rows(pk))[0])
     except Course.DoesNotExist:
-        return Response({'detail': 'Course not found'}, status=404)
+        return json_response({'detail': 'Course not found'}, status=404)
 
-@api_view(['GET'])
+@require_GET
 def course_list(request):
-    courses = Course.objects.prefetch_related('lessons').all()
-    serializer = CourseSerializer(courses, many=True)
-    return Response(serializer.data)
+    return catalog_response(request, 'courses', course_rows)
 
-@api_view(['GET'])
+@require_GET
 def lesson_list(request, course_id: int):
+    def build():
+        if not Course.objects.filter(pk=course_id).exists(): raise Course.DoesNotExist
+        return lesson_rows(course_id)
     try:
-        course = Course.objects.get(pk=course_id)
-        lessons = course.lessons.all()
-        serializer = LessonSerializer(lessons, many=True)
-        return Response(serializer.data)
+        return catalog_response(request, f'lessons:{course_id}', build)
     except Course.DoesNotExist:
-        return Response({'detail': 'Course not found'}, status=404)
+        return json_response({'detail': 'Course not found'}, status=404)
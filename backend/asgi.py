@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+"""
+ASGI entry point for production: gunicorn -k uvicorn_worker.UvicornWorker asgi:application
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# Add the app directory to Python path
+app_dir = Path(__file__).resolve().parent / 'app'
+sys.path.insert(0, str(app_dir))
+
+# Set Django settings module
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings_prod')
+
+from django.core.asgi import get_asgi_application
+
+application = get_asgi_application()
+
+# Start and warm this worker's analyze-code process pool (no-op when disabled)
+from core.services.analysis_pool import get_analysis_pool
+
+get_analysis_pool()
+
+# Start the write-behind attempt flusher, draining anything a previous run left queued (no-op when disabled)
+from core.services.attempt_spool import get_attempt_spool
+
+get_attempt_spool()
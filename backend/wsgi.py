@@ -18,3 +18,13 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings_prod')
 from django.core.wsgi import get_wsgi_application
 
 application = get_wsgi_application()
+
+# Start and warm this worker's analyze-code process pool (no-op when disabled)
+from core.services.analysis_pool import get_analysis_pool
+
+get_analysis_pool()
+
+# Start the write-behind attempt flusher, draining anything a previous run left queued (no-op when disabled)
+from core.services.attempt_spool import get_attempt_spool
+
+get_attempt_spool()
@@ -116,7 +116,7 @@ export default function Dashboard(){
             <p className="text-sm text-gray-700 mb-4">
               Backend-powered recommendation with {recommendation?.confidence ? Math.round(recommendation.confidence * 100) : 0}% confidence.
             </p>
-            {recommendation ? (
+            {recommendation?.recommendation ? (
               <div className="space-y-2">
                 <div className="bg-white rounded-lg p-3 border">
                   <h4 className="font-medium text-gray-900">{recommendation.recommendation.title}</h4>
@@ -336,8 +336,8 @@ export const studentApi = {
 
   getRecommendation: (studentId: number) =>
     apiRequest<{
-      recommendation: { id: string; title: string };
-      confidence: number;
+      recommendation: { id: string; title: string } | null;
+      confidence: number | null;
       reason_features: any;
       alternatives: Array<{ id: string; title: string }>;
     }>(`/students/${studentId}/recommendation/`),